@@ -0,0 +1,52 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from ..dependencies import read_db_session
+from ..services import bulk_export
+from ..services.response_stream import ChunkEncoder, accepts_gzip, start_stream
+from ..settings import get_settings
+
+router = APIRouter()
+
+async def export_rows(output_format: str, channel_id: Optional[int], start_date: Optional[date],
+                      end_date: Optional[date], encoder: ChunkEncoder):
+    """Streams the matching rows in the requested format from a read-only session."""
+    async with read_db_session() as session:
+        if output_format == bulk_export.FORMAT_PARQUET:
+            rows = bulk_export.parquet_out(session, channel_id, start_date, end_date)
+        else:
+            rows = bulk_export.copy_out(session, output_format, channel_id, start_date, end_date)
+        async for chunk in rows:
+            yield encoder.encode(chunk)
+    yield encoder.finish()
+
+@router.get("/api/chats/bulk-export")
+async def bulk_export_chats(
+    request: Request,
+    format: str = Query(bulk_export.FORMAT_CSV, pattern=f"^({'|'.join(bulk_export.FORMATS)})$"),
+    channel_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    """
+    Streams every message of a channel and/or date range as CSV, NDJSON or Parquet.
+    CSV and NDJSON come straight from COPY TO STDOUT, gzip-compressed when the client
+    accepts it; Parquet is written one row group per cursor batch.
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="Start date must be less than or equal to end date.")
+    if format == bulk_export.FORMAT_PARQUET and bulk_export.pyarrow is None:
+        raise HTTPException(status_code=400, detail="Parquet output requires pyarrow to be installed")
+
+    # Parquet pages are compressed already
+    gzip = format != bulk_export.FORMAT_PARQUET and accepts_gzip(request.headers.get("accept-encoding", ""))
+    body = await start_stream(export_rows(format, channel_id, start_date, end_date,
+                                          ChunkEncoder(gzip, get_settings().stream_gzip_level)))
+    filename = f"discord_chats_{channel_id or 'all'}_{start_date or 'start'}_{end_date or 'end'}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Vary": "Accept-Encoding"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, headers=headers, media_type=bulk_export.MEDIA_TYPES[format])
@@ -0,0 +1,32 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette import status
+from ..dependencies import get_redis
+from ..services import export_jobs
+from .chat import get_discord_token
+
+# Setup logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+router = APIRouter()
+
+@router.post("/api/jobs/export/{channel_id}", status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_export(channel_id: str, sink: str = Query(export_jobs.SINK_POSTGRES),
+                         discord_token: str = Depends(get_discord_token)):
+    """Queues an export of a channel for the worker processes and returns its job id."""
+    if sink not in export_jobs.SINKS:
+        raise HTTPException(status_code=400, detail=f"Unknown sink '{sink}'. Expected one of: {', '.join(export_jobs.SINKS)}")
+    redis = await get_redis()  # Get a Redis connection
+    job_id = await export_jobs.enqueue(redis, sink, channel_id, discord_token)
+    logger.info(f"Queued export job {job_id} for channel {channel_id} into {sink}")
+    return {"job_id": job_id, "status": export_jobs.STATUS_QUEUED}
+
+@router.get("/api/jobs/{job_id}")
+async def get_export_job(job_id: str):
+    """Returns the status, attempts, message counts and stage timings of an export job."""
+    redis = await get_redis()  # Get a Redis connection
+    job = await export_jobs.get_job(redis, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
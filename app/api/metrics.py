@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from ..services import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Exposes request, cache, database, Elasticsearch and export metrics for Prometheus."""
+    body, content_type = metrics.latest()
+    return Response(content=body, media_type=content_type)
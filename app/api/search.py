@@ -1,95 +1,185 @@
 import json
+import logging
 from datetime import date
+from typing import Optional
 
-from elasticsearch import Elasticsearch, exceptions as es_exceptions
-from fastapi import APIRouter, Depends, HTTPException, Query
-from ..dependencies import get_db, get_redis
-from ..schemas import ChatMessagesResponse, PaginationParams, PaginatedChatMessagesResponse
-from ..services.chat_queries import exact_search_by_keyword, \
+from elasticsearch import exceptions as es_exceptions
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from ..dependencies import read_db_session, get_redis, get_elasticsearch
+from ..services import search_cache
+from ..services.response_stream import ChunkEncoder, MEDIA_TYPE_JSON, MEDIA_TYPE_NDJSON, accepts_gzip, \
+    encode_message_rows, start_stream
+from ..settings import get_settings
+from ..schemas import BatchSearchRequest, BatchSearchResponse, ChatMessagesResponse, PaginationParams, \
+    PaginatedChatMessagesResponse
+from ..services.chat_queries import exact_search_by_keyword, stream_exact_search_by_keyword, \
     paginated_exact_search_by_keyword, paginated_context_search_by_keyword, paginated_search_by_date_range
 from ..services.elasticsearch_chat_queries import paginated_es_search_by_date_range, \
-    paginated_es_search_by_keyword
-from sqlalchemy.ext.asyncio import AsyncSession
+    paginated_es_search_by_keyword, es_cache_key
 
 router = APIRouter()
 
+# Setup logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+def encode_model(model):
+    """Serializes a response model to the JSON bytes served and cached for it."""
+    return model.json().encode("utf-8")
+
+def encode_json(response):
+    """Serializes a plain response dictionary to the JSON bytes served and cached for it."""
+    return json.dumps(response).encode("utf-8")
+
+def json_bytes_response(payload: bytes):
+    """Wraps pre-encoded JSON so FastAPI sends it as-is, without re-validating or re-serializing."""
+    return Response(content=payload, media_type="application/json")
+
 
 @router.get("/api/chats/search", response_model=PaginatedChatMessagesResponse)
 async def exact_search_keyword(
     search_term: str = Query(..., min_length=1, max_length=100),
-    pagination: PaginationParams = Depends(),
-    db: AsyncSession = Depends(get_db)
+    pagination: PaginationParams = Depends()
 ):
     """Performs an exact keyword search with pagination, uses Redis for caching the results."""
     redis = await get_redis()
     if not search_term:
         raise HTTPException(status_code=400, detail="Keyword must not be empty")
 
-    # Generate a unique cache key for the current query and pagination settings
-    cache_key = f"exact_search_keyword:{search_term}:page:{pagination.page}:size:{pagination.page_size}"
-    try:
-        # Attempt to get cached results from Redis
-        cached_data = await redis.get(cache_key)
-        if cached_data:
-            # Deserialize cached data if present
-            messages = PaginatedChatMessagesResponse.parse_raw(cached_data)
-            if messages.count == 0:
-                raise HTTPException(status_code=200, detail="No messages found")
-            return messages
-    except Exception as e:
-        print(f"Failed to retrieve or deserialize cache: {e}")
-
-    try:
-        # Fetch results from the database if no valid cache is found
-        messages = await paginated_exact_search_by_keyword(search_term, pagination, db)
+    async def load():
+        # Fetch results from the database on a cache miss or background refresh
+        async with read_db_session() as session:
+            messages = await paginated_exact_search_by_keyword(search_term, pagination, session, redis)
         if messages.count == 0:
             raise HTTPException(status_code=200, detail="No messages found")
-
-        # Cache the serialized response for 1 hour
-        serialized_data = messages.json()
-        await redis.setex(cache_key, 3600, serialized_data)
         return messages
+
+    try:
+        # Generate a unique cache key for the current query and pagination settings
+        query_key = await search_cache.versioned_key(redis, search_cache.BACKEND_POSTGRES, f"exact_search_keyword:{search_term}")
+        cache_key = f"{query_key}:{pagination.cache_key()}"
+        # Serve from Redis; concurrent misses for the same key share one database query
+        payload = await search_cache.get_or_load(redis, cache_key, load, encode_model)
+        return json_bytes_response(payload)
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
         print(f"An error occurred during database access or processing: {e}")
         raise HTTPException(status_code=500, detail="An internal error occurred")
 
+def encode_batch_result(search_term: str, outcome) -> bytes:
+    """Encodes one term of a batch search, embedding its cached response bytes as they are."""
+    if isinstance(outcome, bytes):
+        return b'{"search_term":' + json.dumps(search_term).encode("utf-8") + b',"result":' + outcome + b'}'
+    if isinstance(outcome, HTTPException):
+        detail = outcome.detail
+    else:
+        logger.error(f"Batch search failed for {search_term!r}: {outcome}", exc_info=outcome)
+        detail = "An internal error occurred"
+    return json.dumps({"search_term": search_term, "result": None, "detail": detail}).encode("utf-8")
+
+@router.post("/api/chats/search/batch", response_model=BatchSearchResponse)
+async def exact_search_keyword_batch(batch: BatchSearchRequest):
+    """
+    Performs exact keyword searches for many terms at once and returns the first page of
+    every term. Cached terms are read from Redis with one MGET and the others are queried
+    concurrently, up to ``batch_search_concurrency`` at a time. Terms with no matches get
+    an empty result; a failing term gets a detail instead of failing the whole batch.
+    """
+    settings = get_settings()
+    redis = await get_redis()
+    search_terms = list(dict.fromkeys(batch.search_terms))
+    if len(search_terms) > settings.batch_search_max_terms:
+        raise HTTPException(status_code=400, detail=f"At most {settings.batch_search_max_terms} search terms are allowed")
+    pagination = PaginationParams(page_size=batch.page_size)
+
+    def loader(search_term: str):
+        async def load():
+            # Unlike the single-term search, empty results are cached too
+            async with read_db_session() as session:
+                return await paginated_exact_search_by_keyword(search_term, pagination, session, redis)
+        return load
+
+    try:
+        # Own key family, as empty results are cached as such rather than reported as not found
+        query_keys = await search_cache.versioned_keyword_keys(
+            redis, search_cache.BACKEND_POSTGRES, [f"batch_search_keyword:{term}" for term in search_terms])
+        cache_keys = [f"{query_key}:{pagination.cache_key()}" for query_key in query_keys]
+        outcomes = await search_cache.get_or_load_many(redis, cache_keys, [loader(term) for term in search_terms],
+                                                       encode_model, settings.batch_search_concurrency)
+    except Exception as e:
+        logger.exception(f"Batch search failed: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+    results = b",".join(encode_batch_result(term, outcome) for term, outcome in zip(search_terms, outcomes))
+    return json_bytes_response(b'{"results":[' + results + b']}')
+
+async def stream_search_all(search_term: str, ndjson: bool, encoder: ChunkEncoder):
+    """
+    Yields every match of a keyword as NDJSON lines, or as the chunked JSON of a
+    ChatMessagesResponse, one cursor batch per chunk. The first chunk is produced once
+    the query is planned and running, before its last row has been read.
+    """
+    settings = get_settings()
+    async with read_db_session() as session:
+        plan, batches = await stream_exact_search_by_keyword(search_term, session, settings.stream_batch_rows)
+        yield encoder.encode(b"" if ndjson else b'{"messages":[')
+        count = 0
+        async for rows in batches:
+            lines = encode_message_rows(rows)
+            if ndjson:
+                chunk = b"\n".join(lines) + b"\n"
+            else:
+                chunk = (b"," if count else b"") + b",".join(lines)
+            count += len(lines)
+            yield encoder.encode(chunk)
+    if ndjson:
+        yield encoder.finish()
+        return
+    # Close the messages array and add the remaining response fields to the same object
+    metadata = json.dumps({"count": count, "query_plan": plan.strategy, "query_selectivity": plan.selectivity})
+    yield encoder.finish(b"]," + metadata[1:].encode())
+
 @router.get("/api/chats/search/all", response_model=ChatMessagesResponse)
 async def exact_search_keyword_all(
+    request: Request,
     search_term: str = Query(..., min_length=1, max_length=100),
-    db: AsyncSession = Depends(get_db)
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$",
+                                  description="Stream every match as NDJSON or chunked JSON instead of caching the response")
 ):
-    """Searches for chat messages across all data sources based on a keyword without pagination."""
+    """
+    Searches for chat messages across all data sources based on a keyword without pagination.
+    With ``stream`` the matches are read through a server-side cursor and sent as they
+    arrive, gzip-compressed when the client accepts it, bypassing the cache.
+    """
     redis = await get_redis()
     if not search_term:
         raise HTTPException(status_code=400, detail="Keyword must not be empty")
 
-    # Key for caching all message results for a search term
-    cache_key = f"exact_search_keyword_all:{search_term}"
-    try:
-        cached_data = await redis.get(cache_key)
-        if cached_data:
-            try:
-                messages = ChatMessagesResponse.parse_raw(cached_data)
-                if messages.count == 0:
-                    raise HTTPException(status_code=404, detail="No messages found")
-                return messages
-            except Exception as e:
-                print(f"Error parsing cached data: {e}")
-    except Exception as e:
-        print(f"Redis operation failed: {e}")
+    if stream:
+        gzip = accepts_gzip(request.headers.get("accept-encoding", ""))
+        # Start the query here, so planning errors still become proper error responses
+        body = await start_stream(stream_search_all(search_term, stream == "ndjson",
+                                                    ChunkEncoder(gzip, get_settings().stream_gzip_level)))
+        headers = {"Vary": "Accept-Encoding"}
+        if gzip:
+            headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(body, headers=headers,
+                                 media_type=MEDIA_TYPE_NDJSON if stream == "ndjson" else MEDIA_TYPE_JSON)
 
-    try:
-        # Retrieve messages from database if cache miss or failure
-        messages: ChatMessagesResponse = await exact_search_by_keyword(search_term, db)
+    async def load():
+        # Retrieve messages from database on a cache miss or background refresh
+        async with read_db_session() as session:
+            messages: ChatMessagesResponse = await exact_search_by_keyword(search_term, session)
         if messages.count == 0:
             raise HTTPException(status_code=200, detail="No messages found")
-
-        # Serialize and set the cache for 1 hour
-        serialized_data = messages.json()
-        await redis.setex(cache_key, 3600, serialized_data)
         return messages
+
+    try:
+        # Key for caching all message results for a search term
+        cache_key = await search_cache.versioned_key(redis, search_cache.BACKEND_POSTGRES, f"exact_search_keyword_all:{search_term}")
+        payload = await search_cache.get_or_load(redis, cache_key, load, encode_model)
+        return json_bytes_response(payload)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -99,40 +189,27 @@ async def exact_search_keyword_all(
 @router.get("/api/chats/context-search", response_model=PaginatedChatMessagesResponse)
 async def search_keyword_context(
     search_term: str = Query(..., min_length=1, max_length=100),
-    pagination: PaginationParams = Depends(),
-    db: AsyncSession = Depends(get_db)
+    pagination: PaginationParams = Depends()
 ):
     """Performs a context-based search for chat messages, with caching of the results."""
     redis = await get_redis()
     if not search_term:
         raise HTTPException(status_code=400, detail="Keyword must not be empty")
 
-    # Define a cache key including search term and pagination
-    cache_key = f"context_search_keyword:{search_term}:page:{pagination.page}:size:{pagination.page_size}"
-
-    try:
-        cached_data = await redis.get(cache_key)
-        if cached_data:
-            try:
-                messages = PaginatedChatMessagesResponse.parse_raw(cached_data)
-                if messages.count == 0:
-                    raise HTTPException(status_code=200, detail="No messages found")
-                return messages
-            except Exception as parse_error:
-                print(f"Failed to parse cached data: {parse_error}")
-    except Exception as redis_error:
-        print(f"Redis operation failed: {redis_error}")
-
-    try:
-        # Retrieve messages from database, handle cache miss
-        messages = await paginated_context_search_by_keyword(search_term, pagination, db)
+    async def load():
+        # Retrieve messages from database on a cache miss or background refresh
+        async with read_db_session() as session:
+            messages = await paginated_context_search_by_keyword(search_term, pagination, session, redis)
         if messages.count == 0:
             raise HTTPException(status_code=404, detail="No messages found")
-
-        # Serialize and cache the successful query results for 1 hour
-        serialized_data = messages.json()
-        await redis.setex(cache_key, 3600, serialized_data)
         return messages
+
+    try:
+        # Define a cache key including search term and pagination
+        query_key = await search_cache.versioned_key(redis, search_cache.BACKEND_POSTGRES, f"context_search_keyword:{search_term}")
+        cache_key = f"{query_key}:{pagination.cache_key()}"
+        payload = await search_cache.get_or_load(redis, cache_key, load, encode_model)
+        return json_bytes_response(payload)
     except HTTPException as he:
         raise he
     except Exception as db_error:
@@ -143,78 +220,79 @@ async def search_keyword_context(
 async def search_by_date(
     start_date: date,
     end_date: date,
-    pagination: PaginationParams = Depends(),
-    db: AsyncSession = Depends(get_db)
+    pagination: PaginationParams = Depends()
 ):
     """Searches chat messages within a specified date range with pagination and caching."""
     redis = await get_redis()
     if start_date > end_date:
         raise HTTPException(status_code=400, detail="Start date must be less than or equal to end date.")
 
-    try:
-        # Construct a cache key that includes the date range and pagination parameters
-        cache_key = f"search_date_range:{start_date}-{end_date}:page:{pagination.page}:size:{pagination.page_size}"
-        cached_data = await redis.get(cache_key)
-        if cached_data:
-            messages = PaginatedChatMessagesResponse.parse_raw(cached_data)
-            if messages.count == 0:
-                raise HTTPException(status_code=200, detail="No messages found")
-            return messages
-
-        # If no cache, perform a database search
-        messages = await paginated_search_by_date_range(start_date, end_date, pagination, db)
+    async def load():
+        # Perform a database search on a cache miss or background refresh
+        async with read_db_session() as session:
+            messages = await paginated_search_by_date_range(start_date, end_date, pagination, session, redis)
         if messages.count == 0:
             raise HTTPException(status_code=200, detail="No messages found")
-
-        # Cache the results for 1 hour after successful retrieval and serialization
-        serialized_data = messages.json()
-        await redis.setex(cache_key, 3600, serialized_data)
         return messages
+
+    try:
+        # Construct a cache key that includes the date range and pagination parameters
+        query_key = await search_cache.versioned_key(redis, search_cache.BACKEND_POSTGRES,
+                                                     f"search_date_range:{start_date}-{end_date}", start_date, end_date)
+        cache_key = f"{query_key}:{pagination.cache_key()}"
+        payload = await search_cache.get_or_load(redis, cache_key, load, encode_model)
+        return json_bytes_response(payload)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Instantiate an Elasticsearch client
-es = Elasticsearch("http://localhost:9200")
-
 @router.get("/api/es/chats/search")
 async def search_keyword_in_elasticsearch(
     keyword: str,
-    pagination: PaginationParams = Depends()
+    pagination: PaginationParams = Depends(),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
 ):
-    """Searches for chat messages in Elasticsearch with keyword and pagination, includes caching."""
+    """
+    Searches for chat messages in Elasticsearch with keyword and pagination, includes caching.
+    Optional start and end dates limit the search to the monthly indices of that window.
+    """
     redis = await get_redis()
+    es = await get_elasticsearch()
     if not keyword:
         raise HTTPException(status_code=400, detail="Keyword must not be empty")
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="Start date must be less than or equal to end date.")
 
-    # Define a cache key with keyword and pagination details
-    cache_key = f"exact_search_keyword_elasticsearch:{keyword}:page:{pagination.page}:size:{pagination.page_size}"
-    try:
-        cached_data = await redis.get(cache_key)
-        if cached_data:
-            try:
-                return json.loads(cached_data)
-            except json.JSONDecodeError as e:
-                print(f"Error decoding JSON from cache: {e}")
-    except Exception as e:
-        print(f"Failed to retrieve data from Redis: {e}")
-
-    try:
+    async def load():
         # Perform the search using Elasticsearch, handle if no results found
-        messages, total = await paginated_es_search_by_keyword(keyword, pagination, es)
+        messages, total, next_cursor = await paginated_es_search_by_keyword(keyword, pagination, es, start_date, end_date)
         if not messages:
             raise HTTPException(status_code=404, detail="No messages found")
 
         # Build response with the search results
-        response = {
+        return {
             "data": messages,
             "total": total,
             "page": pagination.page,
-            "page_size": pagination.page_size
+            "page_size": pagination.page_size,
+            "next_cursor": next_cursor
         }
 
-        # Cache the serialized response for 1 hour
-        await redis.setex(cache_key, 3600, json.dumps(response))
-        return response
+    try:
+        # Define a cache key with keyword, date window and pagination details; a bounded
+        # window is only invalidated by exports touching its months
+        base_key = f"exact_search_keyword_elasticsearch:{keyword}"
+        if start_date or end_date:
+            base_key += f":dates:{start_date or ''}-{end_date or ''}"
+        query_key = await search_cache.versioned_key(redis, search_cache.BACKEND_ELASTICSEARCH, base_key,
+                                                     start_date, end_date)
+        cache_key = f"{query_key}:{es_cache_key(pagination)}"
+        payload = await search_cache.get_or_load(redis, cache_key, load, encode_json)
+        return json_bytes_response(payload)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error during Elasticsearch query or processing: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -227,33 +305,35 @@ async def search_by_date_in_elasticsearch(
 ):
     """Searches for chat messages in Elasticsearch by date range, with caching of results."""
     redis = await get_redis()
+    es = await get_elasticsearch()
     if start_date > end_date:
         raise HTTPException(status_code=400, detail="Start date must be less than or equal to end date.")
 
-    try:
-        # Update cache key with date range and pagination details
-        cache_key = f"elasticsearch_date_range:{start_date}-{end_date}:page:{pagination.page}:size:{pagination.page_size}"
-        cached_data = await redis.get(cache_key)
-        if cached_data:
-            return {"data": json.loads(cached_data), "source": "cache"}
-
-        # If no cache, perform a search on Elasticsearch
-        messages, total = await paginated_es_search_by_date_range(start_date, end_date, pagination, es)
+    async def load():
+        # Perform a search on Elasticsearch on a cache miss or background refresh
+        messages, total, next_cursor = await paginated_es_search_by_date_range(start_date, end_date, pagination, es)
         if not messages:
             raise HTTPException(status_code=404, detail="No messages found")
 
         # Build the response with search results
-        response = {
+        return {
             "data": messages,
             "total": total,
             "page": pagination.page,
-            "page_size": pagination.page_size
+            "page_size": pagination.page_size,
+            "next_cursor": next_cursor
         }
 
-        # Serialize and cache the response for 1 hour
-        await redis.setex(cache_key, 3600, json.dumps(response))
-        return response
+    try:
+        # Update cache key with date range and pagination details
+        query_key = await search_cache.versioned_key(redis, search_cache.BACKEND_ELASTICSEARCH,
+                                                     f"elasticsearch_date_range:{start_date}-{end_date}", start_date, end_date)
+        cache_key = f"{query_key}:{es_cache_key(pagination)}"
+        payload = await search_cache.get_or_load(redis, cache_key, load, encode_json)
+        return json_bytes_response(payload)
     except es_exceptions.NotFoundError:
         raise HTTPException(status_code=404, detail="No messages found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -4,18 +4,39 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from .config import settings  # Import application settings from the config module
 
-# Retrieve the database URL from the settings
+# Retrieve the database URLs from the settings; reads go to the primary when no replica is configured
 SQLALCHEMY_DATABASE_URL = settings.database_url
+SQLALCHEMY_READ_DATABASE_URL = settings.database_read_url or settings.database_url
 
-# Create an asynchronous engine that will use the provided database URL
-# The 'echo' parameter is set to True to log all the SQL executed by the engine to the standard output
-engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+def create_engine(url: str):
+    """Creates an asynchronous engine with the configured connection pool."""
+    return create_async_engine(
+        url,
+        echo=settings.database_echo,  # Logging every statement is costly; enable only for debugging
+        pool_size=settings.database_pool_size,  # Connections kept open per process
+        max_overflow=settings.database_max_overflow,  # Extra connections opened under bursts
+        pool_timeout=settings.database_pool_timeout,  # Seconds to wait for a free connection
+        pool_recycle=settings.database_pool_recycle,  # Replace connections older than this many seconds
+        pool_pre_ping=True,  # Discard connections closed by the server or a failover
+        # Statements prepared per connection and reused by asyncpg; 0 disables (e.g. behind pgbouncer)
+        connect_args={"prepared_statement_cache_size": settings.database_statement_cache_size},
+    )
+
+# Writer engine on the primary, used by exports and anything else that writes
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+# Reader engine, on a replica when database_read_url is set; shares the writer's pool otherwise
+read_engine = create_engine(SQLALCHEMY_READ_DATABASE_URL) if settings.database_read_url else engine
 
 # Configure the sessionmaker to create AsyncSession instances, not committing automatically
 # and not flushing automatically on each query execution
 async_session = sessionmaker(autocommit=False, autoflush=False,
                              bind=engine, class_=AsyncSession)
 
+# Sessions for searches; they never write, so nothing needs flushing or expiring
+async_read_session = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False,
+                                  bind=read_engine, class_=AsyncSession)
+
 # Create a declarative base class for defining database models
 # This class will later be inherited by actual database model classes
 Base = declarative_base()
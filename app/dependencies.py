@@ -1,6 +1,11 @@
 # Importing necessary modules for database and caching functionality
-from .core.database import async_session  # Import the async session factory for database operations
+from contextlib import asynccontextmanager  # Turns the session generator into a context manager
+from .core.database import async_session, async_read_session  # Import the async session factories for database operations
+from .core.config import settings  # Import connection settings
 import aioredis  # Import the aioredis library for Redis operations
+from elasticsearch import AsyncElasticsearch  # Import the async Elasticsearch client
+from .services import search_cache  # Import the search cache for its invalidation listener
+from .services.metrics import DB_POOL_CHECKOUT_SECONDS  # Import the pool wait histogram
 
 # Define an asynchronous generator to get a database session
 # This pattern is typically used in FastAPI to ensure that session cleanup is handled automatically
@@ -9,30 +14,85 @@ async def get_db():
     async with async_session() as session:
         # Start a new transaction
         async with session.begin():
+            # Check out the connection up front so the time spent waiting for the pool is measured
+            with DB_POOL_CHECKOUT_SECONDS.labels("writer").time():
+                await session.connection()
             # Yield the session to the caller
             yield session
 
+# Context-manager form of get_db for code running outside request dependencies,
+# such as cache loaders that may still be refreshing after the response was sent
+db_session = asynccontextmanager(get_db)
+
+# Define an asynchronous generator to get a read-only database session for searches
+# It reads from the replica when one is configured, keeping search load off the primary
+async def get_read_db():
+    async with async_read_session() as session:
+        # Start the transaction as READ ONLY; it is rolled back when the session closes
+        with DB_POOL_CHECKOUT_SECONDS.labels("reader").time():
+            await session.connection(execution_options={"postgresql_readonly": True})
+        yield session
+
+# Context-manager form of get_read_db, used by search cache loaders
+read_db_session = asynccontextmanager(get_read_db)
+
 # Global variable for Redis connection; consider using dependency injection for better testability and maintainability
 redis = None
 
 # Asynchronous function to set up Redis connection
 async def startup_redis():
     global redis  # Access the global variable
-    # Initialize the Redis connection with specified URL, set encoding, and enable response decoding
+    # Initialize the Redis connection with specified URL and encoding for arguments.
+    # Responses are left as bytes so cached search results can be served without decoding
     redis = aioredis.from_url(
         "redis://localhost:6379",
         encoding="utf-8",
-        decode_responses=True
+        decode_responses=False
     )
 
 # Asynchronous function to cleanly shut down Redis connection
 async def shutdown_redis():
     global redis  # Access the global variable
+    await search_cache.stop_invalidation_listener()  # Stop consuming cache invalidations first
     await redis.close()  # Close the Redis connection
 
+# Asynchronous function to start the search cache's invalidation listener
+async def startup_search_cache():
+    # Keeps each worker's in-process cache in sync with exports done by any worker
+    search_cache.start_invalidation_listener(await get_redis())
+
 # Asynchronous function to retrieve the Redis connection
 async def get_redis():
     # Check if the global Redis connection is already initialized
     if redis is None:
         await startup_redis()  # Start up Redis if not already running
     return redis  # Return the Redis connection
+
+# Global Elasticsearch client shared by all requests; it pools connections internally
+es = None
+
+# Asynchronous function to set up the Elasticsearch client
+async def startup_elasticsearch():
+    global es  # Access the global variable
+    # Create a single pooled client with bounded connections and request timeouts
+    es = AsyncElasticsearch(
+        settings.elasticsearch_url,
+        connections_per_node=settings.elasticsearch_max_connections,
+        request_timeout=settings.elasticsearch_request_timeout,
+        max_retries=settings.elasticsearch_max_retries,
+        retry_on_timeout=True
+    )
+
+# Asynchronous function to cleanly shut down the Elasticsearch client
+async def shutdown_elasticsearch():
+    global es  # Access the global variable
+    if es is not None:
+        await es.close()  # Close pooled connections
+        es = None
+
+# Asynchronous function to retrieve the Elasticsearch client
+async def get_elasticsearch():
+    # Lazily create the client if the startup hook has not run (e.g. in tests)
+    if es is None:
+        await startup_elasticsearch()
+    return es
@@ -1,23 +1,47 @@
 from fastapi import FastAPI
 # Importing API modules for chat and search functionality
-from .api import chat, search
-# Importing the database engine object
-from .core.database import engine
-# Importing startup and shutdown functions for Redis
-from .dependencies import startup_redis, shutdown_redis
+from .api import bulk_export, chat, jobs, metrics, search
+# Importing the database engine objects
+from .core.database import engine, read_engine
+# Importing startup and shutdown functions for Redis and Elasticsearch
+from .dependencies import startup_redis, shutdown_redis, startup_elasticsearch, shutdown_elasticsearch, \
+    startup_search_cache
 # Importing the Base class for database models from models module
 from .models import Base
+# Importing the partition maintenance run at startup
+from .services.partitions import startup_partitions
+# Importing the request and database instrumentation behind /metrics
+from .services.metrics import MetricsMiddleware, instrument_engine
+# Importing the sampling profiler middleware and the settings enabling it
+from .services.profiling import ProfilingMiddleware
+from .settings import get_settings
 
 # Create an instance of the FastAPI class
 # This instance is configured with a title to describe the application
 app = FastAPI(title="FastDiscordDB")
 
+# Record latency and status code of every request, and the duration of every SQL statement
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine, "writer")
+instrument_engine(read_engine, "reader")
+
+# Profile a sample of requests, and requests asking for it, when profiling is enabled
+if get_settings().profiling:
+    app.add_middleware(ProfilingMiddleware)
+
 # Include routers from the chat and search modules
 # Routers manage different sets of endpoints within the application
 app.include_router(chat.router)  # Including the chat router that handles chat-related endpoints
 app.include_router(search.router)  # Including the search router that handles search-related endpoints
+app.include_router(jobs.router)  # Including the jobs router that queues exports for the workers
+app.include_router(bulk_export.router)  # Including the bulk data-out endpoint streaming COPY output
+app.include_router(metrics.router)  # Including the Prometheus /metrics endpoint
 
 # Add event handlers for application startup and shutdown
 # These handlers are functions that perform tasks at application startup and shutdown
 app.add_event_handler("startup", startup_redis)  # Adds a startup event handler to initialize Redis
+app.add_event_handler("startup", startup_search_cache)  # Subscribes the in-process cache to invalidations
 app.add_event_handler("shutdown", shutdown_redis)  # Adds a shutdown event handler to cleanly close Redis connections
+app.add_event_handler("startup", startup_elasticsearch)  # Creates the shared, pooled async Elasticsearch client
+app.add_event_handler("shutdown", shutdown_elasticsearch)  # Closes the Elasticsearch client's connection pool
+app.add_event_handler("startup", startup_partitions)  # Creates upcoming monthly partitions; workers handle indexes and retention
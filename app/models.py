@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Date, BIGINT
+from sqlalchemy import Column, String, DateTime, ForeignKey, Date, BIGINT, Index
 from sqlalchemy.dialects.postgresql import TSVECTOR
 from .core.database import Base  # Importing the Base class from the database core module
 
@@ -24,3 +24,6 @@ class Message(Base):
     # The content_tsvector column is used for full-text search within PostgreSQL, enhancing search capabilities.
     # It is of type TSVECTOR, which is specific to PostgreSQL and optimizes text search.
     content_tsvector = Column(TSVECTOR)
+
+    # Composite index backing keyset pagination, which walks messages in (message_date, message_id) order.
+    __table_args__ = (Index('idx_message_date_id', 'message_date', 'message_id'),)
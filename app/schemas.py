@@ -1,5 +1,5 @@
-from typing import List
-from pydantic import BaseModel, Field, conint
+from typing import List, Optional
+from pydantic import BaseModel, Field, conint, constr
 from datetime import date
 
 # Define a Pydantic model for creating a new chat message
@@ -28,18 +28,46 @@ class ChatMessageDisplay(BaseModel):
 class ChatMessagesResponse(BaseModel):
     messages: List[ChatMessageDisplay]  # List of chat messages to display
     count: int  # Number of messages in the response
+    query_plan: Optional[str] = None  # Keyword match strategy picked by the query planner
+    query_selectivity: Optional[float] = None  # Estimated share of messages matching the keyword
 
 # Define a Pydantic model for paginated responses of chat messages
 class PaginatedChatMessagesResponse(BaseModel):
     messages: List[ChatMessageDisplay]  # List of chat messages
     count: int  # Number of messages in the current page
     total_count: int  # Total number of messages available across all pages
+    total_count_strategy: str = "exact"  # How total_count was obtained: exact, estimated, capped (a lower bound) or cached
+    next_cursor: Optional[str] = None  # Opaque cursor for the next page; None on the last page
+    query_plan: Optional[str] = None  # Keyword match strategy picked by the query planner
+    query_selectivity: Optional[float] = None  # Estimated share of messages matching the keyword
+
+# Define a Pydantic model for a batch keyword search request
+class BatchSearchRequest(BaseModel):
+    search_terms: List[constr(min_length=1, max_length=100)] = Field(..., min_length=1, description="Keywords to search for")  # Searched one by one, duplicates once
+    page_size: int = Field(default=10, gt=0, le=100, description="The number of items returned per term, max 100")  # First page size of every term
+
+# Define a Pydantic model for the result of one term of a batch search
+class BatchSearchResult(BaseModel):
+    search_term: str  # The keyword this result belongs to
+    result: Optional[PaginatedChatMessagesResponse] = None  # First page of matches; None if the term failed
+    detail: Optional[str] = None  # Why the term failed, e.g. a rejected short term
+
+# Define a Pydantic model for a batch keyword search response
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchResult]  # One result per distinct term, in request order
 
 # Define a Pydantic model for pagination parameters
 class PaginationParams(BaseModel):
     page: int = Field(default=1, gt=0, description="The page number starting from 1")  # Current page number, must be greater than 0
     page_size: int = Field(default=10, gt=0, le=100, description="The number of items per page, max 100")  # Number of items per page with a maximum of 100
+    cursor: Optional[str] = Field(default=None, description="Opaque next_cursor from a previous page; takes precedence over page")  # Keyset position to continue from
 
     def skip(self):
         """Calculate the number of records to skip for the database query based on the current page and page size."""
         return (self.page - 1) * self.page_size  # Derived attribute to calculate offset for pagination
+
+    def cache_key(self):
+        """Build the part of a cache key that identifies this page."""
+        if self.cursor:
+            return f"cursor:{self.cursor}:size:{self.page_size}"
+        return f"page:{self.page}:size:{self.page_size}"
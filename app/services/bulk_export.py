@@ -0,0 +1,172 @@
+import asyncio
+import io
+import logging
+from datetime import date
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from starlette.exceptions import HTTPException
+
+# pyarrow is optional; without it Parquet output is unavailable
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - depends on the environment
+    pyarrow = None
+
+from ..models import Message
+from ..settings import get_settings
+
+# Set up logging for bulk exports
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+FORMAT_PARQUET = "parquet"
+FORMATS = (FORMAT_CSV, FORMAT_NDJSON, FORMAT_PARQUET)
+
+MEDIA_TYPES = {
+    FORMAT_CSV: "text/csv",
+    FORMAT_NDJSON: "application/x-ndjson",
+    FORMAT_PARQUET: "application/vnd.apache.parquet",
+}
+
+# Select lists of the COPY query per format. NDJSON lines are built by Postgres itself
+SELECT_COLUMNS = {
+    FORMAT_CSV: "message_id, channel_id, message_date, content",
+    FORMAT_NDJSON: "json_build_object('message_id', message_id, 'channel_id', channel_id, "
+                   "'message_date', message_date, 'content', content)::text",
+}
+
+# COPY options per format. JSON text never contains raw control characters, so with
+# control characters as the CSV quote and delimiter every line is copied out verbatim,
+# without the backslash escaping of COPY's text format
+COPY_OPTIONS = {
+    FORMAT_CSV: {"format": "csv", "header": True},
+    FORMAT_NDJSON: {"format": "csv", "quote": "\x01", "delimiter": "\x02"},
+}
+
+_DONE = object()
+
+
+def _filters(channel_id: Optional[int], start_date: Optional[date], end_date: Optional[date]):
+    """Builds the WHERE clause and its arguments. The date bounds let the planner prune partitions."""
+    conditions, args = [], []
+    for condition, value in (("channel_id = ${}", channel_id), ("message_date >= ${}", start_date),
+                             ("message_date <= ${}", end_date)):
+        if value is not None:
+            args.append(value)
+            conditions.append(condition.format(len(args)))
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", args
+
+
+def copy_query(output_format: str, channel_id: Optional[int], start_date: Optional[date], end_date: Optional[date]):
+    """Returns the query COPY streams out for a format, and its arguments."""
+    where, args = _filters(channel_id, start_date, end_date)
+    return f"SELECT {SELECT_COLUMNS[output_format]} FROM discord_chats{where}", args
+
+
+async def copy_out(session: AsyncSession, output_format: str, channel_id: Optional[int] = None,
+                   start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """
+    Yields the matching rows of ``discord_chats`` as CSV or NDJSON bytes produced by
+    ``COPY (...) TO STDOUT``. The COPY runs in a task that hands chunks over through a
+    small queue, so a slow client slows the COPY down instead of buffering its output.
+    asyncpg inlines the arguments as literals, so partitions are pruned at plan time.
+    """
+    query, args = copy_query(output_format, channel_id, start_date, end_date)
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    queue = asyncio.Queue(maxsize=get_settings().bulk_export_queue_chunks)
+
+    def copy_ended(_):
+        # Never wait here: after a disconnect nobody drains the queue. If it is full, the
+        # consumer notices the finished task once it has emptied the queue
+        try:
+            queue.put_nowait(_DONE)
+        except asyncio.QueueFull:
+            pass
+
+    task = asyncio.ensure_future(raw_connection.driver_connection.copy_from_query(
+        query, *args, output=queue.put, **COPY_OPTIONS[output_format]))
+    task.add_done_callback(copy_ended)
+    try:
+        while True:
+            if task.done() and queue.empty():
+                break
+            chunk = await queue.get()
+            if chunk is _DONE:
+                break
+            yield chunk
+        await task  # Raises if the COPY failed
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting what the Parquet writer produces until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema():
+    return pyarrow.schema([("message_id", pyarrow.int64()), ("channel_id", pyarrow.int64()),
+                           ("message_date", pyarrow.date32()), ("content", pyarrow.string())])
+
+
+def _record_batch(rows, schema):
+    """Turns (message_id, channel_id, message_date, content) rows into an Arrow record batch."""
+    columns = list(zip(*rows))
+    return pyarrow.RecordBatch.from_arrays(
+        [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema)
+
+
+async def parquet_out(session: AsyncSession, channel_id: Optional[int] = None,
+                      start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """
+    Yields the matching rows as a Parquet file, one row group per batch of
+    ``bulk_export_parquet_rows`` rows read from a server-side cursor.
+    """
+    if pyarrow is None:
+        raise HTTPException(status_code=400, detail="Parquet output requires pyarrow to be installed")
+    stmt = select(Message.message_id, Message.channel_id, Message.message_date, Message.content)
+    if channel_id is not None:
+        stmt = stmt.filter(Message.channel_id == channel_id)
+    if start_date is not None:
+        stmt = stmt.filter(Message.message_date >= start_date)
+    if end_date is not None:
+        stmt = stmt.filter(Message.message_date <= end_date)
+    result = await session.stream(stmt.execution_options(yield_per=get_settings().bulk_export_parquet_rows))
+
+    sink = _ChunkSink()
+    schema = _parquet_schema()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for rows in result.partitions():
+            writer.write_batch(_record_batch(rows, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,90 @@
+import logging
+import time
+
+import backoff
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .message_batch import MessageBatch
+
+# Set up logging for the bulk loader
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Session-local staging table; temporary tables are never WAL-logged and each
+# connection gets its own copy, so concurrent exports never contend on it
+STAGING_TABLE = "discord_chats_staging"
+STAGING_COLUMNS = ["message_id", "channel_id", "message_date", "content"]
+
+CREATE_STAGING_TABLE = text(f"""
+    CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} (
+        message_id BIGINT NOT NULL,
+        channel_id BIGINT NOT NULL,
+        message_date DATE NOT NULL,
+        content TEXT
+    ) ON COMMIT DELETE ROWS
+""")
+
+# One set-based merge per batch; to_tsvector runs once over the whole staged set
+MERGE_STAGING_TABLE = text(f"""
+    INSERT INTO discord_chats (message_id, channel_id, message_date, content, content_tsvector)
+    SELECT message_id, channel_id, message_date, content, to_tsvector('english', content)
+    FROM {STAGING_TABLE}
+    ON CONFLICT (message_id, message_date) DO NOTHING
+""")
+
+
+class AdaptiveBatchSizer:
+    """
+    Tracks measured commit latency and steers the batch size towards the number of
+    rows that can be loaded in ``target_seconds``.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_seconds: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.size = max(minimum, min(maximum, initial))
+
+    def __call__(self) -> int:
+        """Returns the batch size to use for the next batch."""
+        return self.size
+
+    def record(self, rows: int, seconds: float):
+        """Updates the batch size from the observed duration of a committed batch."""
+        if rows <= 0 or seconds <= 0:
+            return
+        ideal = rows / seconds * self.target_seconds
+        # Smooth the adjustment and cap growth at 2x per batch to avoid oscillation
+        proposed = min((self.size + ideal) / 2, self.size * 2)
+        self.size = int(max(self.minimum, min(self.maximum, proposed)))
+
+
+@backoff.on_exception(backoff.expo, Exception, max_tries=3)
+async def copy_batch(session: AsyncSession, batch: MessageBatch, sizer: AdaptiveBatchSizer = None):
+    """
+    Loads a batch of messages with binary COPY into the staging table and merges it
+    into the partitioned ``discord_chats`` table in a single INSERT ... SELECT.
+    Returns the number of rows that were new.
+    """
+    start_time = time.perf_counter()
+    try:
+        await session.execute(CREATE_STAGING_TABLE)
+
+        # Reach through SQLAlchemy to the asyncpg connection for the binary COPY protocol
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            STAGING_TABLE, records=batch.records(), columns=STAGING_COLUMNS)
+
+        result = await session.execute(MERGE_STAGING_TABLE)
+        await session.commit()
+    except Exception as e:
+        logger.error(f"Failed to copy batch: {e}")
+        await session.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to copy batch: {str(e)}")
+
+    if sizer is not None:
+        sizer.record(len(batch), time.perf_counter() - start_time)
+    return result.rowcount
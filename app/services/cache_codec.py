@@ -0,0 +1,81 @@
+import struct
+import zlib
+
+# zstandard is optional; without it entries fall back to zlib compression
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+from ..settings import get_settings
+
+# Every cache entry starts with: format version, codec, fresh-until timestamp
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">BBd")
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+_CODECS_BY_NAME = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+_DECOMPRESS_ERRORS = (ValueError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+# Compressor objects are reusable; create them lazily once per process
+_zstd_compressor = None
+_zstd_decompressor = None
+
+
+def _configured_codec() -> int:
+    codec = _CODECS_BY_NAME.get(get_settings().cache_compression, CODEC_NONE)
+    if codec == CODEC_ZSTD and zstandard is None:
+        return CODEC_ZLIB
+    return codec
+
+
+def _compress(codec: int, payload: bytes) -> bytes:
+    global _zstd_compressor
+    if codec == CODEC_ZSTD:
+        if _zstd_compressor is None:
+            _zstd_compressor = zstandard.ZstdCompressor(level=get_settings().cache_compression_level)
+        return _zstd_compressor.compress(payload)
+    if codec == CODEC_ZLIB:
+        return zlib.compress(payload, get_settings().cache_compression_level)
+    return payload
+
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    global _zstd_decompressor
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("Cache entry is zstd-compressed but zstandard is not installed")
+        if _zstd_decompressor is None:
+            _zstd_decompressor = zstandard.ZstdDecompressor()
+        return _zstd_decompressor.decompress(data)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_NONE:
+        return data
+    raise ValueError(f"Unknown cache codec {codec}")
+
+
+def pack_entry(payload: bytes, fresh_until: float) -> bytes:
+    """
+    Builds the stored form of a pre-encoded response: a version header followed by the
+    payload, compressed when it is at least ``cache_compression_min_bytes`` long.
+    """
+    codec = _configured_codec() if len(payload) >= get_settings().cache_compression_min_bytes else CODEC_NONE
+    return HEADER.pack(FORMAT_VERSION, codec, fresh_until) + _compress(codec, payload)
+
+
+def unpack_entry(value: bytes):
+    """
+    Parses a stored entry into a tuple of the fresh-until timestamp and the original
+    payload bytes. Returns None for entries written in any other format.
+    """
+    if len(value) < HEADER.size or value[0] != FORMAT_VERSION:
+        return None
+    _, codec, fresh_until = HEADER.unpack_from(value)
+    try:
+        return fresh_until, _decompress(codec, value[HEADER.size:])
+    except _DECOMPRESS_ERRORS:
+        return None  # Corrupt or unreadable entries are treated as misses
@@ -1,7 +1,7 @@
 import logging
 from datetime import datetime, timedelta, date
 import json
-from sqlalchemy import func, text
+from sqlalchemy import func, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from starlette.exceptions import HTTPException
@@ -9,37 +9,71 @@ from starlette.exceptions import HTTPException
 # Importing models and schemas necessary for operations
 from ..models import Message, Base
 from ..schemas import ChatMessageDisplay, ChatMessagesResponse, PaginationParams, PaginatedChatMessagesResponse
+from .cursor import decode_cursor, encode_cursor
+from .query_planner import MATCH_EXACT, MATCH_WORDS, plan_keyword_search
+from .total_count import count_total
 
 # Setting up logging to monitor and log the application's actions
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def paginated_exact_search_by_keyword(search_term: str, pagination: PaginationParams, session: AsyncSession):
+def paginate(stmt, pagination: PaginationParams):
+    """
+    Orders a message query by (message_date, message_id) and limits it to one page.
+    With a cursor the page starts right after the cursor's position (keyset pagination),
+    which costs the same at any depth; otherwise the page number is used as an offset.
+    """
+    stmt = stmt.order_by(Message.message_date, Message.message_id)
+    if pagination.cursor:
+        position = decode_cursor(pagination.cursor)
+        try:
+            message_date, message_id = date.fromisoformat(position[0]), int(position[1])
+        except (TypeError, ValueError, IndexError, KeyError):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        stmt = stmt.filter(
+            # The plain date bound lets the planner prune partitions before the row comparison
+            Message.message_date >= message_date,
+            tuple_(Message.message_date, Message.message_id) > tuple_(message_date, message_id)
+        )
+    else:
+        stmt = stmt.offset(pagination.skip())
+    return stmt.limit(pagination.page_size)
+
+def next_cursor(messages, pagination: PaginationParams):
+    """Returns the cursor for the page after ``messages``, or None if this was the last page."""
+    if len(messages) < pagination.page_size:
+        return None
+    last = messages[-1]
+    return encode_cursor([last.message_date.isoformat(), last.message_id])
+
+async def paginated_exact_search_by_keyword(search_term: str, pagination: PaginationParams, session: AsyncSession, redis=None):
     """
     Performs a paginated search by a given keyword in the database.
     It utilizes full-text search capabilities and logs detailed information.
     """
     try:
-        # Prepare a query for full-text search
-        query = func.plainto_tsquery('english', search_term)
+        # The planner picks the predicates, shared by the page query and the total count
+        plan = await plan_keyword_search(search_term, MATCH_EXACT, session)
+        if plan.empty:
+            return PaginatedChatMessagesResponse(messages=[], count=0, total_count=0, query_plan=plan.strategy,
+                                                 query_selectivity=plan.selectivity)
         # SQL statement that filters messages containing the search term, with pagination
-        stmt = select(Message).filter(
-            Message.content.ilike(f"%{search_term}%")
-        ).offset(pagination.skip()).limit(pagination.page_size)
+        stmt = paginate(select(Message).filter(*plan.predicates), pagination)
 
         # Execute the SQL statement
         result = await session.execute(stmt)
         messages = result.scalars().all()
         logger.info(f"Successfully fetched {len(messages)} messages from the database.")
 
-        # Additional SQL to count total results for pagination
-        total_count_stmt = select(func.count()).select_from(Message).filter(
-            Message.content.ilike(f"%{search_term}%")
-        )
-        total_count_result = await session.execute(total_count_stmt)
-        total_count = total_count_result.scalar_one()
+        # Count total results for pagination using the configured strategy
+        total_count, strategy = await count_total(session, plan.predicates,
+                                                  f"exact_search_keyword:{plan.strategy}:{search_term}", redis)
 
-        return PaginatedChatMessagesResponse(messages=[ChatMessageDisplay.from_orm(msg) for msg in messages], count=len(messages), total_count=total_count)
+        return PaginatedChatMessagesResponse(messages=[ChatMessageDisplay.from_orm(msg) for msg in messages], count=len(messages), total_count=total_count,
+                                             total_count_strategy=strategy, next_cursor=next_cursor(messages, pagination),
+                                             query_plan=plan.strategy, query_selectivity=plan.selectivity)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}", exc_info=True)
         raise HTTPException(
@@ -47,75 +81,96 @@ async def paginated_exact_search_by_keyword(search_term: str, pagination: Pagina
 
 async def exact_search_by_keyword(search_term: str, session: AsyncSession):
     """
-    Performs a non-paginated search for messages containing the exact search term using full-text search capabilities.
+    Performs a non-paginated search for messages containing the exact search term, using the
+    plan the query planner picks for it.
     """
     try:
-        query = func.plainto_tsquery('english', search_term)
-        # Combining full-text search with a like filter for precise matching
-        stmt = select(Message).filter(
-            Message.content_tsvector.op('@@')(query),
-            Message.content.ilike(f"%{search_term}%")
-        )
-        result = await session.execute(stmt)
-        messages = result.scalars().all()
+        plan = await plan_keyword_search(search_term, MATCH_EXACT, session)
+        messages = []
+        if not plan.empty:
+            result = await session.execute(select(Message).filter(*plan.predicates))
+            messages = result.scalars().all()
         logger.info(f"Successfully fetched {len(messages)} messages from the database.")
-        return ChatMessagesResponse(messages=[ChatMessageDisplay.from_orm(msg) for msg in messages], count=len(messages))
+        return ChatMessagesResponse(messages=[ChatMessageDisplay.from_orm(msg) for msg in messages], count=len(messages),
+                                    query_plan=plan.strategy, query_selectivity=plan.selectivity)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}", exc_info=True)
         raise HTTPException(
             status_code=500, detail="An error occurred while processing your request.")
 
-async def paginated_context_search_by_keyword(search_term: str, pagination: PaginationParams, session: AsyncSession):
+async def _no_batches():
+    return
+    yield
+
+async def stream_exact_search_by_keyword(search_term: str, session: AsyncSession, batch_rows: int):
+    """
+    Streams the messages containing the exact search term through a server-side cursor.
+    Returns the query plan and an async iterator of row batches of at most ``batch_rows``
+    (message_id, channel_id, content, message_date) rows, so memory does not grow with
+    the number of matches. The session must stay open while the batches are consumed.
+    """
+    plan = await plan_keyword_search(search_term, MATCH_EXACT, session)
+    if plan.empty:
+        return plan, _no_batches()
+    stmt = select(Message.message_id, Message.channel_id, Message.content, Message.message_date) \
+        .filter(*plan.predicates).execution_options(yield_per=batch_rows)
+    result = await session.stream(stmt)
+    return plan, result.partitions()
+
+async def paginated_context_search_by_keyword(search_term: str, pagination: PaginationParams, session: AsyncSession, redis=None):
     """
     Performs a paginated full-text search for messages relevant to the context defined by the search term.
     """
     try:
-        query = func.plainto_tsquery('english', search_term)
         # Contextual search across messages using the tsvector column
-        stmt = select(Message).filter(
-            Message.content_tsvector.op('@@')(query)
-        ).offset(pagination.skip()).limit(pagination.page_size)
+        plan = await plan_keyword_search(search_term, MATCH_WORDS, session)
+        if plan.empty:
+            # Only stop words: nothing can match, so no query is needed
+            return PaginatedChatMessagesResponse(messages=[], count=0, total_count=0, query_plan=plan.strategy,
+                                                 query_selectivity=plan.selectivity)
+        stmt = paginate(select(Message).filter(*plan.predicates), pagination)
 
         result = await session.execute(stmt)
         messages = result.scalars().all()
         logger.info(f"Successfully fetched {len(messages)} messages from the database.")
 
         # Counting total messages for pagination
-        total_count_stmt = select(func.count()).select_from(Message).filter(
-            Message.content_tsvector.op('@@')(query)
-        )
-        total_count_result = await session.execute(total_count_stmt)
-        total_count = total_count_result.scalar_one()
+        total_count, strategy = await count_total(session, plan.predicates, f"context_search_keyword:{search_term}", redis)
 
-        return PaginatedChatMessagesResponse(messages=[ChatMessageDisplay.from_orm(msg) for msg in messages], count=len(messages), total_count=total_count)
+        return PaginatedChatMessagesResponse(messages=[ChatMessageDisplay.from_orm(msg) for msg in messages], count=len(messages), total_count=total_count,
+                                             total_count_strategy=strategy, next_cursor=next_cursor(messages, pagination),
+                                             query_plan=plan.strategy, query_selectivity=plan.selectivity)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}", exc_info=True)
         raise HTTPException(
             status_code=500, detail="An error occurred while processing your request.")
 
-async def paginated_search_by_date_range(start_date: date, end_date: date, pagination: PaginationParams, session: AsyncSession):
+async def paginated_search_by_date_range(start_date: date, end_date: date, pagination: PaginationParams, session: AsyncSession, redis=None):
     """
     Searches for messages within a specified date range with pagination.
     Fetches and counts messages to facilitate client-side pagination.
     """
     try:
         # SQL statement that retrieves messages within the date range with pagination
-        stmt = select(Message).filter(
-            Message.message_date.between(start_date, end_date)
-        ).offset(pagination.skip()).limit(pagination.page_size)
+        predicates = (Message.message_date.between(start_date, end_date),)
+        stmt = paginate(select(Message).filter(*predicates), pagination)
 
         result = await session.execute(stmt)
         messages = result.scalars().all()
         logger.info(f"Successfully fetched {len(messages)} messages from the database.")
 
         # Count total messages within the date range
-        total_count_stmt = select(func.count()).select_from(Message).filter(
-            Message.message_date.between(start_date, end_date)
-        )
-        total_count_result = await session.execute(total_count_stmt)
-        total_count = total_count_result.scalar_one()
+        total_count, strategy = await count_total(session, predicates, f"search_date_range:{start_date}-{end_date}", redis,
+                                                  (start_date, end_date))
 
-        return PaginatedChatMessagesResponse(messages=[ChatMessageDisplay.from_orm(msg) for msg in messages], count=len(messages), total_count=total_count)
+        return PaginatedChatMessagesResponse(messages=[ChatMessageDisplay.from_orm(msg) for msg in messages], count=len(messages), total_count=total_count,
+                                             total_count_strategy=strategy, next_cursor=next_cursor(messages, pagination))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}", exc_info=True)
         raise HTTPException(
@@ -0,0 +1,20 @@
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException
+
+
+def encode_cursor(position) -> str:
+    """Encodes a JSON-serializable sort position as an opaque, URL-safe cursor string."""
+    raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Decodes a cursor produced by ``encode_cursor``, rejecting malformed input with a 400."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
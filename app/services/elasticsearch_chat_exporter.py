@@ -1,71 +1,36 @@
-import asyncio
-import json
 import logging
-from datetime import datetime, timedelta
 
-from elasticsearch import Elasticsearch, helpers
-from fastapi import Depends, HTTPException
-from aiofiles import open as aio_open
-import backoff
+from elasticsearch import AsyncElasticsearch
+from fastapi import HTTPException
+
+from ..settings import get_settings
+from .es_bulk import bulk_index, relax_for_bulk_load, restore_after_bulk_load
+from .es_indices import ensure_index_template, index_for_month, index_for_ordinal
+from .export_pipeline import SinkWriter, run_export
+from .export_progress import ExportProgress
+from .export_watermark import SINK_ELASTICSEARCH
+from .message_batch import MessageBatch
 
 # Configure logging for better tracking and debugging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Connect to Elasticsearch at the specified URL
-es = Elasticsearch("http://localhost:9200")
-
-async def execute_export_command(token, channel_id, formatted_date):
-    """
-    Executes an external command to export chat data from a platform,
-    saving it to a JSON file and parsing it.
-    """
-    # Create a unique filename using the current timestamp to avoid overwrites
-    filename = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
-    # Execute an asynchronous subprocess to run the export command
-    process = await asyncio.create_subprocess_exec(
-        "dotnet", "/Users/shruti/Downloads/DiscordChatExporter.Cli/DiscordChatExporter.Cli.dll", "export",
-        "-t", token, "-c", channel_id, "-f", "Json",
-        "--after", formatted_date, "--output", filename,
-        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await process.communicate()
-    if process.returncode != 0:
-        logger.error(f"Export failed: {stderr.decode()}")
-        raise RuntimeError(f"Export failed: {stderr.decode()}")
-
-    # Read the exported data from the file and parse it as JSON
-    async with aio_open(filename, 'r') as file:
-        file_content = await file.read()
-        return json.loads(file_content)['messages']
-
-@backoff.on_exception(backoff.expo, Exception, max_tries=3)
-async def insert_batch(batch, channel_id, index_name):
+async def insert_batch(es: AsyncElasticsearch, batch: MessageBatch):
     """
-    Inserts a batch of chat messages into Elasticsearch using bulk operations,
-    with retries on exceptions.
+    Inserts a batch of chat messages into Elasticsearch with concurrent bulk requests,
+    routing each message to the monthly index of its message date. Only documents
+    rejected with a retryable status are re-sent (see ``es_bulk``).
+    Returns the number of indexed documents and the list of per-document errors.
     """
-    # Prepare the batch data for bulk indexing
-    actions = [
-        {
-            "_index": index_name,
-            "_id": item["id"],
-            "_source": {
-                "message_id": item['id'],
-                "channel_id": channel_id,
-                "message_date": datetime.strptime(item['timestamp'], '%Y-%m-%dT%H:%M:%S.%f%z').date(),
-                "content": item['content']
-            }
-        }
-        for item in batch
-    ]
+    # Bulk actions are generated lazily from the batch's columns
+    actions = batch.es_actions(index_for_ordinal)
 
     try:
-        responses = helpers.bulk(es, actions, raise_on_exception=False, raise_on_error=False)
+        responses = await bulk_index(es, actions)
         if responses[0]:
             logger.info(f"Successfully indexed {responses[0]} documents.")
         if len(responses[1]) > 0:
-            logger.error(f"Errors occurred during bulk indexing: {responses[1]}")
+            logger.error(f"Errors occurred during bulk indexing: {len(responses[1])} documents failed")
             for error in responses[1]:
                 logger.error(f"Error: {error}")
     except Exception as e:
@@ -74,79 +39,58 @@ async def insert_batch(batch, channel_id, index_name):
 
     return responses
 
-async def create_index_if_not_exists(formatted_date):
+class ElasticsearchWriter(SinkWriter):
     """
-    Checks if an Elasticsearch index exists for the given date, and creates one if not,
-    including settings for text analysis specific to chat content.
+    Export pipeline sink bulk-indexing batches into monthly chats indices, which are
+    created from the index template on first write. Once a load passes
+    ``es_relax_settings_after_docs`` documents, the indices it writes to stop
+    refreshing and drop their replicas until the load finishes.
     """
-    index_name = "chats-" + formatted_date
-    if not es.indices.exists(index=index_name):
-        es_index = {
-            "settings": {
-                "analysis": {
-                    "analyzer": {
-                        "discord_analyzer": {
-                            "tokenizer": "standard",
-                            "filter": ["lowercase", "english_stop", "english_stemmer"]
-                        }
-                    },
-                    "filter": {
-                        "english_stop": {
-                            "type": "stop",
-                            "stopwords": "_english_"
-                        },
-                        "english_stemmer": {
-                            "type": "stemmer",
-                            "language": "possessive_english"
-                        }
-                    }
-                }
-            },
-            "mappings": {
-                "properties": {
-                    "message_id": {"type": "keyword"},
-                    "channel_id": {"type": "keyword"},
-                    "message_date": {"type": "date", "format": "yyyy-MM-dd"},
-                    "content": {"type": "text", "analyzer": "discord_analyzer"}
-                }
-            }
-        }
-        es.indices.create(index=index_name, body=es_index, ignore=[400])
-    return index_name
-
-async def export_chat(token, channel_id):
+    sink = SINK_ELASTICSEARCH
+
+    def __init__(self, es: AsyncElasticsearch):
+        self.es = es
+        self.indexed = 0
+        self.relaxed = set()  # Indices whose settings are relaxed for this load
+
+    async def prepare(self):
+        await ensure_index_template(self.es)
+
+    async def write(self, batch: MessageBatch) -> int:
+        success, errors = await insert_batch(self.es, batch)
+        self.indexed += success
+        threshold = get_settings().es_relax_settings_after_docs
+        if threshold and self.indexed >= threshold:
+            # Indices exist once written to, so relax each as soon as the load reaches it
+            for index_name in {index_for_month(month) for month in batch.months()} - self.relaxed:
+                await relax_for_bulk_load(self.es, index_name)
+                self.relaxed.add(index_name)
+        # Only documents Elasticsearch acknowledged count as stored
+        return success
+
+    async def finish(self):
+        for index_name in sorted(self.relaxed):
+            await restore_after_bulk_load(self.es, index_name)
+        self.relaxed.clear()
+
+async def export_chat(token, channel_id, es: AsyncElasticsearch, redis=None, progress: ExportProgress = None):
     """
     Orchestrates the export and indexing of chat messages,
-    handling batching and insertion errors.
+    handling batching and insertion errors. When a Redis connection is given,
+    the export resumes from the channel's watermark and advances it on success.
+    Message counts and stage timings are recorded on ``progress`` when given.
     """
     try:
-        now = datetime.now()
-        days_ago = now - timedelta(days=7)
-        formatted_date = days_ago.strftime("%Y-%m-%d")
-
-        messages = await execute_export_command(token, channel_id, formatted_date)
-
-        # Calculate and manage the batching of messages for insertion
-        batch_size = 1000
-        total_inserted = 0
-        total_messages = len(messages)
-
-        index_name = await create_index_if_not_exists(now.strftime("%Y-%m-%d"))
-
-        for i in range(0, total_messages, batch_size):
-            batch = messages[i:i + batch_size]
-            try:
-                responses = await insert_batch(batch, channel_id, index_name)
-                total_inserted += len(batch)
-            except Exception as e:
-                logger.error(f"Failed to insert batch due to: {e}")
-                continue
+        results = await run_export(token, channel_id, [ElasticsearchWriter(es)],
+                                   redis=redis, progress=progress)
+        result = results[SINK_ELASTICSEARCH]
 
-        if total_inserted < total_messages:
+        if not result.complete:
             raise HTTPException(status_code=500,
-                                detail=f"Failed to insert some messages. Successfully inserted: {total_inserted}, Failed: {total_messages - total_inserted}")
+                                detail=f"Failed to insert some messages. Successfully inserted: {result.total_inserted}, Failed: {result.total_messages - result.total_inserted}")
 
-        return {"message": f"Successfully inserted {total_inserted} messages into the database."}
+        return {"message": f"Successfully inserted {result.total_inserted} messages into the database.",
+                "months": sorted(result.months)}
     except Exception as e:
         logger.exception("Failed to export chat")
         raise HTTPException(status_code=500, detail=str(e))
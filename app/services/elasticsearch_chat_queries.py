@@ -1,32 +1,126 @@
 from fastapi import FastAPI, Query, HTTPException
-from elasticsearch import Elasticsearch
-from typing import List
+from elasticsearch import AsyncElasticsearch, NotFoundError
+from typing import List, Optional
+from datetime import date
 
 from app.schemas import PaginationParams
+from app.services.cursor import decode_cursor, encode_cursor
+from app.services.es_indices import indices_for_range
+from app.services.metrics import ES_REQUEST_SECONDS
+from app.settings import get_settings
 
-async def paginated_es_search_by_keyword(keyword: str, pagination: PaginationParams, es: Elasticsearch):
+# Every sort ends with message_id so positions are unique and do not depend on the
+# point in time they were read from
+KEYWORD_SORT = [{"_score": "desc"}, {"message_id": "asc"}]
+DATE_SORT = [{"message_date": "asc"}, {"message_id": "asc"}]
+
+# from + size beyond this fails in Elasticsearch (index.max_result_window)
+MAX_RESULT_WINDOW = 10000
+
+def date_range_filter(start_date, end_date):
+    """Builds a message_date range clause; either bound may be omitted."""
+    bounds = {"format": "yyyy-MM-dd"}
+    if start_date:
+        bounds["gte"] = str(start_date)
+    if end_date:
+        bounds["lte"] = str(end_date)
+    return {"range": {"message_date": bounds}}
+
+def decode_es_cursor(cursor: str):
+    """Decodes an Elasticsearch cursor into its point-in-time id (or None) and sort position."""
+    position = decode_cursor(cursor)
+    if not isinstance(position, dict) or not isinstance(position.get("after"), list):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return position.get("pit"), position["after"]
+
+def es_cache_key(pagination: PaginationParams) -> str:
+    """
+    Cache key suffix for a page. Cursor pages are keyed by their sort position only,
+    as the point-in-time id in the cursor changes from page to page.
+    """
+    if pagination.cursor:
+        _, after = decode_es_cursor(pagination.cursor)
+        return f"after:{encode_cursor(after)}:size:{pagination.page_size}"
+    return pagination.cache_key()
+
+async def open_point_in_time(es: AsyncElasticsearch, indices) -> str:
+    with ES_REQUEST_SECONDS.labels("open_point_in_time").time():
+        response = await es.open_point_in_time(index=indices, keep_alive=get_settings().es_pit_keep_alive,
+                                               ignore_unavailable=True)
+    return response["id"]
+
+async def search_page(es: AsyncElasticsearch, indices, query, sort, pagination: PaginationParams):
+    """
+    Runs one page of a sorted search and returns the hits' sources, the total hit count
+    and the cursor of the next page (None on the last page).
+
+    Page numbers use from/size. Cursor pages continue with search_after inside a point
+    in time (PIT), so each page costs the same regardless of depth and a scan sees one
+    consistent snapshot. The first cursor page opens the PIT, later pages keep it alive
+    and the last page closes it. Should a PIT expire, the scan continues in a new one
+    from the same sort position.
+    """
+    body = {"query": query, "sort": sort, "size": pagination.page_size}
+    pit_id = None
+    if pagination.cursor:
+        pit_id, after = decode_es_cursor(pagination.cursor)
+        body["search_after"] = after
+        if pit_id is None:
+            pit_id = await open_point_in_time(es, indices)
+        keep_alive = get_settings().es_pit_keep_alive
+        try:
+            with ES_REQUEST_SECONDS.labels("search").time():
+                response = await es.search(body={**body, "pit": {"id": pit_id, "keep_alive": keep_alive}})
+        except NotFoundError:
+            pit_id = await open_point_in_time(es, indices)
+            with ES_REQUEST_SECONDS.labels("search").time():
+                response = await es.search(body={**body, "pit": {"id": pit_id, "keep_alive": keep_alive}})
+        pit_id = response.get("pit_id", pit_id)
+    else:
+        from_ = (pagination.page - 1) * pagination.page_size
+        if from_ + pagination.page_size > MAX_RESULT_WINDOW:
+            raise HTTPException(status_code=400,
+                                detail=f"Pages beyond {MAX_RESULT_WINDOW} results require cursor pagination")
+        # Months without an index yet are skipped rather than failing the search
+        with ES_REQUEST_SECONDS.labels("search").time():
+            response = await es.search(index=indices, ignore_unavailable=True, allow_no_indices=True,
+                                       body={**body, "from": from_})
+
+    hits = response['hits']['hits']
+    next_cursor = None
+    if len(hits) == pagination.page_size:
+        next_cursor = encode_cursor({"pit": pit_id, "after": hits[-1]['sort']})
+    elif pit_id is not None:
+        # The scan is complete; release the PIT instead of waiting for it to expire
+        try:
+            await es.close_point_in_time(id=pit_id)
+        except NotFoundError:
+            pass
+    return [doc['_source'] for doc in hits], response['hits']['total']['value'], next_cursor
+
+async def paginated_es_search_by_keyword(keyword: str, pagination: PaginationParams, es: AsyncElasticsearch,
+                                         start_date: Optional[date] = None, end_date: Optional[date] = None):
     """
     Performs a paginated search for documents in Elasticsearch based on a given keyword.
     Utilizes a specified analyzer for text matching to ensure the relevance of search results.
+    Optional start and end dates restrict the search to messages, and monthly indices,
+    within that window. Returns the documents, the total hits and the next page's cursor.
     """
     try:
-        # Calculate the offset for the pagination
-        from_ = (pagination.page - 1) * pagination.page_size
-        # Construct and execute the search query in Elasticsearch
-        response = es.search(index="chats-*", body={
-            "query": {
-                "match": {
-                    "content": {
-                        "query": keyword,
-                        "analyzer": "discord_analyzer"
-                    }
+        query = {
+            "match": {
+                "content": {
+                    "query": keyword,
+                    "analyzer": "discord_analyzer"
                 }
-            },
-            "from": from_,
-            "size": pagination.page_size
-        })
-        # Extract and return the relevant documents and the total number of hits
-        return [doc['_source'] for doc in response['hits']['hits']], response['hits']['total']['value']
+            }
+        }
+        if start_date or end_date:
+            query = {"bool": {"must": [query], "filter": [date_range_filter(start_date, end_date)]}}
+        # Construct and execute the search query in Elasticsearch, reading only the overlapping indices
+        return await search_page(es, indices_for_range(start_date, end_date), query, KEYWORD_SORT, pagination)
+    except HTTPException:
+        raise
     except Exception as e:
         # Handle any exceptions that occur during the search by raising an HTTPException
         raise HTTPException(status_code=500, detail=str(e))
@@ -35,30 +129,17 @@ async def paginated_es_search_by_date_range(
         start_date: str,
         end_date: str,
         pagination: PaginationParams,
-        es: Elasticsearch):
+        es: AsyncElasticsearch):
     """
-    Conducts a paginated search in Elasticsearch for documents within a specified date range.
-    Handles the pagination logic and formats the dates to be compatible with Elasticsearch.
+    Conducts a paginated search in Elasticsearch for documents within a specified date range,
+    ordered by message date. Returns the documents, the total hits and the next page's cursor.
     """
     try:
-        # Calculate the starting point for the results to fetch, based on the current page
-        from_ = (pagination.page - 1) * pagination.page_size
-        # Execute the search with a date range filter
-        response = es.search(index="chats-*", body={
-            "query": {
-                "range": {
-                    "message_date": {
-                        "gte": start_date,
-                        "lte": end_date,
-                        "format": "yyyy-MM-dd"
-                    }
-                }
-            },
-            "from": from_,
-            "size": pagination.page_size
-        })
-        # Return the documents found and the total count of the results
-        return [doc['_source'] for doc in response['hits']['hits']], response['hits']['total']['value']
+        # Execute the search with a date range filter against the months it overlaps
+        return await search_page(es, indices_for_range(start_date, end_date),
+                                 date_range_filter(start_date, end_date), DATE_SORT, pagination)
+    except HTTPException:
+        raise
     except Exception as e:
         # If an error occurs, handle it by throwing an HTTPException with the error details
         raise HTTPException(status_code=500, detail=str(e))
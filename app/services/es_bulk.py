@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+
+from elasticsearch import ApiError, AsyncElasticsearch
+from elastic_transport import TransportError
+
+from ..settings import get_settings
+from .metrics import ES_REQUEST_SECONDS
+
+# Set up logging for bulk indexing
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Per-document statuses worth retrying: rejected by a full write queue, or a version
+# conflict with a concurrent write of the same message
+RETRYABLE_STATUSES = (429, 409)
+
+
+def _serialize(action) -> list:
+    """Turns a helper-style index action into its two NDJSON lines for the _bulk API."""
+    header = {"index": {"_index": action["_index"], "_id": action["_id"]}}
+    return [json.dumps(line, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+            for line in (header, action["_source"])]
+
+
+def _chunks(actions, max_docs: int, max_bytes: int):
+    """Groups serialized actions into chunks bounded by document count and request bytes."""
+    chunk, size = [], 0
+    for action in actions:
+        lines = _serialize(action)
+        action_size = sum(len(line) + 1 for line in lines)  # +1 for each trailing newline
+        if chunk and (len(chunk) >= max_docs or size + action_size > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(lines)
+        size += action_size
+    if chunk:
+        yield chunk
+
+
+async def _send_chunk(es: AsyncElasticsearch, chunk):
+    """
+    Sends one chunk, re-sending only the documents rejected with a retryable status,
+    with exponential backoff. Returns the number of indexed documents and the
+    per-document errors of those that could not be indexed.
+    """
+    settings = get_settings()
+    success, errors = 0, []
+    pending = chunk
+    for attempt in range(settings.es_bulk_max_retries + 1):
+        can_retry = attempt < settings.es_bulk_max_retries
+        retry = []
+        try:
+            with ES_REQUEST_SECONDS.labels("bulk").time():
+                response = await es.bulk(operations=[line for lines in pending for line in lines])
+        except ApiError as e:
+            # The whole request was rejected, e.g. 429 when the cluster is overloaded
+            if e.status_code in RETRYABLE_STATUSES and can_retry:
+                retry = pending
+            else:
+                errors.extend({"index": {"status": e.status_code, "error": str(e)}} for _ in pending)
+        except TransportError as e:
+            # The client already retried connection errors and timeouts
+            errors.extend({"index": {"status": None, "error": str(e)}} for _ in pending)
+        else:
+            for lines, item in zip(pending, response["items"]):
+                op_type, result = next(iter(item.items()))
+                status = result.get("status", 500)
+                if 200 <= status < 300:
+                    success += 1
+                elif status in RETRYABLE_STATUSES and can_retry:
+                    retry.append(lines)
+                else:
+                    errors.append({op_type: result})
+        if not retry:
+            break
+        delay = min(settings.es_bulk_max_backoff, settings.es_bulk_initial_backoff * 2 ** attempt)
+        logger.warning(f"Retrying {len(retry)} rejected documents in {delay:.1f}s")
+        await asyncio.sleep(delay)
+        pending = retry
+    return success, errors
+
+
+async def bulk_index(es: AsyncElasticsearch, actions):
+    """
+    Indexes helper-style actions (``_index``, ``_id``, ``_source``) with up to
+    ``es_bulk_concurrency`` bulk requests in flight. Actions are consumed lazily and
+    chunked by ``es_bulk_chunk_docs`` and ``es_bulk_chunk_bytes``. Returns the number
+    of indexed documents and the list of per-document errors, like ``helpers.bulk``.
+    """
+    settings = get_settings()
+    slots = asyncio.Semaphore(settings.es_bulk_concurrency)
+    tasks = []
+    try:
+        for chunk in _chunks(actions, settings.es_bulk_chunk_docs, settings.es_bulk_chunk_bytes):
+            # Waiting for a free slot also stops serializing further chunks
+            await slots.acquire()
+            task = asyncio.ensure_future(_send_chunk(es, chunk))
+            task.add_done_callback(lambda _: slots.release())
+            tasks.append(task)
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    success = sum(indexed for indexed, _ in results)
+    errors = [error for _, chunk_errors in results for error in chunk_errors]
+    return success, errors
+
+
+async def relax_for_bulk_load(es: AsyncElasticsearch, index_name: str):
+    """Disables refreshes and replicas on an index so a large load writes each document once."""
+    await es.indices.put_settings(index=index_name, settings={
+        "index": {"refresh_interval": "-1", "number_of_replicas": 0}
+    })
+
+
+async def restore_after_bulk_load(es: AsyncElasticsearch, index_name: str):
+    """
+    Puts the configured refresh interval and replica count back after a bulk load and
+    refreshes the index so the loaded documents become searchable. The configured
+    values are used rather than the ones seen before relaxing, as a concurrent load
+    into the same index may already have relaxed them.
+    """
+    settings = get_settings()
+    await es.indices.put_settings(index=index_name, settings={
+        "index": {"refresh_interval": settings.es_refresh_interval,
+                  "number_of_replicas": settings.es_number_of_replicas}
+    })
+    await es.indices.refresh(index=index_name)
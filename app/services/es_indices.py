@@ -0,0 +1,98 @@
+import logging
+from datetime import date
+from functools import lru_cache
+
+from elasticsearch import AsyncElasticsearch
+
+from ..settings import get_settings
+from .search_cache import month_scopes
+
+# Set up logging for index management
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Messages are routed to one index per month of their message_date, e.g. chats-2024-05
+INDEX_PREFIX = "chats-"
+INDEX_PATTERN = f"{INDEX_PREFIX}*"
+TEMPLATE_NAME = "chats"
+
+# Wider searches use the pattern rather than listing every monthly index in the URL
+MAX_TARGETED_INDICES = 36
+
+# Whether this process has already installed the index template
+_template_installed = False
+
+
+def index_for_month(month: str) -> str:
+    """Returns the index holding messages of a month ('YYYY-MM')."""
+    return f"{INDEX_PREFIX}{month}"
+
+
+@lru_cache(maxsize=4096)
+def index_for_ordinal(ordinal: int) -> str:
+    """Returns the index of a message from the proleptic ordinal of its date."""
+    return index_for_month(date.fromordinal(ordinal).strftime("%Y-%m"))
+
+
+def indices_for_range(start_date: date = None, end_date: date = None):
+    """
+    Lists the indices a search over the inclusive date range has to read. Searches
+    without a full range, or spanning very many months, read every chats index.
+    """
+    if not start_date or not end_date:
+        return [INDEX_PATTERN]
+    months = month_scopes(start_date, end_date)
+    if len(months) > MAX_TARGETED_INDICES:
+        return [INDEX_PATTERN]
+    return [index_for_month(month) for month in months]
+
+
+def index_template() -> dict:
+    """Settings and mappings applied to every chats index when it is first written to."""
+    settings = get_settings()
+    return {
+        "settings": {
+            "refresh_interval": settings.es_refresh_interval,
+            "number_of_replicas": settings.es_number_of_replicas,
+            "analysis": {
+                "analyzer": {
+                    "discord_analyzer": {
+                        "tokenizer": "standard",
+                        "filter": ["lowercase", "english_stop", "english_stemmer"]
+                    }
+                },
+                "filter": {
+                    "english_stop": {
+                        "type": "stop",
+                        "stopwords": "_english_"
+                    },
+                    "english_stemmer": {
+                        "type": "stemmer",
+                        "language": "possessive_english"
+                    }
+                }
+            }
+        },
+        "mappings": {
+            "properties": {
+                "message_id": {"type": "keyword"},
+                "channel_id": {"type": "keyword"},
+                "message_date": {"type": "date", "format": "yyyy-MM-dd"},
+                "content": {"type": "text", "analyzer": "discord_analyzer"}
+            }
+        }
+    }
+
+
+async def ensure_index_template(es: AsyncElasticsearch):
+    """
+    Installs (or updates) the composable index template for chats indices, once per
+    process. Monthly indices are then created implicitly by the first bulk write.
+    """
+    global _template_installed
+    if _template_installed:
+        return
+    await es.indices.put_index_template(name=TEMPLATE_NAME, index_patterns=[INDEX_PATTERN],
+                                        template=index_template(), priority=100)
+    _template_installed = True
+    logger.info(f"Installed index template '{TEMPLATE_NAME}' for {INDEX_PATTERN}")
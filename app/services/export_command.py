@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import os
+import re
+import shlex
+import uuid
+from datetime import datetime
+
+from ..settings import get_settings
+
+# Set up logging for exporter CLI runs
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# stderr of an export whose period contains no messages; not an error for incremental syncs
+NO_MESSAGES_ERROR = re.compile('not contain any messages within the specified period')
+
+
+def export_filename(channel_id) -> str:
+    """
+    Builds a unique output path for one export. Concurrent exports (e.g. several jobs
+    in one worker) may start within the same second, so a random suffix is added.
+    """
+    return f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{channel_id}_{uuid.uuid4().hex[:8]}.json"
+
+
+async def start_export_command(token, channel_id, formatted_date, filename):
+    """
+    Starts the configured DiscordChatExporter CLI writing the channel's messages after
+    ``formatted_date`` to ``filename`` as JSON, and returns the running process.
+    """
+    return await asyncio.create_subprocess_exec(
+        *shlex.split(get_settings().exporter_command), "export",
+        "-t", token, "-c", channel_id, "-f", "Json",
+        "--after", formatted_date, "--output", filename,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+
+
+def check_export_result(returncode: int, stderr: bytes) -> bool:
+    """
+    Interprets a finished export: True if it wrote messages, False if the period had
+    none. Raises RuntimeError for any other failure.
+    """
+    if returncode == 0:
+        return True
+    error = stderr.decode(errors='replace')
+    if NO_MESSAGES_ERROR.search(error):
+        return False
+    logger.error(f"Export failed: {error}")
+    raise RuntimeError(f"Export failed: {error}")
+
+
+def remove_export_file(filename):
+    """Deletes an export file once it has been loaded, unless ``export_keep_files`` is set."""
+    if get_settings().export_keep_files:
+        return
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+from ..settings import get_settings
+from . import search_cache
+from .export_progress import ExportProgress
+from .export_watermark import SINK_ELASTICSEARCH, SINK_POSTGRES
+
+# Set up logging for job processing
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Export jobs are entries of a Redis stream consumed by a group of worker processes
+STREAM = "export_jobs"
+GROUP = "export_workers"
+DEAD_LETTER_STREAM = "export_jobs:dead"  # Jobs that exhausted their attempts
+
+# "all" exports once and loads both sinks from the same run
+SINK_ALL = "all"
+SINKS = (SINK_POSTGRES, SINK_ELASTICSEARCH, SINK_ALL)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_RETRYING = "retrying"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+
+# Redis keys recording when each sink last received an export
+LAST_EXPORT_TIME_KEYS = {
+    SINK_POSTGRES: "last_export_time",
+    SINK_ELASTICSEARCH: "last_export_time_elastic",
+}
+
+_INT_FIELDS = ("attempts", "messages_parsed", "messages_inserted")
+_FLOAT_FIELDS = ("enqueued_at", "started_at", "finished_at")
+_JSON_FIELDS = ("inserted_by_sink", "stage_seconds")
+
+
+def job_key(job_id: str) -> str:
+    """Builds the Redis key of the hash holding a job's status and progress."""
+    return f"export_job:{job_id}"
+
+
+def token_key(job_id: str) -> str:
+    """Builds the Redis key holding a queued job's Discord token."""
+    return f"export_job_token:{job_id}"
+
+
+async def record_export(redis, sink: str, response: dict):
+    """
+    Bookkeeping after a successful export, shared by the synchronous endpoints and
+    the workers: stamps the sink's last export time and invalidates the cached
+    searches over the exported months.
+    """
+    await redis.set(LAST_EXPORT_TIME_KEYS[sink], int(time.time()))
+    await search_cache.invalidate(redis, sink, response["months"])
+
+
+async def enqueue(redis, sink: str, channel_id: str, token: str) -> str:
+    """
+    Queues an export of a channel into a sink and returns the job id. The Discord
+    token is kept out of the stream, where every pending and retried entry stays
+    readable. It is stored under its own key, which expires after
+    ``export_job_token_ttl`` seconds and is deleted once the job finishes.
+    """
+    job_id = uuid.uuid4().hex
+    pipe = redis.pipeline()
+    pipe.hset(job_key(job_id), mapping={
+        "job_id": job_id,
+        "sink": sink,
+        "channel_id": channel_id,
+        "status": STATUS_QUEUED,
+        "attempts": 0,
+        "enqueued_at": time.time(),
+    })
+    pipe.set(token_key(job_id), token, ex=get_settings().export_job_token_ttl)
+    pipe.xadd(STREAM, {"job_id": job_id, "sink": sink, "channel_id": channel_id})
+    await pipe.execute()
+    return job_id
+
+
+async def get_job(redis, job_id: str):
+    """Returns a job's status record as a dict, or None if it is unknown or expired."""
+    fields = await redis.hgetall(job_key(job_id))
+    if not fields:
+        return None
+    job = {_decode(key): _decode(value) for key, value in fields.items()}
+    for field in _INT_FIELDS:
+        if field in job:
+            job[field] = int(job[field])
+    for field in _FLOAT_FIELDS:
+        if job.get(field):
+            job[field] = float(job[field])
+    for field in _JSON_FIELDS:
+        job[field] = json.loads(job.get(field) or "{}")
+    return job
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+async def ensure_group(redis):
+    """Creates the stream and its consumer group if they do not exist yet."""
+    try:
+        await redis.xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def read_new(redis, consumer: str, count: int, block_ms: int):
+    """Reads up to ``count`` jobs never delivered to any worker, blocking up to ``block_ms``."""
+    response = await redis.xreadgroup(GROUP, consumer, {STREAM: ">"}, count=count, block=block_ms)
+    return [entry for _, entries in response or () for entry in entries]
+
+
+async def claim_stale(redis, consumer: str, count: int):
+    """
+    Takes over up to ``count`` jobs that have not been acknowledged or renewed for
+    ``export_job_retry_idle_seconds``: jobs that failed and are due for a retry, and
+    jobs of workers that died mid-export.
+    """
+    idle_ms = get_settings().export_job_retry_idle_seconds * 1000
+    pending = await redis.xpending_range(STREAM, GROUP, "-", "+", count * 4)
+    stale = [item["message_id"] for item in pending if item["time_since_delivered"] >= idle_ms][:count]
+    if not stale:
+        return []
+    claimed = await redis.xclaim(STREAM, GROUP, consumer, idle_ms, stale)
+    # Entries deleted after being delivered come back empty
+    return [(entry_id, fields) for entry_id, fields in claimed if entry_id is not None and fields]
+
+
+async def _heartbeat(redis, consumer: str, entry_id, key: str, progress: ExportProgress):
+    """Publishes progress and renews the claim on a running job so no other worker retries it."""
+    interval = get_settings().export_job_heartbeat_seconds
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await redis.hset(key, mapping=progress.as_fields())
+            await redis.xclaim(STREAM, GROUP, consumer, 0, [entry_id], justid=True)
+        except Exception as e:
+            logger.warning(f"Failed to report progress of {key}: {e}")
+
+
+async def _finish(redis, entry_id, job_id: str, fields: dict):
+    """Stores a job's final state, removes its stream entry and token and lets the record expire."""
+    key = job_key(job_id)
+    pipe = redis.pipeline()
+    pipe.delete(token_key(job_id))
+    pipe.hset(key, mapping=fields)
+    pipe.expire(key, get_settings().export_job_ttl)
+    pipe.xack(STREAM, GROUP, entry_id)
+    pipe.xdel(STREAM, entry_id)
+    await pipe.execute()
+
+
+async def _dead_letter(redis, entry_id, job: dict, attempts: int, error: str):
+    logger.error(f"Export job {job['job_id']} failed after {attempts} attempts: {error}")
+    await redis.xadd(DEAD_LETTER_STREAM, {**job, "attempts": attempts, "error": error})
+    await _finish(redis, entry_id, job["job_id"], {"status": STATUS_FAILED, "error": error, "finished_at": time.time()})
+
+
+async def process_entry(redis, consumer: str, entry_id, fields: dict, run):
+    """
+    Runs one delivered job with ``run(sink, token, channel_id, progress)``. Successful
+    jobs are acknowledged; failed ones stay pending so ``claim_stale`` retries them
+    after the retry idle time, until ``export_job_max_attempts`` is reached and the
+    job is moved to the dead-letter stream.
+    """
+    fields = {_decode(name): _decode(value) for name, value in fields.items()}
+    job = {name: fields[name] for name in ("job_id", "sink", "channel_id")}
+    key = job_key(job["job_id"])
+    max_attempts = get_settings().export_job_max_attempts
+
+    attempts = await redis.hincrby(key, "attempts", 1)
+    if attempts > max_attempts:
+        # The previous attempt died without recording its outcome
+        await _dead_letter(redis, entry_id, job, attempts - 1, "Worker stopped while running the job")
+        return
+    token = _decode(await redis.get(token_key(job["job_id"])))
+    if token is None:
+        await _dead_letter(redis, entry_id, job, attempts, "The job's Discord token expired before it could run")
+        return
+
+    await redis.hset(key, mapping={"status": STATUS_RUNNING, "worker": consumer, "started_at": time.time()})
+    progress = ExportProgress()
+    heartbeat = asyncio.ensure_future(_heartbeat(redis, consumer, entry_id, key, progress))
+    try:
+        response = await run(job["sink"], token, job["channel_id"], progress)
+    except Exception as e:
+        error = str(getattr(e, "detail", None) or e)
+        heartbeat.cancel()
+        await redis.hset(key, mapping=progress.as_fields())
+        if attempts >= max_attempts:
+            await _dead_letter(redis, entry_id, job, attempts, error)
+        else:
+            logger.warning(f"Export job {job['job_id']} failed (attempt {attempts}), will retry: {error}")
+            await redis.hset(key, mapping={"status": STATUS_RETRYING, "error": error})
+        return
+    finally:
+        heartbeat.cancel()
+
+    await _finish(redis, entry_id, job["job_id"], {
+        **progress.as_fields(),
+        "status": STATUS_SUCCEEDED,
+        "result": response["message"],
+        "error": "",
+        "finished_at": time.time(),
+    })
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+
+from ..settings import get_settings
+from .export_command import check_export_result, export_filename, remove_export_file, start_export_command
+from .export_progress import ExportProgress
+from .export_stream import batch_messages, tail_messages
+from .export_watermark import advance_watermark, export_after, get_watermark
+from .message_batch import MessageBatch
+from .metrics import observe_export
+
+# Set up logging for the export pipeline
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Batch size used when no writer asks for a different one
+DEFAULT_BATCH_SIZE = 1000
+
+
+class SinkWriter:
+    """
+    A destination fed by the export pipeline. Subclasses name their ``sink`` and
+    implement ``write``; ``batch_size`` may be a callable to adapt it while loading.
+    """
+    sink = None
+    batch_size = DEFAULT_BATCH_SIZE
+
+    async def prepare(self):
+        """Runs once before the first batch, e.g. to create the target index."""
+
+    async def write(self, batch: MessageBatch) -> int:
+        """Stores a batch of exported messages and returns how many were stored."""
+        raise NotImplementedError
+
+    async def finish(self):
+        """Runs once after the last batch, even if the export failed."""
+
+
+class SinkResult:
+    """Outcome of an export for one sink."""
+
+    def __init__(self, sink: str):
+        self.sink = sink
+        self.total_messages = 0
+        self.total_inserted = 0
+        self.highest_message_id = 0
+        self.months = set()  # Monthly partitions that received messages, for cache invalidation
+
+    @property
+    def complete(self) -> bool:
+        return self.total_inserted >= self.total_messages
+
+    def as_response(self) -> dict:
+        return {"message": f"Successfully inserted {self.total_inserted} messages into the {self.sink} store.",
+                "months": sorted(self.months)}
+
+
+def _shared_batch_size(writers):
+    """Batches are shared by every sink, so they follow the smallest size any writer asks for."""
+    sizes = [writer.batch_size for writer in writers]
+    if not any(callable(size) for size in sizes):
+        return min(sizes)
+    return lambda: min(size() if callable(size) else size for size in sizes)
+
+
+async def _run_cli(process, progress: ExportProgress):
+    with progress.timed("export"):
+        return await process.communicate()
+
+
+async def _produce(filename, cli, channel_id, queues, batch_size, progress: ExportProgress):
+    """
+    Parses the export while it is being written, converts each batch to its columnar
+    form once and hands it to every sink's queue.
+    """
+    messages = tail_messages(filename, cli.done)
+    async for messages in progress.track_batches(batch_messages(messages, batch_size)):
+        with progress.timed("transform"):
+            batch = MessageBatch.from_messages(messages, channel_id)
+        for queue in queues:
+            # Blocks while the slowest sink's queue is full, which throttles parsing to its pace
+            await queue.put(batch)
+    for queue in queues:
+        await queue.put(None)
+
+
+async def _consume(writer: SinkWriter, queue: asyncio.Queue, result: SinkResult, progress: ExportProgress):
+    """Writes batches from a queue to one sink, counting what was stored."""
+    await writer.prepare()
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            result.total_messages += len(batch)
+            try:
+                with progress.timed(writer.sink):
+                    inserted = await writer.write(batch)
+            except Exception as e:
+                logger.error(f"Failed to write a batch to {writer.sink}: {getattr(e, 'detail', e)}")
+                continue  # Counted as missing; the watermark of this sink is not advanced
+            result.total_inserted += inserted
+            progress.add_inserted(writer.sink, inserted)
+            result.highest_message_id = max(result.highest_message_id, batch.highest_message_id)
+            result.months.update(batch.months())
+    finally:
+        try:
+            await writer.finish()
+        except Exception as e:
+            logger.error(f"Failed to finish writing to {writer.sink}: {e}")
+
+
+async def _run_stages(tasks):
+    """Waits for every stage, cancelling the rest as soon as one of them fails."""
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_export(token, channel_id, writers, redis=None, progress: ExportProgress = None):
+    """
+    Exports a channel with a single exporter CLI run and streams it to every writer at
+    once: the file is parsed while the CLI is still writing it, and each batch fans out
+    to one bounded queue per sink, so exporting, parsing and loading overlap and a slow
+    sink applies backpressure instead of buffering the export in memory.
+
+    With a Redis connection the export starts from the oldest watermark of the sinks;
+    sinks that are further ahead re-receive a few messages, which their idempotent
+    writes ignore. Each sink's watermark is advanced only if it stored every message.
+    Returns a dict of sink name to ``SinkResult``.
+    """
+    settings = get_settings()
+    start_time = time.perf_counter()
+    progress = progress or ExportProgress()
+    progress.start_sinks(writer.sink for writer in writers)
+
+    watermarks = [await get_watermark(redis, writer.sink, channel_id) if redis else None for writer in writers]
+    watermark = None if None in watermarks else min(watermarks)
+    formatted_date = export_after(watermark, settings.export_overlap_minutes, settings.export_initial_days)
+
+    filename = export_filename(channel_id)
+    process = await start_export_command(token, channel_id, formatted_date, filename)
+    cli = asyncio.ensure_future(_run_cli(process, progress))
+    queues = [asyncio.Queue(maxsize=settings.export_pipeline_queue_size) for _ in writers]
+    results = {writer.sink: SinkResult(writer.sink) for writer in writers}
+    stages = [asyncio.ensure_future(_produce(filename, cli, channel_id, queues, _shared_batch_size(writers), progress))]
+    stages += [asyncio.ensure_future(_consume(writer, queue, results[writer.sink], progress))
+               for writer, queue in zip(writers, queues)]
+    try:
+        try:
+            await _run_stages(stages)
+        except ValueError:
+            # A truncated export usually means the CLI failed midway; report its error instead
+            if cli.done():
+                check_export_result(process.returncode, cli.result()[1])
+            raise
+        _, stderr = await cli
+        check_export_result(process.returncode, stderr)
+    finally:
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+        if not cli.done():
+            cli.cancel()
+        await asyncio.gather(cli, return_exceptions=True)
+        remove_export_file(filename)
+    observe_export(progress, results, time.perf_counter() - start_time)
+
+    # Only advance a sink's watermark once every message up to it is stored
+    if redis:
+        for result in results.values():
+            if result.complete and result.highest_message_id:
+                await advance_watermark(redis, result.sink, channel_id, result.highest_message_id)
+    return results
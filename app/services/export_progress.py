@@ -0,0 +1,63 @@
+import json
+import time
+from contextlib import contextmanager
+
+
+class ExportProgress:
+    """
+    Counters and per-stage wall times of a single export run. Exporters update it as
+    they go; export jobs periodically copy it into their status record.
+    """
+
+    def __init__(self):
+        self.stage = None  # Stage currently running, e.g. "export", "parse" or "insert"
+        self.messages_parsed = 0
+        self.messages_inserted = 0  # Messages stored in every sink of the export
+        self.inserted_by_sink = {}  # sink -> messages stored there
+        self.stage_seconds = {}  # stage -> accumulated seconds
+
+    def start_sinks(self, sinks):
+        """Registers the sinks an export writes to before any of them has stored a message."""
+        self.inserted_by_sink = dict.fromkeys(sinks, 0)
+
+    def add_inserted(self, sink: str, count: int):
+        self.inserted_by_sink[sink] = self.inserted_by_sink.get(sink, 0) + count
+        self.messages_inserted = min(self.inserted_by_sink.values())
+
+    def add_time(self, stage: str, seconds: float):
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Attributes the wall time of the block to ``stage``."""
+        self.stage = stage
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    async def track_batches(self, batches):
+        """
+        Re-yields the batches of an async iterator, counting their messages as parsed
+        and attributing the time spent waiting for each one to the "parse" stage.
+        """
+        iterator = batches.__aiter__()
+        while True:
+            with self.timed("parse"):
+                try:
+                    batch = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+            self.messages_parsed += len(batch)
+            yield batch
+
+    def as_fields(self) -> dict:
+        """Flattens the progress into string fields for a Redis hash."""
+        return {
+            "stage": self.stage or "",
+            "messages_parsed": self.messages_parsed,
+            "messages_inserted": self.messages_inserted,
+            "inserted_by_sink": json.dumps(self.inserted_by_sink),
+            "stage_seconds": json.dumps({stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()}),
+        }
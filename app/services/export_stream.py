@@ -0,0 +1,189 @@
+import asyncio
+import codecs
+import json
+import os
+import re
+
+from aiofiles import open as aio_open
+
+# Matches the insignificant whitespace allowed between JSON tokens
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Number of characters read from the export file per chunk
+READ_CHUNK_SIZE = 1 << 20
+
+# Seconds to wait before re-reading an export file that is still being written
+TAIL_POLL_INTERVAL = 0.1
+
+# Sentinel returned by the parser when the buffer ends mid-value
+_INCOMPLETE = object()
+
+
+class MessageStreamParser:
+    """
+    Incrementally parses a DiscordChatExporter JSON export, yielding the entries
+    of its top-level ``messages`` array one at a time. Only the message currently
+    being decoded is buffered, so memory stays flat regardless of export size.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"  # start -> key -> colon -> value -> (messages) -> key ... -> done
+        self._key = None
+
+    def feed(self, chunk: str):
+        """Adds a chunk of raw export text and returns the messages completed by it."""
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return self._parse(final=False)
+
+    def close(self):
+        """Flushes the remaining buffer, raising if the document is incomplete."""
+        messages = self._parse(final=True)
+        if self._state != "done":
+            raise ValueError("Export file ended before the JSON document was complete")
+        return messages
+
+    def _skip_whitespace(self):
+        self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+        return self._pos < len(self._buffer)
+
+    def _decode_value(self, final):
+        """Decodes one JSON value at the cursor, or returns a sentinel if more data is needed."""
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return _INCOMPLETE
+        # A value touching the end of the buffer may be a truncated number; wait for more
+        if end >= len(self._buffer) and not final:
+            return _INCOMPLETE
+        self._pos = end
+        return value
+
+    def _parse(self, final):
+        messages = []
+        while self._state != "done" and self._skip_whitespace():
+            char = self._buffer[self._pos]
+            if self._state == "start":
+                if char != "{":
+                    raise ValueError("Export file does not contain a JSON object")
+                self._pos += 1
+                self._state = "key"
+            elif self._state == "key":
+                if char == ",":
+                    self._pos += 1
+                    continue
+                if char == "}":
+                    self._pos += 1
+                    self._state = "done"
+                    continue
+                key = self._decode_value(final)
+                if key is _INCOMPLETE:
+                    break
+                self._key = key
+                self._state = "colon"
+            elif self._state == "colon":
+                if char != ":":
+                    raise ValueError(f"Expected ':' after key {self._key!r}")
+                self._pos += 1
+                self._state = "value"
+            elif self._state == "value":
+                if self._key == "messages":
+                    if char != "[":
+                        raise ValueError("Expected 'messages' to be a JSON array")
+                    self._pos += 1
+                    self._state = "messages"
+                    continue
+                # Other top-level fields (guild, channel, dateRange, ...) are small; skip them
+                value = self._decode_value(final)
+                if value is _INCOMPLETE:
+                    break
+                self._state = "key"
+            elif self._state == "messages":
+                if char == ",":
+                    self._pos += 1
+                    continue
+                if char == "]":
+                    self._pos += 1
+                    self._state = "key"
+                    continue
+                message = self._decode_value(final)
+                if message is _INCOMPLETE:
+                    break
+                messages.append(message)
+        return messages
+
+
+async def iter_messages(filename, chunk_size=READ_CHUNK_SIZE):
+    """Asynchronously yields messages from an export file without loading it whole."""
+    parser = MessageStreamParser()
+    async with aio_open(filename, 'r', encoding='utf-8') as file:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            for message in parser.feed(chunk):
+                yield message
+    for message in parser.close():
+        yield message
+
+
+async def tail_messages(filename, finished, chunk_size=READ_CHUNK_SIZE, poll_interval=TAIL_POLL_INTERVAL):
+    """
+    Asynchronously yields messages from an export file while the exporter is still
+    writing it. ``finished()`` must return True once the writer has exited; the file
+    is then read to its end and the document is required to be complete. Yields
+    nothing if the writer exits without creating the file.
+    """
+    while not os.path.exists(filename):
+        if finished():
+            return
+        await asyncio.sleep(poll_interval)
+
+    parser = MessageStreamParser()
+    # Decode incrementally so a multi-byte character split across reads is not an error
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    async with aio_open(filename, 'rb') as file:
+        while True:
+            # Sampled before reading, so the last read sees everything the writer wrote
+            done = finished()
+            chunk = await file.read(chunk_size)
+            if chunk:
+                for message in parser.feed(decoder.decode(chunk)):
+                    yield message
+            elif done:
+                break
+            else:
+                await asyncio.sleep(poll_interval)
+    for message in parser.feed(decoder.decode(b'', final=True)):
+        yield message
+    for message in parser.close():
+        yield message
+
+
+async def batch_messages(messages, batch_size=1000):
+    """
+    Groups an async iterator of messages into lists of at most ``batch_size``.
+    ``batch_size`` may also be a callable, which is consulted before every batch so
+    loaders can adapt the size while the export is being consumed.
+    """
+    next_size = batch_size if callable(batch_size) else lambda: batch_size
+    batch = []
+    limit = next_size()
+    async for message in messages:
+        batch.append(message)
+        if len(batch) >= limit:
+            yield batch
+            batch = []
+            limit = next_size()
+    if batch:
+        yield batch
+
+
+def stream_message_batches(filename, batch_size=1000):
+    """Streams a finished export file in batches for insertion (see ``batch_messages``)."""
+    return batch_messages(iter_messages(filename), batch_size)
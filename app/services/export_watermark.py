@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+# Discord snowflakes encode milliseconds since the Discord epoch in their upper 42 bits
+DISCORD_EPOCH_MS = 1420070400000
+
+# Export destinations keep independent watermarks
+SINK_POSTGRES = "postgres"
+SINK_ELASTICSEARCH = "elasticsearch"
+
+# Atomically raises the stored watermark. Snowflakes exceed the 2^53 precision of Lua
+# numbers, so they are compared as decimal strings (longer string means larger value).
+ADVANCE_WATERMARK_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+local candidate = ARGV[1]
+if (not current) or #candidate > #current or (#candidate == #current and candidate > current) then
+    redis.call('SET', KEYS[1], candidate)
+    return 1
+end
+return 0
+"""
+
+
+def watermark_key(sink: str, channel_id) -> str:
+    """Builds the Redis key holding the highest ingested message ID for a channel and sink."""
+    return f"export_watermark:{sink}:{channel_id}"
+
+
+def snowflake_to_datetime(snowflake: int) -> datetime:
+    """Extracts the creation time embedded in a Discord snowflake."""
+    return datetime.fromtimestamp(((snowflake >> 22) + DISCORD_EPOCH_MS) / 1000, tz=timezone.utc)
+
+
+def datetime_to_snowflake(moment: datetime) -> int:
+    """Returns the smallest snowflake that could have been created at the given time."""
+    milliseconds = int(moment.timestamp() * 1000) - DISCORD_EPOCH_MS
+    return max(milliseconds, 0) << 22
+
+
+async def get_watermark(redis, sink: str, channel_id) -> Optional[int]:
+    """Returns the highest message ID already ingested for the channel, if any."""
+    value = await redis.get(watermark_key(sink, channel_id))
+    return int(value) if value else None
+
+
+async def advance_watermark(redis, sink: str, channel_id, message_id: int):
+    """Moves the channel's watermark forward to ``message_id``; never moves it backwards."""
+    await redis.eval(ADVANCE_WATERMARK_SCRIPT, 1, watermark_key(sink, channel_id), str(message_id))
+
+
+def export_after(watermark: Optional[int], overlap_minutes: int, initial_days: int) -> str:
+    """
+    Computes the value for DiscordChatExporter's ``--after`` option. Without a watermark the
+    last ``initial_days`` are exported; otherwise export resumes from the watermark, rewound
+    by ``overlap_minutes`` so that late edits near the boundary are picked up again.
+    """
+    if watermark is None:
+        return (datetime.now() - timedelta(days=initial_days)).strftime("%Y-%m-%d")
+    if overlap_minutes <= 0:
+        return str(watermark)
+    resume_from = snowflake_to_datetime(watermark) - timedelta(minutes=overlap_minutes)
+    return str(datetime_to_snowflake(resume_from))
@@ -0,0 +1,59 @@
+import time
+from collections import OrderedDict
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache with per-entry expiry. Entries are evicted least
+    recently used first once either the entry count or the total size in bytes
+    (as reported by the caller) exceeds its limit.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key):
+        """Returns the cached value, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value = entry
+        if expires_at < time.monotonic():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, size: int, ttl: float = None):
+        """Stores a value for at most ``ttl`` seconds (capped at the cache-wide TTL)."""
+        self.delete(key)
+        if size > self.max_bytes:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def delete(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
@@ -0,0 +1,126 @@
+from array import array
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import repeat
+
+# Exported timestamps look like '2024-04-25T10:15:30.123+00:00'. The message date is
+# the calendar date in the timestamp's own offset, i.e. its first ten characters.
+_DATE_LENGTH = 10
+
+# Dates seen so far; an export spans few distinct days, so this stays tiny
+_ordinal_by_prefix = {}
+
+
+def _parse_date_slow(timestamp: str) -> int:
+    """Fallback for timestamps not in the exporter's usual fixed ISO format."""
+    try:
+        return datetime.fromisoformat(timestamp).date().toordinal()
+    except ValueError:
+        return datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%f%z').date().toordinal()
+
+
+def parse_date_ordinal(timestamp: str) -> int:
+    """
+    Returns the proleptic ordinal of a message timestamp's date. Fixed-format
+    ISO timestamps are sliced rather than parsed, and each distinct date is
+    converted only once.
+    """
+    prefix = timestamp[:_DATE_LENGTH]
+    ordinal = _ordinal_by_prefix.get(prefix)
+    if ordinal is not None:
+        return ordinal
+    if (len(timestamp) >= _DATE_LENGTH and prefix[4] == '-' and prefix[7] == '-'
+            and (len(timestamp) == _DATE_LENGTH or timestamp[_DATE_LENGTH] in 'T ')):
+        try:
+            ordinal = date(int(prefix[:4]), int(prefix[5:7]), int(prefix[8:])).toordinal()
+        except ValueError:
+            return _parse_date_slow(timestamp)
+        _ordinal_by_prefix[prefix] = ordinal
+        return ordinal
+    return _parse_date_slow(timestamp)
+
+
+@lru_cache(maxsize=4096)
+def _date(ordinal: int) -> date:
+    return date.fromordinal(ordinal)
+
+
+@lru_cache(maxsize=4096)
+def _iso_date(ordinal: int) -> str:
+    return date.fromordinal(ordinal).isoformat()
+
+
+class MessageBatch:
+    """
+    Column-oriented batch of exported messages for one channel: message ids as int64,
+    dates as ordinals and the contents as a list of strings. It is built once per batch
+    by the export pipeline and shared by every sink, which read the columns directly
+    instead of re-parsing a dict per message.
+    """
+    __slots__ = ("channel_id", "message_ids", "date_ordinals", "contents")
+
+    def __init__(self, channel_id: int, message_ids: array, date_ordinals: array, contents: list):
+        self.channel_id = channel_id
+        self.message_ids = message_ids
+        self.date_ordinals = date_ordinals
+        self.contents = contents
+
+    @classmethod
+    def from_messages(cls, messages, channel_id):
+        """Builds a batch from decoded DiscordChatExporter message objects."""
+        return cls(
+            int(channel_id),
+            array('q', [int(message['id']) for message in messages]),
+            array('i', [parse_date_ordinal(message['timestamp']) for message in messages]),
+            [message['content'] for message in messages],
+        )
+
+    def __len__(self):
+        return len(self.message_ids)
+
+    @property
+    def highest_message_id(self) -> int:
+        return max(self.message_ids, default=0)
+
+    def since(self, ordinal: int) -> "MessageBatch":
+        """Returns the batch's messages dated on or after the date ``ordinal``; the batch itself if all are."""
+        if min(self.date_ordinals, default=ordinal) >= ordinal:
+            return self
+        keep = [index for index, date_ordinal in enumerate(self.date_ordinals) if date_ordinal >= ordinal]
+        return MessageBatch(self.channel_id, array('q', [self.message_ids[index] for index in keep]),
+                            array('i', [self.date_ordinals[index] for index in keep]),
+                            [self.contents[index] for index in keep])
+
+    def months(self):
+        """Returns the monthly scopes ('YYYY-MM') the batch's messages fall into."""
+        return {_iso_date(ordinal)[:7] for ordinal in set(self.date_ordinals)}
+
+    def records(self):
+        """Yields (message_id, channel_id, message_date, content) tuples, e.g. for COPY."""
+        return zip(self.message_ids, repeat(self.channel_id), map(_date, self.date_ordinals), self.contents)
+
+    def insert_parameters(self):
+        """Builds the parameter list for an executemany INSERT of the batch."""
+        return [
+            {'message_id': message_id, 'channel_id': channel_id, 'message_date': message_date, 'content': content}
+            for message_id, channel_id, message_date, content in self.records()
+        ]
+
+    def es_actions(self, index_for):
+        """
+        Lazily yields Elasticsearch bulk index actions, one per message. ``index_for``
+        maps a message's date ordinal to the name of the index it belongs in.
+        """
+        channel_id = str(self.channel_id)
+        for message_id, ordinal, content in zip(self.message_ids, self.date_ordinals, self.contents):
+            message_id = str(message_id)
+            yield {
+                "_index": index_for(ordinal),
+                "_id": message_id,
+                "_source": {
+                    "message_id": message_id,
+                    "channel_id": channel_id,
+                    "message_date": _iso_date(ordinal),
+                    "content": content,
+                },
+            }
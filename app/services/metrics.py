@@ -0,0 +1,130 @@
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+# Buckets for whole export stages, which take from milliseconds to an hour
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+# Buckets for export throughput in rows per second
+THROUGHPUT_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+
+# Requests whose path matched no route share one label, so scanners cannot create series
+UNMATCHED_ROUTE = "unmatched"
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last byte of its response",
+    ["method", "route"])
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Requests answered, by route and status code", ["method", "route", "status"])
+
+CACHE_REQUESTS = Counter(
+    "search_cache_requests_total",
+    "Search cache lookups by key family and result: l1_hit, hit, stale, miss or error", ["family", "result"])
+
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Time spent executing SQL statements", ["engine", "operation"])
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Time waiting for a pooled connection and starting its transaction", ["engine"])
+
+ES_REQUEST_SECONDS = Histogram(
+    "es_request_duration_seconds", "Time spent in Elasticsearch requests", ["operation"])
+
+EXPORT_STAGE_SECONDS = Histogram(
+    "export_stage_duration_seconds",
+    "Wall time per export stage: export (the CLI), parse, transform, and one stage per sink for loading",
+    ["stage"], buckets=STAGE_BUCKETS)
+EXPORT_ROWS_PER_SECOND = Histogram(
+    "export_rows_per_second", "Messages stored per second of export wall time", ["sink"], buckets=THROUGHPUT_BUCKETS)
+EXPORT_MESSAGES = Counter(
+    "export_messages_total", "Messages stored by exports", ["sink"])
+
+
+def cache_family(key: str) -> str:
+    """Returns the query family of a search cache key, e.g. 'exact_search_keyword'."""
+    return key.split(":", 1)[0]
+
+
+def record_cache(key: str, result: str):
+    CACHE_REQUESTS.labels(cache_family(key), result).inc()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency and status code of every HTTP request,
+    labelled with the route template rather than the raw path. The latency runs until
+    the last body chunk is sent, so streamed responses are measured in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500  # Reported when the app fails before starting a response
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            route = getattr(route, "path", UNMATCHED_ROUTE)
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(scope["method"], route, str(status)).inc()
+
+
+def instrument_engine(engine, name: str):
+    """Records the execution time of every statement run on an async engine."""
+    sync_engine = engine.sync_engine
+    if getattr(sync_engine, "_metrics_instrumented", False):
+        return  # The reader engine may be the writer engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_SECONDS.labels(name, operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _failed(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    sync_engine._metrics_instrumented = True
+
+
+def observe_export(progress, results, seconds: float):
+    """Records the stage timings of a finished export run and each sink's throughput."""
+    for stage, stage_seconds in progress.stage_seconds.items():
+        EXPORT_STAGE_SECONDS.labels(stage).observe(stage_seconds)
+    for result in results.values():
+        EXPORT_MESSAGES.labels(result.sink).inc(result.total_inserted)
+        if seconds > 0:
+            EXPORT_ROWS_PER_SECOND.labels(result.sink).observe(result.total_inserted / seconds)
+
+
+def latest():
+    """
+    Renders every metric in the Prometheus text format. Under several worker processes
+    (PROMETHEUS_MULTIPROC_DIR set) the samples of all of them are aggregated.
+    Returns the body and its content type.
+    """
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,232 @@
+import logging
+import re
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..core.database import engine as default_engine
+from ..settings import get_settings
+from . import search_cache
+
+# Set up logging for partition management
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# discord_chats is range-partitioned on message_date with one partition per month.
+# Only partitions named like discord_chats_2024_05 are managed; others are left alone.
+PARENT_TABLE = "discord_chats"
+PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_(\d{{4}})_(\d{{2}})$")
+
+# Search indexes every partition carries, keyed by an index name suffix. The value is
+# the tail of pg_get_indexdef() for the index, which also recognises equivalent indexes
+# created under other names, e.g. cascaded from an index on the parent table.
+PARTITION_INDEXES = {
+    "content_tsvector_idx": "USING gin (content_tsvector)",
+    "content_trgm_idx": "USING gin (content gin_trgm_ops)",
+    "date_id_idx": "USING btree (message_date, message_id)",
+}
+
+# Advisory lock keys serialising partition changes across API and worker processes
+CREATE_LOCK_KEY = 0x5a6d_0001
+MAINTENANCE_LOCK_KEY = 0x5a6d_0002
+
+# Months ('YYYY-MM') this process has seen a partition for
+_known_months = set()
+
+LIST_PARTITIONS = text(f"""
+    SELECT c.relname, i.inhdetachpending
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = '{PARENT_TABLE}'::regclass
+""")
+
+LIST_INDEXES = text("""
+    SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisvalid
+    FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE i.indrelid = to_regclass(:table)
+""")
+
+HAS_DEFAULT_PARTITION = text(f"""
+    SELECT partdefid <> 0 FROM pg_partitioned_table WHERE partrelid = '{PARENT_TABLE}'::regclass
+""")
+
+
+def add_months(month: date, months: int) -> date:
+    """Returns the first day of the month ``months`` after the month of ``month``."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: str) -> str:
+    """Returns the partition holding messages of a month ('YYYY-MM')."""
+    return f"{PARENT_TABLE}_{month.replace('-', '_')}"
+
+
+def partition_month(name: str):
+    """Returns the month ('YYYY-MM') of a managed partition, or None for other tables."""
+    match = PARTITION_NAME.match(name)
+    return f"{match.group(1)}-{match.group(2)}" if match else None
+
+
+def months_ahead(today: date, ahead: int):
+    """Lists the current month and the ``ahead`` following months as 'YYYY-MM'."""
+    return [add_months(today, offset).strftime("%Y-%m") for offset in range(ahead + 1)]
+
+
+def retention_start(today: date, retention_months: int):
+    """
+    Returns the first day of the retention horizon, which keeps the current month and
+    the ``retention_months`` before it, or None when 0 keeps everything.
+    """
+    if retention_months <= 0:
+        return None
+    return add_months(today, -retention_months)
+
+
+def expired_months(months, today: date, retention_months: int):
+    """Picks the months whose partitions lie entirely before the retention horizon."""
+    start = retention_start(today, retention_months)
+    if start is None:
+        return []
+    horizon = start.strftime("%Y-%m")
+    return sorted(month for month in months if month < horizon)
+
+
+def missing_indexes(name: str, existing):
+    """
+    Compares a partition's (index name, definition, valid) rows against PARTITION_INDEXES.
+    Returns the invalid indexes to drop, left behind by interrupted concurrent builds, and
+    the CREATE INDEX statements (without CONCURRENTLY) for the indexes it lacks.
+    """
+    invalid = [index for index, _, valid in existing if not valid]
+    valid_definitions = [definition for _, definition, valid in existing if valid]
+    statements = [
+        f"CREATE INDEX IF NOT EXISTS {name}_{suffix} ON {name} {definition}"
+        for suffix, definition in PARTITION_INDEXES.items()
+        if not any(existing_definition.endswith(definition) for existing_definition in valid_definitions)
+    ]
+    return invalid, statements
+
+
+async def _create_partition(connection, month: str):
+    """Creates a month's partition together with its indexes, which is instant while it is empty."""
+    name = partition_name(month)
+    first_day = date.fromisoformat(f"{month}-01")
+    await connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE}
+        FOR VALUES FROM ('{first_day}') TO ('{add_months(first_day, 1)}')
+    """))
+    existing = (await connection.execute(LIST_INDEXES, {"table": name})).all()
+    _, statements = missing_indexes(name, existing)
+    for statement in statements:
+        await connection.execute(text(statement))
+    logger.info(f"Ensured partition {name}")
+
+
+async def ensure_partitions(months, engine: AsyncEngine = None):
+    """
+    Makes sure every month ('YYYY-MM') in ``months`` has a partition before rows are
+    written to it; without one, the whole batch would fail. Months already seen by
+    this process are skipped without a round trip. Months past the retention horizon
+    get no partition, as maintenance would drop it again, and are forgotten, as
+    maintenance may have dropped them in another process.
+    """
+    expired = set(expired_months(set(months) | _known_months, date.today(),
+                                 get_settings().partition_retention_months))
+    _known_months.difference_update(expired)
+    missing = sorted(set(months) - _known_months - expired)
+    if not missing:
+        return
+    async with (engine or default_engine).begin() as connection:
+        # Concurrent exports may need the same new month
+        await connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CREATE_LOCK_KEY})
+        attached = {partition_month(name) for name, _ in (await connection.execute(LIST_PARTITIONS)).all()}
+        for month in missing:
+            if month not in attached:
+                await _create_partition(connection, month)
+    _known_months.update(missing)
+
+
+async def build_missing_indexes(connection, names):
+    """
+    Builds the search indexes partitions lack with CREATE INDEX CONCURRENTLY, so
+    partitions already holding data stay writable meanwhile. ``connection`` must be
+    in autocommit mode.
+    """
+    for name in names:
+        existing = (await connection.execute(LIST_INDEXES, {"table": name})).all()
+        invalid, statements = missing_indexes(name, existing)
+        for index in invalid:
+            await connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index}"))
+        for statement in statements:
+            logger.info(f"Building index on {name}: {statement}")
+            await connection.execute(text(statement.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)))
+
+
+async def drop_partitions(connection, names, pending=()):
+    """
+    Removes partitions from discord_chats with DETACH ... CONCURRENTLY, which does not
+    block queries on the other partitions, then drops them. ``connection`` must be in
+    autocommit mode. Partitions in ``pending`` were left half-detached by an interrupted
+    run and are completed with FINALIZE instead.
+    """
+    # Concurrent detaching is not possible while the table has a default partition
+    has_default = (await connection.execute(HAS_DEFAULT_PARTITION)).scalar()
+    for name in names:
+        if name in pending:
+            await connection.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name} FINALIZE"))
+        elif has_default:
+            await connection.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        else:
+            await connection.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name} CONCURRENTLY"))
+        await connection.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        _known_months.discard(partition_month(name))
+        logger.info(f"Dropped partition {name} past the retention horizon")
+
+
+async def maintain_partitions(engine: AsyncEngine = None, today: date = None, redis=None):
+    """
+    Creates partitions for the current month and ``partition_months_ahead`` months
+    after it, builds missing partition indexes and drops partitions older than
+    ``partition_retention_months``. Only one process maintains partitions at a time;
+    the others skip the run. With ``redis``, cached Postgres searches over the dropped
+    months are invalidated.
+    """
+    settings = get_settings()
+    engine = engine or default_engine
+    today = today or date.today()
+    await ensure_partitions(months_ahead(today, settings.partition_months_ahead), engine)
+
+    async with engine.connect() as connection:
+        # CONCURRENTLY commands cannot run inside a transaction block
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        if not (await connection.execute(text("SELECT pg_try_advisory_lock(:key)"),
+                                         {"key": MAINTENANCE_LOCK_KEY})).scalar():
+            logger.info("Partition maintenance is running elsewhere, skipping")
+            return
+        try:
+            rows = (await connection.execute(LIST_PARTITIONS)).all()
+            managed = {name: partition_month(name) for name, _ in rows if partition_month(name)}
+            pending = {name for name, detach_pending in rows if detach_pending and name in managed}
+            expired = {partition_name(month) for month in
+                       expired_months(managed.values(), today, settings.partition_retention_months)}
+            await drop_partitions(connection, sorted(expired | pending), pending)
+            if redis is not None and (expired | pending):
+                await search_cache.invalidate(redis, search_cache.BACKEND_POSTGRES,
+                                              [managed[name] for name in expired | pending])
+            await build_missing_indexes(connection, [name for name in sorted(managed)
+                                                     if name not in expired and name not in pending])
+        finally:
+            await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+
+
+async def startup_partitions():
+    """
+    Creates the partitions of the current and upcoming months at application startup,
+    without preventing the start. Index backfill and retention are left to the export
+    workers' maintenance loop, as index builds on populated partitions would hold up startup.
+    """
+    try:
+        await ensure_partitions(months_ahead(date.today(), get_settings().partition_months_ahead))
+    except Exception as e:
+        logger.error(f"Creating upcoming partitions failed: {e}")
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+import uuid
+
+from pyinstrument import Profiler
+from pyinstrument.renderers import HTMLRenderer, JSONRenderer, SpeedscopeRenderer
+
+from ..settings import get_settings
+
+# Set up logging for request profiling
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Output formats selectable through profile_formats, with their renderer and file extension
+RENDERERS = {
+    "html": (HTMLRenderer, ".html"),
+    "speedscope": (SpeedscopeRenderer, ".speedscope.json"),
+    "json": (JSONRenderer, ".json"),
+}
+
+# Response header carrying the id of a profiled request's output files
+PROFILE_ID_HEADER = b"x-profile-id"
+
+_UNSAFE_CHARACTERS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _wants_profile(scope) -> bool:
+    """Profiles a sampled share of requests, and any request opting in through the header."""
+    settings = get_settings()
+    header = settings.profile_header.lower().encode()
+    for name, value in scope.get("headers", ()):
+        if name == header:
+            if settings.profile_header_token:
+                return value.decode(errors="replace") == settings.profile_header_token
+            return value not in (b"", b"0", b"false")
+    return random.random() < settings.profile_sample_rate
+
+
+def _profile_name(scope, profile_id: str) -> str:
+    route = getattr(scope.get("route"), "path", scope["path"])
+    label = _UNSAFE_CHARACTERS.sub("_", route).strip("_") or "root"
+    return f"{time.strftime('%Y%m%d-%H%M%S')}_{scope['method']}_{label}_{profile_id}"
+
+
+def _prune(directory: str, max_bytes: int):
+    """Deletes the oldest profiles until the directory holds at most ``max_bytes``."""
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Already removed by a concurrent prune
+        total -= size
+
+
+def save_profile(profiler: Profiler, name: str):
+    """Renders a stopped profiler in every configured format and rotates the output directory."""
+    settings = get_settings()
+    os.makedirs(settings.profile_dir, exist_ok=True)
+    paths = []
+    for output_format in settings.profile_formats.split(","):
+        renderer, extension = RENDERERS[output_format.strip()]
+        path = os.path.join(settings.profile_dir, name + extension)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(profiler.output(renderer=renderer()))
+        paths.append(path)
+    _prune(settings.profile_dir, settings.profile_dir_max_bytes)
+    return paths
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests with pyinstrument. A ``profile_sample_rate`` share
+    of requests is profiled, plus requests sending the ``profile_header`` header. Each
+    profile covers the request until its last body chunk is sent and is written to
+    ``profile_dir`` in ``profile_formats``; the oldest profiles are deleted once the
+    directory exceeds ``profile_dir_max_bytes``. Rendering and writing run in a thread,
+    off the event loop. Profiled responses carry the profile's id in ``X-Profile-Id``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", ()), (PROFILE_ID_HEADER, profile_id.encode())]}
+            await send(message)
+
+        profiler = Profiler(interval=get_settings().profile_interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            name = _profile_name(scope, profile_id)
+            try:
+                paths = await asyncio.get_running_loop().run_in_executor(None, save_profile, profiler, name)
+                logger.info(f"Profiled {scope['method']} {scope['path']}: {', '.join(paths)}")
+            except Exception as e:
+                logger.warning(f"Failed to save profile {name}: {e}")
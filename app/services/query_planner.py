@@ -0,0 +1,158 @@
+import logging
+import time
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.exceptions import HTTPException
+
+from ..models import Message
+from ..settings import get_settings
+from .local_cache import LocalCache
+
+# Setting up logging to monitor query planning
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How a keyword has to match: as a substring (exact searches) or by its words (context search)
+MATCH_EXACT = "exact"
+MATCH_WORDS = "words"
+
+# Strategies reported in the responses' query_plan
+PLAN_TRIGRAM = "trigram"  # ILIKE served by the trigram GIN index
+PLAN_FULLTEXT = "fulltext"  # tsvector match only
+PLAN_LIMITED_SCAN = "limited_scan"  # ILIKE over the most recent partitions only
+PLAN_EMPTY = "empty"  # The term has no searchable words; nothing can match
+
+# pg_trgm extracts trigrams, so shorter terms cannot use the trigram index
+MIN_TRIGRAM_LENGTH = 3
+
+# Lexemes of a search term, as plainto_tsquery('english', ...) sees them
+TERM_LEXEMES = text("SELECT coalesce(array_agg(lexeme), '{}') FROM unnest(to_tsvector('english', :term))")
+
+# Lexeme frequencies gathered by ANALYZE for content_tsvector; the parent's inherited
+# statistics cover every partition
+TSVECTOR_STATS = text("""
+    SELECT most_common_elems::text::text[], most_common_elem_freqs
+    FROM pg_stats
+    WHERE tablename = 'discord_chats' AND attname = 'content_tsvector'
+    ORDER BY inherited DESC
+    LIMIT 1
+""")
+
+# Per-process caches of plans per term and of the table-wide lexeme statistics
+_settings = get_settings()
+_plans = LocalCache(_settings.query_plan_cache_entries, _settings.query_plan_cache_entries * 256,
+                    _settings.query_stats_ttl)
+_lexeme_stats = None  # (expires_at, {lexeme: frequency}, frequency assumed for other lexemes)
+
+
+class QueryPlan:
+    """
+    The way a keyword search is executed: the predicates to filter messages with, the
+    strategy name reported to clients and the estimated share of messages matching.
+    """
+
+    def __init__(self, strategy: str, predicates=(), selectivity: Optional[float] = None):
+        self.strategy = strategy
+        self.predicates = tuple(predicates)
+        self.selectivity = selectivity
+
+    @property
+    def empty(self) -> bool:
+        return self.strategy == PLAN_EMPTY
+
+
+async def _load_lexeme_stats(session: AsyncSession):
+    """Returns the cached lexeme frequencies, reading pg_stats again once they expire."""
+    global _lexeme_stats
+    if _lexeme_stats is not None and _lexeme_stats[0] > time.monotonic():
+        return _lexeme_stats[1], _lexeme_stats[2]
+    frequencies, other = {}, None
+    try:
+        row = (await session.execute(TSVECTOR_STATS)).first()
+    except Exception as e:
+        logger.warning(f"Failed to read lexeme statistics: {e}")
+        row = None
+    if row and row[0] and row[1]:
+        lexemes, freqs = row
+        # The last three frequencies are the minimum, the maximum and the null share
+        frequencies = dict(zip(lexemes, freqs))
+        # Lexemes missing from the list are rarer than the rarest one listed
+        other = freqs[-3] / 2
+    _lexeme_stats = (time.monotonic() + get_settings().query_stats_ttl, frequencies, other)
+    return frequencies, other
+
+
+def lexeme_selectivity(lexemes, frequencies: dict, other: Optional[float]) -> Optional[float]:
+    """
+    Estimates the share of messages containing every lexeme: that of the rarest one.
+    Returns None when there are no statistics to estimate from.
+    """
+    if not frequencies:
+        return None
+    return min(frequencies.get(lexeme, other) for lexeme in lexemes)
+
+
+def _limited_plan(match_predicate, selectivity: Optional[float], reason: str) -> QueryPlan:
+    """Limits a search that would read most of the table to recent partitions, or rejects it."""
+    settings = get_settings()
+    if settings.query_short_term_policy == "reject":
+        raise HTTPException(status_code=400, detail=reason)
+    since = date.today() - timedelta(days=settings.query_limited_scan_days)
+    return QueryPlan(PLAN_LIMITED_SCAN, (Message.message_date >= since, match_predicate), selectivity)
+
+
+def choose_plan(term: str, match: str, lexemes, selectivity: Optional[float]) -> QueryPlan:
+    """
+    Picks the cheapest plan for a term, given its lexemes and their estimated selectivity.
+
+    Exact searches are substring matches, which a tsvector prefilter could narrow
+    wrongly: "pie" occurs in "piece", whose lexeme is "piec". They use the trigram
+    index, which needs at least three characters. Word searches use the tsvector index,
+    and terms consisting only of stop words match nothing.
+
+    Searches either index cannot narrow would read most of the table: terms too short
+    for trigrams, and terms whose words match more than
+    ``query_common_term_max_selectivity`` of messages. Exact terms made only of stop
+    words count as common, as stop words have no statistics. These searches are either
+    limited to recent partitions or rejected (``query_short_term_policy``).
+    """
+    settings = get_settings()
+    common = selectivity is not None and selectivity > settings.query_common_term_max_selectivity
+    common_reason = "Search term is too common to search every message; use a more specific term"
+
+    if match == MATCH_WORDS:
+        if not lexemes:
+            return QueryPlan(PLAN_EMPTY, selectivity=0.0)
+        matches_words = Message.content_tsvector.op('@@')(func.plainto_tsquery('english', term))
+        if common:
+            return _limited_plan(matches_words, selectivity, common_reason)
+        return QueryPlan(PLAN_FULLTEXT, (matches_words,), selectivity)
+
+    contains = Message.content.ilike(f"%{term}%")
+    if len(term.strip()) < MIN_TRIGRAM_LENGTH:
+        return _limited_plan(contains, selectivity, f"Search terms must be at least {MIN_TRIGRAM_LENGTH} characters long")
+    if common or (not lexemes and any(char.isalnum() for char in term)):
+        return _limited_plan(contains, selectivity, common_reason)
+    return QueryPlan(PLAN_TRIGRAM, (contains,), selectivity)
+
+
+async def plan_keyword_search(term: str, match: str, session: AsyncSession) -> QueryPlan:
+    """
+    Plans a keyword search, reusing the plan chosen for the same term and match within
+    ``query_stats_ttl`` seconds. Planning a new term costs one small query for its lexemes.
+    """
+    cache_key = f"{match}:{term}"
+    cached = _plans.get(cache_key)
+    if cached is not None:
+        lexemes, selectivity = cached
+    else:
+        lexemes = list((await session.execute(TERM_LEXEMES, {"term": term})).scalar_one())
+        frequencies, other = await _load_lexeme_stats(session)
+        selectivity = lexeme_selectivity(lexemes, frequencies, other) if lexemes else None
+        _plans.set(cache_key, (lexemes, selectivity), size=len(cache_key))
+    plan = choose_plan(term, match, lexemes, selectivity)
+    logger.info(f"Planned {match} search for {term!r} as {plan.strategy} (selectivity {plan.selectivity})")
+    return plan
@@ -0,0 +1,69 @@
+import json
+import zlib
+
+# Media types of the streamed formats
+MEDIA_TYPE_NDJSON = "application/x-ndjson"
+MEDIA_TYPE_JSON = "application/json"
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Tells whether an Accept-Encoding header value allows a gzip-encoded response."""
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def encode_message_rows(rows) -> list:
+    """Encodes (message_id, channel_id, content, message_date) rows as ChatMessageDisplay JSON objects."""
+    return [
+        json.dumps({"message_id": row.message_id, "channel_id": row.channel_id, "content": row.content,
+                    "message_date": row.message_date.isoformat()}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        for row in rows
+    ]
+
+
+class ChunkEncoder:
+    """
+    Passes response chunks through, or gzip-compresses them as one stream. Each chunk
+    is flushed so a client can decode every row as soon as it arrives.
+    """
+
+    def __init__(self, gzip: bool, level: int = 6):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31) if gzip else None
+
+    def encode(self, chunk: bytes) -> bytes:
+        if self._compressor is None:
+            return chunk
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, chunk: bytes = b"") -> bytes:
+        """Encodes the last chunk and ends the stream."""
+        if self._compressor is None:
+            return chunk
+        return self._compressor.compress(chunk) + self._compressor.flush()
+
+
+async def start_stream(chunks):
+    """
+    Runs an async generator of response chunks up to its first chunk, so errors raised
+    before any output (e.g. invalid queries) still become regular error responses.
+    Returns an async iterator over every chunk that closes the generator when done,
+    including when the client disconnects midway.
+    """
+    try:
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = None
+
+    async def stream():
+        try:
+            if first_chunk is not None:
+                yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    return stream()
@@ -0,0 +1,379 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from datetime import date
+
+from ..settings import get_settings
+from .export_watermark import SINK_ELASTICSEARCH, SINK_POSTGRES
+from .cache_codec import pack_entry, unpack_entry
+from .local_cache import LocalCache
+from .metrics import record_cache
+
+# Set up logging for cache operations
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Search results are cached per backend; each export only invalidates its own backend
+BACKEND_POSTGRES = SINK_POSTGRES
+BACKEND_ELASTICSEARCH = SINK_ELASTICSEARCH
+
+# Keyword searches span every date, so they share one generation per backend
+SCOPE_KEYWORD = "keyword"
+
+# Above this many generations the version suffix is hashed to keep keys short
+MAX_INLINE_GENERATIONS = 4
+
+# Pub/sub channel announcing bumped generations to every worker's L1 cache
+INVALIDATION_CHANNEL = "search_cache:invalidate"
+
+# Per-worker L1 cache of generations and encoded responses; None when disabled
+_settings = get_settings()
+local_cache = LocalCache(_settings.l1_cache_max_entries, _settings.l1_cache_max_bytes,
+                         _settings.l1_cache_ttl) if _settings.l1_cache_enabled else None
+_listener_task = None
+
+
+def generation_key(backend: str, scope: str) -> str:
+    """Builds the Redis key of the generation counter for a backend and scope."""
+    return f"cache_generation:{backend}:{scope}"
+
+
+def month_scope(value) -> str:
+    """Returns the monthly partition scope ('YYYY-MM') of a date or ISO timestamp string."""
+    if isinstance(value, date):
+        return value.strftime("%Y-%m")
+    return value[:7]
+
+
+def month_scopes(start_date: date, end_date: date):
+    """Lists the monthly scopes overlapping the inclusive date range."""
+    scopes = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        scopes.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return scopes
+
+
+async def versioned_key(redis, backend: str, base_key: str, start_date: date = None, end_date: date = None) -> str:
+    """
+    Appends the current generations of the scopes a query depends on to its cache key.
+    Date-range queries depend on the months they cover; everything else on the backend's
+    keyword generation. Bumping a generation makes every key built from it unreachable,
+    and the stale entries simply expire.
+    """
+    scopes = month_scopes(start_date, end_date) if start_date and end_date else [SCOPE_KEYWORD]
+    generations = await _get_generations(redis, [generation_key(backend, scope) for scope in scopes])
+    version = ".".join(str(generation) for generation in generations)
+    if len(scopes) > MAX_INLINE_GENERATIONS:
+        version = hashlib.sha1(version.encode()).hexdigest()[:16]
+    return f"{base_key}:gen:{version}"
+
+
+async def versioned_keyword_keys(redis, backend: str, base_keys):
+    """Versions many keyword-scoped keys at once; they share one generation, read once."""
+    generation, = await _get_generations(redis, [generation_key(backend, SCOPE_KEYWORD)])
+    return [f"{base_key}:gen:{generation}" for base_key in base_keys]
+
+
+async def _get_generations(redis, keys):
+    """Reads generation counters, answering from the L1 cache when possible."""
+    if local_cache is None:
+        return [int(generation or 0) for generation in await redis.mget(keys)]
+    generations = [local_cache.get(f"gen:{key}") for key in keys]
+    missing = [key for key, generation in zip(keys, generations) if generation is None]
+    if missing:
+        fetched = dict(zip(missing, await redis.mget(missing)))
+        for index, key in enumerate(keys):
+            if generations[index] is None:
+                generations[index] = int(fetched[key] or 0)
+                local_cache.set(f"gen:{key}", generations[index], size=len(key))
+    return generations
+
+
+def _drop_generations(keys):
+    """Forgets locally cached generations so the next lookup reads the new values from Redis."""
+    if local_cache is not None:
+        for key in keys:
+            local_cache.delete(f"gen:{key}")
+
+
+async def invalidate(redis, backend: str, months):
+    """
+    Marks cached results of a backend stale after an export: keyword searches and any
+    date-range search overlapping one of the exported ``months`` ('YYYY-MM').
+    The bumped generations are broadcast so every worker drops them from its L1 cache.
+    """
+    keys = [generation_key(backend, SCOPE_KEYWORD)]
+    keys += [generation_key(backend, month) for month in sorted(set(months))]
+    pipe = redis.pipeline()
+    for key in keys:
+        pipe.incr(key)
+    pipe.publish(INVALIDATION_CHANNEL, json.dumps(keys))
+    await pipe.execute()
+    _drop_generations(keys)
+
+
+async def _listen_for_invalidations(redis):
+    """Applies generation bumps published by any worker to this worker's L1 cache."""
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Messages may have been missed while (re)connecting; start from a clean slate
+            local_cache.clear()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    _drop_generations(json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener failed, reconnecting: {e}")
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
+
+
+def start_invalidation_listener(redis):
+    """Starts the background pub/sub listener when the L1 cache is enabled."""
+    global _listener_task
+    if local_cache is not None and _listener_task is None:
+        _listener_task = asyncio.ensure_future(_listen_for_invalidations(redis))
+
+
+async def stop_invalidation_listener():
+    """Stops the pub/sub listener started by ``start_invalidation_listener``."""
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
+
+
+# Releases a fill lock only if it is still held by the worker that took it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Loads currently running in this process, keyed by cache key (single-flight)
+_inflight = {}
+
+
+def _lock_key(key: str) -> str:
+    return f"lock:{key}"
+
+
+async def _read(redis, key: str):
+    """
+    Reads a cache entry (see ``cache_codec``). Returns a tuple of the freshness
+    deadline and the encoded response bytes, or None on a miss or Redis error.
+    """
+    try:
+        value = await redis.get(key)
+    except Exception as e:
+        logger.warning(f"Failed to read cache entry {key}: {e}")
+        record_cache(key, "error")
+        return None
+    if not value:
+        return None
+    return unpack_entry(value)
+
+
+async def _read_many(redis, keys):
+    """Reads several cache entries with one MGET, as ``_read`` does for a single key."""
+    try:
+        values = await redis.mget(keys)
+    except Exception as e:
+        logger.warning(f"Failed to read {len(keys)} cache entries: {e}")
+        for key in keys:
+            record_cache(key, "error")
+        return [None] * len(keys)
+    return [unpack_entry(value) if value else None for value in values]
+
+
+async def _write(redis, key: str, payload: bytes):
+    """Stores a payload that is fresh for ``cache_ttl`` and servable stale for ``cache_stale_ttl`` more."""
+    settings = get_settings()
+    fresh_until = time.time() + settings.cache_ttl
+    try:
+        await redis.setex(key, settings.cache_ttl + settings.cache_stale_ttl, pack_entry(payload, fresh_until))
+    except Exception as e:
+        logger.warning(f"Failed to write cache entry {key}: {e}")
+        record_cache(key, "error")
+
+
+async def _acquire_lock(redis, key: str):
+    """Tries to take the cross-worker fill lock for a key; returns its token or None."""
+    token = uuid.uuid4().hex
+    lock_ttl_ms = int(get_settings().cache_lock_ttl * 1000)
+    try:
+        if await redis.set(_lock_key(key), token, nx=True, px=lock_ttl_ms):
+            return token
+    except Exception as e:
+        logger.warning(f"Failed to acquire cache lock for {key}: {e}")
+    return None
+
+
+async def _release_lock(redis, key: str, token: str):
+    try:
+        await redis.eval(RELEASE_LOCK_SCRIPT, 1, _lock_key(key), token)
+    except Exception as e:
+        logger.warning(f"Failed to release cache lock for {key}: {e}")
+
+
+def _single_flight(key: str, factory):
+    """
+    Runs ``factory()`` once per key per process; concurrent callers share the same task.
+    The task is shielded so one caller being cancelled does not abort it for the others.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _inflight[key] = task
+
+        def _done(finished):
+            if _inflight.get(key) is finished:
+                del _inflight[key]
+            if not finished.cancelled():
+                finished.exception()  # Mark the exception as retrieved even if nobody awaits it
+
+        task.add_done_callback(_done)
+    return asyncio.shield(task)
+
+
+async def _fill(redis, key: str, loader, encode):
+    """
+    Fills a missing entry. Only the worker holding the Redis lock queries the backend;
+    the others poll for its result and fall back to querying themselves if it never appears.
+    """
+    token = await _acquire_lock(redis, key)
+    if token is None:
+        deadline = time.monotonic() + get_settings().cache_lock_wait
+        delay = 0.01
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+            entry = await _read(redis, key)
+            if entry:
+                return entry[1]
+            try:
+                if not await redis.exists(_lock_key(key)):
+                    break  # The holder finished without caching (e.g. an empty result)
+            except Exception:
+                break
+    try:
+        payload = encode(await loader())
+        await _write(redis, key, payload)
+        _remember(key, payload, time.time() + get_settings().cache_ttl)
+        return payload
+    finally:
+        if token:
+            await _release_lock(redis, key, token)
+
+
+async def _refresh(redis, key: str, loader, encode):
+    """Recomputes a stale entry in the background if no other worker is already doing so."""
+    token = await _acquire_lock(redis, key)
+    if token is None:
+        return
+    try:
+        await _write(redis, key, encode(await loader()))
+    except Exception as e:
+        logger.warning(f"Background refresh of {key} failed: {e}")
+    finally:
+        await _release_lock(redis, key, token)
+
+
+def _remember(key: str, payload: bytes, fresh_until: float):
+    """Keeps an encoded response in the L1 cache until it stops being fresh."""
+    if local_cache is not None:
+        local_cache.set(key, payload, size=len(payload), ttl=fresh_until - time.time())
+
+
+async def get_or_load(redis, key: str, loader, encode):
+    """
+    Cache-aside read shared by the search endpoints, returning the response as
+    pre-encoded JSON bytes so hits never round-trip through response models.
+    Fresh responses in the L1 cache are returned without leaving the process.
+    Stale Redis hits are returned immediately while a single background refresh
+    runs. Misses are coalesced so that concurrent identical requests, in this
+    process and across workers, wait on one backend query. ``encode`` turns the
+    loader's result into the response bytes. ``loader`` must not depend on
+    request-scoped resources, as refreshes outlive the request.
+    """
+    if local_cache is not None:
+        payload = local_cache.get(key)
+        if payload is not None:
+            record_cache(key, "l1_hit")
+            return payload
+    entry = await _read(redis, key)
+    if entry:
+        fresh_until, payload = entry
+        if fresh_until < time.time():
+            record_cache(key, "stale")
+            _single_flight(f"refresh:{key}", lambda: _refresh(redis, key, loader, encode))
+        else:
+            record_cache(key, "hit")
+            _remember(key, payload, fresh_until)
+        return payload
+    record_cache(key, "miss")
+    return await _single_flight(key, lambda: _fill(redis, key, loader, encode))
+
+
+async def get_or_load_many(redis, keys, loaders, encode, concurrency: int):
+    """
+    ``get_or_load`` for many keys at once, returning their payloads in order. Keys
+    missing from the L1 cache are read from Redis with a single MGET; stale entries are
+    served and refreshed in the background, and misses are loaded at most
+    ``concurrency`` at a time, each coalesced with identical loads. ``loaders`` holds
+    the loader of every key. A loader's exception is returned in place of its payload,
+    so one failing key does not fail the others.
+    """
+    payloads = [None] * len(keys)
+    remote = []
+    for index, key in enumerate(keys):
+        payload = local_cache.get(key) if local_cache is not None else None
+        if payload is not None:
+            record_cache(key, "l1_hit")
+            payloads[index] = payload
+        else:
+            remote.append(index)
+
+    missing = []
+    entries = await _read_many(redis, [keys[index] for index in remote]) if remote else []
+    for index, entry in zip(remote, entries):
+        key, loader = keys[index], loaders[index]
+        if not entry:
+            record_cache(key, "miss")
+            missing.append(index)
+            continue
+        fresh_until, payloads[index] = entry
+        if fresh_until < time.time():
+            record_cache(key, "stale")
+            _single_flight(f"refresh:{key}", lambda key=key, loader=loader: _refresh(redis, key, loader, encode))
+        else:
+            record_cache(key, "hit")
+            _remember(key, payloads[index], fresh_until)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fill(key, loader):
+        async with semaphore:
+            return await _single_flight(key, lambda: _fill(redis, key, loader, encode))
+
+    loaded = await asyncio.gather(*(fill(keys[index], loaders[index]) for index in missing), return_exceptions=True)
+    for index, payload in zip(missing, loaded):
+        payloads[index] = payload
+    return payloads
@@ -0,0 +1,93 @@
+import json
+import logging
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy.future import select
+
+from ..models import Message
+from ..settings import get_settings
+from .search_cache import BACKEND_POSTGRES, versioned_key
+
+# Setting up logging to monitor total count computation
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Strategies reported in PaginatedChatMessagesResponse.total_count_strategy
+COUNT_EXACT = "exact"
+COUNT_ESTIMATED = "estimated"
+COUNT_CAPPED = "capped"
+COUNT_CACHED = "cached"
+
+async def exact_count(session: AsyncSession, predicates) -> int:
+    """Counts every message matching the predicates."""
+    stmt = select(func.count()).select_from(Message).filter(*predicates)
+    result = await session.execute(stmt)
+    return result.scalar_one()
+
+async def capped_count(session: AsyncSession, predicates, cap: int) -> int:
+    """Counts matching messages but stops scanning after ``cap + 1`` rows."""
+    limited = select(Message.message_id).filter(*predicates).limit(cap + 1).subquery()
+    result = await session.execute(select(func.count()).select_from(limited))
+    return result.scalar_one()
+
+class ExplainJson(Executable, ClauseElement):
+    """Wraps a SELECT in ``EXPLAIN (FORMAT JSON)`` while keeping its bound parameters."""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(ExplainJson, "postgresql")
+def compile_explain_json(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+async def estimated_count(session: AsyncSession, predicates) -> int:
+    """Returns the planner's row estimate for the predicates without executing the query."""
+    stmt = select(Message.message_id).filter(*predicates)
+    result = await session.execute(ExplainJson(stmt))
+    plan = result.scalar_one()
+    # asyncpg returns the json column as text
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+async def count_total(session: AsyncSession, predicates, cache_key: str, redis=None, date_range=None):
+    """
+    Computes the total number of messages matching ``predicates`` using the configured
+    count strategy. Returns a tuple of the count and the strategy that produced it.
+    ``cache_key`` identifies the query independently of the requested page, and
+    ``date_range`` scopes a cached count to the months it covers for invalidation.
+    """
+    settings = get_settings()
+    strategy = settings.count_strategy
+
+    if strategy == COUNT_ESTIMATED:
+        return await estimated_count(session, predicates), COUNT_ESTIMATED
+
+    if strategy == COUNT_CAPPED:
+        total = await capped_count(session, predicates, settings.count_cap)
+        if total > settings.count_cap:
+            return settings.count_cap, COUNT_CAPPED
+        return total, COUNT_EXACT
+
+    if strategy == COUNT_CACHED and redis is not None:
+        try:
+            count_key = await versioned_key(redis, BACKEND_POSTGRES, f"total_count:{cache_key}", *(date_range or ()))
+            cached = await redis.get(count_key)
+            if cached is not None:
+                return int(cached), COUNT_CACHED
+        except Exception as e:
+            logger.warning(f"Failed to read cached total count: {e}")
+            count_key = None
+        total = await exact_count(session, predicates)
+        try:
+            if count_key:
+                await redis.setex(count_key, settings.count_cache_ttl, total)
+        except Exception as e:
+            logger.warning(f"Failed to cache total count: {e}")
+        return total, COUNT_EXACT
+
+    return await exact_count(session, predicates), COUNT_EXACT
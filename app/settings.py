@@ -3,8 +3,93 @@ from pydantic_settings import BaseSettings
 # Define a class to manage application settings with type annotations and default values
 class Settings(BaseSettings):
     app_name: str = "FastAPI Application"  # Default application name
-    profiling: bool = False  # Flag to enable or disable profiling, disabled by default
+    profiling: bool = False  # Flag to enable or disable the request profiling middleware, disabled by default
     profile_interval: float = 0.01  # Default interval between profile samples if profiling is enabled
+    profile_sample_rate: float = 0.0  # Share of requests profiled (0.0 - 1.0) when profiling is enabled
+    profile_header: str = "X-Profile"  # Requests sending this header are always profiled
+    profile_header_token: str = ""  # When set, the header must carry this value to trigger profiling
+    profile_dir: str = "profiles"  # Directory the profiles are written to
+    profile_formats: str = "html,speedscope"  # Comma-separated output formats: html, speedscope, json
+    profile_dir_max_bytes: int = 100 * 1024 * 1024  # Oldest profiles are deleted beyond this size
+
+    # Search result cache settings
+    cache_ttl: int = 3600  # Seconds a cached search result is considered fresh
+    cache_stale_ttl: int = 300  # Extra seconds a stale result is served while one refresh runs
+    cache_lock_ttl: float = 30.0  # Seconds before a worker's cache-fill lock expires
+    cache_lock_wait: float = 5.0  # Max seconds to wait for another worker's fill before querying
+    cache_compression: str = "zstd"  # Codec for stored responses: "zstd", "zlib" or "none"
+    cache_compression_level: int = 3  # Compression level passed to the codec
+    cache_compression_min_bytes: int = 1024  # Smaller responses are stored uncompressed
+
+    # Optional in-process (L1) cache in front of Redis, kept coherent through Redis pub/sub
+    l1_cache_enabled: bool = False
+    l1_cache_max_entries: int = 10000  # Maximum number of entries per worker
+    l1_cache_max_bytes: int = 64 * 1024 * 1024  # Maximum cached payload bytes per worker
+    l1_cache_ttl: float = 30.0  # Upper bound on staleness should an invalidation message be missed
+
+    # Streamed responses (e.g. /api/chats/search/all?stream=ndjson)
+    stream_batch_rows: int = 1000  # Rows fetched from the server-side cursor and sent per chunk
+    stream_gzip_level: int = 6  # Compression level when the client accepts gzip
+    bulk_export_queue_chunks: int = 16  # COPY output chunks buffered before COPY waits for the client
+    bulk_export_parquet_rows: int = 50000  # Rows per Parquet row group
+
+    # Batch keyword search (/api/chats/search/batch)
+    batch_search_max_terms: int = 200  # Most terms accepted per request
+    batch_search_concurrency: int = 4  # Uncached terms queried at the same time; keep below the pool size
+
+    # Strategy for total_count on paginated searches: "exact", "estimated", "capped" or "cached"
+    count_strategy: str = "exact"
+    count_cap: int = 10000  # Upper bound counted by the "capped" strategy
+    count_cache_ttl: int = 3600  # Seconds an exact count is reused by the "cached" strategy
+
+    # Keyword query planning; plans are chosen per term from cached pg_stats lexeme frequencies
+    query_short_term_policy: str = "limited"  # Terms too short or too common for the indexes: "limited" scan of recent months, or "reject"
+    query_common_term_max_selectivity: float = 0.1  # Terms whose words match a larger share of messages count as common
+    query_limited_scan_days: int = 30  # Days of messages a limited scan reads
+    query_stats_ttl: int = 600  # Seconds lexeme statistics and per-term plans are reused
+    query_plan_cache_entries: int = 10000  # Maximum number of planned terms kept per worker
+
+    # DiscordChatExporter CLI invocation; a single run feeds every requested sink
+    exporter_command: str = "dotnet /Users/shruti/Downloads/DiscordChatExporter.Cli/DiscordChatExporter.Cli.dll"
+    export_pipeline_queue_size: int = 4  # Parsed batches buffered per sink before parsing waits for it
+    export_keep_files: bool = False  # Keep export JSON files after loading them (for debugging)
+
+    # Incremental export settings; each channel resumes from its stored watermark
+    export_initial_days: int = 7  # Days exported for a channel that has no watermark yet
+    export_overlap_minutes: int = 0  # Rewind the watermark by this much to re-read late edits
+
+    # Ingestion settings for loading exported chats into Postgres
+    ingest_mode: str = "insert"  # "insert" for per-batch INSERTs, "copy" for binary COPY through a staging table
+    copy_initial_batch_size: int = 5000  # Rows in the first COPY batch before adapting to commit latency
+    copy_min_batch_size: int = 1000  # Lower bound for the adaptive COPY batch size
+    copy_max_batch_size: int = 100000  # Upper bound for the adaptive COPY batch size
+    copy_target_commit_seconds: float = 1.0  # Desired wall time for one COPY + merge + commit
+
+    # Monthly partitions of discord_chats, maintained at startup and by the export workers
+    partition_months_ahead: int = 2  # Months after the current one that get a partition ahead of time
+    partition_retention_months: int = 0  # Partitions older than this many months are dropped; 0 keeps all
+    partition_maintenance_interval: int = 3600  # Seconds between maintenance runs in each worker
+
+    # Elasticsearch bulk indexing
+    es_bulk_concurrency: int = 4  # Bulk requests in flight at once per export
+    es_bulk_chunk_docs: int = 1000  # Maximum documents per bulk request
+    es_bulk_chunk_bytes: int = 5 * 1024 * 1024  # Maximum bytes per bulk request
+    es_bulk_max_retries: int = 5  # Retries of documents rejected with 429 or 409
+    es_bulk_initial_backoff: float = 0.5  # Seconds before the first retry; doubles on each retry
+    es_bulk_max_backoff: float = 30.0  # Upper bound on the delay between retries
+    es_relax_settings_after_docs: int = 50000  # Loads this large pause refreshes and replicas; 0 disables
+    es_refresh_interval: str = "1s"  # Refresh interval of chat indices outside bulk loads
+    es_number_of_replicas: int = 1  # Replicas of chat indices outside bulk loads
+    es_pit_keep_alive: str = "2m"  # How long a cursor scan's point in time survives between pages
+
+    # Export job queue (a Redis stream) consumed by worker processes: python -m app.worker
+    export_worker_concurrency: int = 4  # Jobs one worker process runs at the same time
+    export_job_max_attempts: int = 3  # Attempts before a job is moved to the dead-letter stream
+    export_job_retry_idle_seconds: int = 60  # Unacknowledged jobs idle this long are retried by any worker
+    export_job_heartbeat_seconds: float = 10.0  # How often running jobs publish progress and renew their claim
+    export_job_ttl: int = 7 * 24 * 3600  # Seconds finished job records remain available for status queries
+    export_job_token_ttl: int = 6 * 3600  # Seconds a queued job's Discord token is kept; jobs not run by then fail
+    worker_metrics_port: int = 0  # Port on which each worker serves Prometheus metrics; 0 disables
 
     # Inner class to configure the behavior of the settings model
     class Config:
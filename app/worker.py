@@ -0,0 +1,144 @@
+"""
+Export worker: consumes export jobs queued through /api/jobs/export/{channel_id}.
+Any number of workers can run, on any number of machines, against the same Redis:
+
+    python -m app.worker
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+
+from prometheus_client import start_http_server
+
+from .core.database import engine
+from .dependencies import db_session, get_elasticsearch, get_redis, shutdown_elasticsearch, shutdown_redis
+from .services import chat_exporter, elasticsearch_chat_exporter, export_jobs, export_pipeline, metrics, partitions
+from .services.export_progress import ExportProgress
+from .settings import get_settings
+
+# Set up logging for the worker
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Longest time a read for new jobs blocks, so shutdown and stale-job claims stay responsive
+READ_BLOCK_MS = 5000
+
+
+async def run_job(sink: str, token: str, channel_id: str, progress: ExportProgress):
+    """Exports a channel into a sink and records the export, like the synchronous endpoints."""
+    redis = await get_redis()
+    if sink == export_jobs.SINK_ALL:
+        return await run_all_sinks(token, channel_id, progress)
+    if sink == export_jobs.SINK_POSTGRES:
+        async with db_session() as session:
+            response = await chat_exporter.export_chat(token, channel_id, session, redis=redis, progress=progress)
+    else:
+        es = await get_elasticsearch()
+        response = await elasticsearch_chat_exporter.export_chat(token, channel_id, es, redis=redis, progress=progress)
+    await export_jobs.record_export(redis, sink, response)
+    return response
+
+
+async def run_all_sinks(token: str, channel_id: str, progress: ExportProgress):
+    """Loads Postgres and Elasticsearch from a single export run."""
+    redis = await get_redis()
+    es = await get_elasticsearch()
+    async with db_session() as session:
+        writers = [chat_exporter.PostgresWriter(session), elasticsearch_chat_exporter.ElasticsearchWriter(es)]
+        results = await export_pipeline.run_export(token, channel_id, writers, redis=redis, progress=progress)
+
+    # Sinks that stored everything are recorded even if the other one has to be retried
+    for result in results.values():
+        if result.complete and result.total_inserted:
+            await export_jobs.record_export(redis, result.sink, result.as_response())
+    incomplete = [result for result in results.values() if not result.complete]
+    if incomplete:
+        raise RuntimeError("Failed to insert some messages into: " + ", ".join(
+            f"{result.sink} ({result.total_messages - result.total_inserted} failed)" for result in incomplete))
+    return {"message": " ".join(result.as_response()["message"] for result in results.values()),
+            "months": sorted(set().union(*(result.months for result in results.values())))}
+
+
+def _job_done(running):
+    """Builds a callback that frees a job's slot and logs errors from processing it."""
+    def callback(task):
+        running.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Export job processing failed: {task.exception()}")
+    return callback
+
+
+async def maintain_partitions(stopping: asyncio.Event):
+    """Runs partition maintenance every ``partition_maintenance_interval`` seconds until stopped."""
+    interval = get_settings().partition_maintenance_interval
+    while not stopping.is_set():
+        try:
+            await partitions.maintain_partitions(redis=await get_redis())
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {e}")
+        try:
+            await asyncio.wait_for(stopping.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main():
+    """Pulls jobs until SIGINT/SIGTERM, running at most ``export_worker_concurrency`` at once."""
+    settings = get_settings()
+    redis = await get_redis()
+    consumer = f"{socket.gethostname()}:{os.getpid()}"
+    await export_jobs.ensure_group(redis)
+    metrics.instrument_engine(engine, "writer")
+    if settings.worker_metrics_port:
+        # Export stage timings and throughput are scraped from the workers that run the exports
+        start_http_server(settings.worker_metrics_port)
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+
+    running = set()
+    maintenance = asyncio.ensure_future(maintain_partitions(stopping))
+    next_claim = 0.0
+    logger.info(f"Export worker {consumer} started with concurrency {settings.export_worker_concurrency}")
+    try:
+        while not stopping.is_set():
+            free = settings.export_worker_concurrency - len(running)
+            if free <= 0:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            entries = []
+            try:
+                if time.monotonic() >= next_claim:
+                    # Retry failed jobs and take over jobs of workers that stopped heartbeating
+                    entries = await export_jobs.claim_stale(redis, consumer, free)
+                    next_claim = time.monotonic() + settings.export_job_heartbeat_seconds
+                if not entries:
+                    entries = await export_jobs.read_new(redis, consumer, free, READ_BLOCK_MS)
+            except Exception as e:
+                logger.error(f"Failed to fetch export jobs, retrying: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for entry_id, fields in entries:
+                task = asyncio.ensure_future(export_jobs.process_entry(redis, consumer, entry_id, fields, run_job))
+                running.add(task)
+                task.add_done_callback(_job_done(running))
+    finally:
+        # Let in-flight exports finish; jobs interrupted harder than this are retried elsewhere
+        if running:
+            logger.info(f"Waiting for {len(running)} running export jobs to finish")
+            await asyncio.wait(running)
+        stopping.set()
+        await maintenance
+        await shutdown_elasticsearch()
+        await shutdown_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
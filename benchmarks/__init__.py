@@ -0,0 +1,11 @@
+"""
+Reproducible ingest and search benchmarks run against local Postgres, Redis and
+Elasticsearch stand-ins (see benchmarks/docker-compose.yml):
+
+    python -m benchmarks.bench_ingest --messages 200000 --output results/ingest.json
+    python -m benchmarks.bench_search --rows 1000000 10000000 --output results/search.json
+    python -m benchmarks.results results/baseline.json results/search.json
+
+Both use a synthetic DiscordChatExporter corpus (benchmarks.corpus) generated from a
+fixed seed, so runs on the same machine are comparable.
+"""
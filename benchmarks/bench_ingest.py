@@ -0,0 +1,106 @@
+"""
+Ingest throughput of the export paths, with the DiscordChatExporter CLI replaced by
+benchmarks.stub_exporter. Each mode loads the same synthetic channel export:
+
+    postgres-insert   chat_exporter.export_chat with ingest_mode=insert
+    postgres-copy     chat_exporter.export_chat with ingest_mode=copy
+    elasticsearch     elasticsearch_chat_exporter.export_chat
+    all               one export run feeding both sinks, as export jobs with sink=all do
+
+    python -m benchmarks.bench_ingest --messages 200000 --repeat 3 --output results/ingest.json
+
+The benchmark channel's rows and documents are deleted before every run, so the
+Postgres and Elasticsearch stand-ins must not hold data you want to keep in it.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from app.dependencies import db_session, get_elasticsearch, shutdown_elasticsearch
+from app.services import chat_exporter, elasticsearch_chat_exporter
+from app.services.es_indices import INDEX_PATTERN
+from app.services.export_pipeline import run_export
+from app.services.export_progress import ExportProgress
+from app.settings import get_settings
+from .corpus import add_spec_arguments, spec_from_args, write_corpus
+from .results import save_results
+
+MODES = ("postgres-insert", "postgres-copy", "elasticsearch", "all")
+
+
+async def reset_channel(channel_id: str):
+    """Deletes the benchmark channel's messages from both stores."""
+    async with db_session() as session:
+        await session.execute(text("DELETE FROM discord_chats WHERE channel_id = :channel_id"),
+                              {"channel_id": int(channel_id)})
+    es = await get_elasticsearch()
+    await es.delete_by_query(index=INDEX_PATTERN, query={"term": {"channel_id": channel_id}},
+                             conflicts="proceed", refresh=True, ignore_unavailable=True, allow_no_indices=True)
+
+
+async def run_mode(mode: str, channel_id: str, progress: ExportProgress):
+    settings = get_settings()
+    settings.ingest_mode = "copy" if mode == "postgres-copy" else "insert"
+    if mode == "elasticsearch":
+        es = await get_elasticsearch()
+        await elasticsearch_chat_exporter.export_chat("token", channel_id, es, progress=progress)
+        return
+    async with db_session() as session:
+        if mode == "all":
+            es = await get_elasticsearch()
+            writers = [chat_exporter.PostgresWriter(session), elasticsearch_chat_exporter.ElasticsearchWriter(es)]
+            await run_export("token", channel_id, writers, progress=progress)
+        else:
+            await chat_exporter.export_chat("token", channel_id, session, progress=progress)
+
+
+async def benchmark(args):
+    spec = spec_from_args(args)
+    spec.channels = 1
+    channel_id = spec.channel_ids()[0]
+    settings = get_settings()
+    results = []
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        write_corpus(spec, corpus_dir)
+        settings.exporter_command = f"{sys.executable} -m benchmarks.stub_exporter --corpus {corpus_dir}"
+        for mode in args.modes:
+            runs = []
+            for _ in range(args.repeat):
+                await reset_channel(channel_id)
+                progress = ExportProgress()
+                start = time.perf_counter()
+                await run_mode(mode, channel_id, progress)
+                seconds = time.perf_counter() - start
+                metrics = {"seconds": seconds, "rows_per_second": spec.messages / seconds}
+                metrics.update({f"stage_{stage}_seconds": value for stage, value in progress.stage_seconds.items()})
+                runs.append(metrics)
+            # Report the median of each metric over the repeats
+            metrics = {name: round(statistics.median(run[name] for run in runs if name in run), 4)
+                       for name in runs[0]}
+            print(f"{mode}: {metrics['rows_per_second']:.0f} rows/s ({metrics['seconds']:.2f}s)")
+            results.append({"name": f"ingest:{mode}", "parameters": {"messages": spec.messages}, "metrics": metrics})
+    await reset_channel(channel_id)
+    await shutdown_elasticsearch()
+    return spec, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark export ingest throughput.")
+    add_spec_arguments(parser)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode; the median is reported")
+    parser.add_argument("--output", default="benchmark-results/ingest.json")
+    args = parser.parse_args()
+    spec, results = asyncio.run(benchmark(args))
+    save_results(args.output, "ingest", {**vars(spec), "start_date": spec.start_date.isoformat(),
+                                         "modes": args.modes, "repeat": args.repeat}, results)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Latency and throughput of every search route at growing table sizes. For each size the
+stand-ins are first filled up to that many synthetic rows (Postgres through the COPY
+loader, Elasticsearch through the bulk indexer; rows already there are kept), then
+each route is measured twice:
+
+    cold   sequential requests, with the search cache invalidated before each one
+    warm   concurrent requests answered from the cache
+
+    python -m benchmarks.bench_search --rows 1000000 10000000 --output results/search.json
+
+Requests go to the app in-process unless --url points at a running server.
+"""
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+
+import httpx
+from sqlalchemy import text
+
+from app.dependencies import db_session, get_elasticsearch, get_redis, shutdown_elasticsearch
+from app.services import search_cache
+from app.services.bulk_loader import copy_batch
+from app.services.es_bulk import bulk_index
+from app.services.es_indices import INDEX_PATTERN, ensure_index_template, index_for_ordinal
+from app.services.message_batch import MessageBatch
+from app.services.partitions import ensure_partitions
+from .corpus import CorpusSpec, add_spec_arguments, generate_messages, search_terms, spec_from_args
+from .results import latency_summary, save_results
+
+# Messages generated and loaded per batch while seeding
+SEED_BATCH_SIZE = 50000
+
+
+def search_cases(spec: CorpusSpec):
+    """Lists (name, backend, path, params) of the requests measured at every size."""
+    terms = search_terms(spec)
+    month_end = min(spec.end_date, spec.start_date + timedelta(days=30))
+    month = {"start_date": spec.start_date.isoformat(), "end_date": month_end.isoformat()}
+    everything = {"start_date": spec.start_date.isoformat(), "end_date": spec.end_date.isoformat()}
+    postgres, elasticsearch = search_cache.BACKEND_POSTGRES, search_cache.BACKEND_ELASTICSEARCH
+    cases = []
+    for kind in ("frequent", "medium", "rare"):
+        cases += [
+            (f"search:{kind}", postgres, "/api/chats/search", {"search_term": terms[kind], "page_size": 100}),
+            (f"context-search:{kind}", postgres, "/api/chats/context-search", {"search_term": terms[kind], "page_size": 100}),
+            (f"es-search:{kind}", elasticsearch, "/api/es/chats/search", {"keyword": terms[kind], "page_size": 100}),
+        ]
+    cases += [
+        # Unpaginated searches return every match, so only the selective terms are measured
+        ("search-all:medium", postgres, "/api/chats/search/all", {"search_term": terms["medium"]}),
+        ("search-all:rare", postgres, "/api/chats/search/all", {"search_term": terms["rare"]}),
+        ("search:frequent:page-50", postgres, "/api/chats/search", {"search_term": terms["frequent"], "page_size": 100, "page": 50}),
+        ("by-date:month", postgres, "/api/chats/search/by-date", {**month, "page_size": 100}),
+        ("by-date:all", postgres, "/api/chats/search/by-date", {**everything, "page_size": 100}),
+        ("es-by-date:month", elasticsearch, "/api/es/chats/search/by-date", {**month, "page_size": 100}),
+        ("es-by-date:all", elasticsearch, "/api/es/chats/search/by-date", {**everything, "page_size": 100}),
+    ]
+    return cases
+
+
+def _batches(spec: CorpusSpec, channel_index: int, channel_id: str, start: int, stop: int):
+    for offset in range(start, stop, SEED_BATCH_SIZE):
+        count = min(SEED_BATCH_SIZE, stop - offset)
+        yield MessageBatch.from_messages(list(generate_messages(spec, channel_index, count, offset)), channel_id)
+
+
+def _per_channel(spec: CorpusSpec, rows: int):
+    per_channel = -(-rows // spec.channels)
+    return [max(0, min(per_channel, rows - index * per_channel)) for index in range(spec.channels)]
+
+
+async def seed_postgres(spec: CorpusSpec, rows: int):
+    """Loads the first ``rows`` corpus messages into discord_chats, skipping those already there."""
+    for index, (channel_id, target) in enumerate(zip(spec.channel_ids(), _per_channel(spec, rows))):
+        async with db_session() as session:
+            result = await session.execute(text("SELECT count(*) FROM discord_chats WHERE channel_id = :channel_id"),
+                                           {"channel_id": int(channel_id)})
+            existing = result.scalar_one()
+        async with db_session() as session:
+            for batch in _batches(spec, index, channel_id, existing, target):
+                await ensure_partitions(batch.months())
+                await copy_batch(session, batch)
+        print(f"postgres: channel {channel_id} holds {max(existing, target)} rows")
+    async with db_session() as session:
+        await session.execute(text("ANALYZE discord_chats"))
+
+
+async def seed_elasticsearch(spec: CorpusSpec, rows: int):
+    """Indexes the first ``rows`` corpus messages, skipping those already indexed."""
+    es = await get_elasticsearch()
+    await ensure_index_template(es)
+    for index, (channel_id, target) in enumerate(zip(spec.channel_ids(), _per_channel(spec, rows))):
+        response = await es.count(index=INDEX_PATTERN, query={"term": {"channel_id": channel_id}},
+                                  ignore_unavailable=True, allow_no_indices=True)
+        existing = response["count"]
+        for batch in _batches(spec, index, channel_id, existing, target):
+            _, errors = await bulk_index(es, batch.es_actions(index_for_ordinal))
+            if errors:
+                raise RuntimeError(f"Failed to index {len(errors)} benchmark documents")
+        print(f"elasticsearch: channel {channel_id} holds {max(existing, target)} documents")
+    await es.indices.refresh(index=INDEX_PATTERN)
+
+
+async def _timed_get(client: httpx.AsyncClient, path: str, params: dict, statuses: dict):
+    start = time.perf_counter()
+    response = await client.get(path, params=params)
+    await response.aread()
+    elapsed = time.perf_counter() - start
+    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return elapsed
+
+
+async def measure_cold(client, redis, spec: CorpusSpec, backend: str, path: str, params: dict, requests: int):
+    """Sequential requests, each preceded by invalidating every cached search of the backend."""
+    months = search_cache.month_scopes(spec.start_date, spec.end_date)
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    for _ in range(requests):
+        await search_cache.invalidate(redis, backend, months)
+        latencies.append(await _timed_get(client, path, params, statuses))
+    return latencies, time.perf_counter() - start, statuses
+
+
+async def measure_warm(client, path: str, params: dict, requests: int, concurrency: int):
+    """``requests`` requests from ``concurrency`` concurrent clients after one priming request."""
+    statuses = {}
+    await _timed_get(client, path, params, {})
+    remaining = iter(range(requests))
+    latencies = []
+
+    async def client_loop():
+        for _ in remaining:
+            latencies.append(await _timed_get(client, path, params, statuses))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start, statuses
+
+
+def _client(url):
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=300)
+    from app.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=300)
+
+
+async def benchmark(args):
+    spec = spec_from_args(args)
+    spec.messages = max(args.rows)
+    redis = await get_redis()
+    results = []
+    async with _client(args.url) as client:
+        for rows in sorted(args.rows):
+            await seed_postgres(spec, rows)
+            if not args.skip_elasticsearch:
+                await seed_elasticsearch(spec, rows)
+            for name, backend, path, params in search_cases(spec):
+                if args.skip_elasticsearch and backend == search_cache.BACKEND_ELASTICSEARCH:
+                    continue
+                phases = {
+                    "cold": await measure_cold(client, redis, spec, backend, path, params, args.cold_requests),
+                    "warm": await measure_warm(client, path, params, args.warm_requests, args.concurrency),
+                }
+                for phase, (latencies, seconds, statuses) in phases.items():
+                    metrics = latency_summary(latencies, seconds)
+                    print(f"{rows} rows {name} {phase}: p50 {metrics['p50_ms']}ms p99 {metrics['p99_ms']}ms "
+                          f"{metrics['requests_per_second']} req/s")
+                    results.append({
+                        "name": f"search:{rows}:{name}:{phase}",
+                        "parameters": {"rows": rows, "path": path, "params": params,
+                                       "statuses": {str(code): count for code, count in statuses.items()}},
+                        "metrics": metrics,
+                    })
+    await shutdown_elasticsearch()
+    return spec, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search routes at several table sizes.")
+    add_spec_arguments(parser)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000000, 10000000], help="Table sizes to measure at")
+    parser.add_argument("--cold-requests", type=int, default=20)
+    parser.add_argument("--warm-requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--url", help="Base URL of a running server; the app runs in-process otherwise")
+    parser.add_argument("--skip-elasticsearch", action="store_true")
+    parser.add_argument("--output", default="benchmark-results/search.json")
+    args = parser.parse_args()
+    spec, results = asyncio.run(benchmark(args))
+    save_results(args.output, "search", {**vars(spec), "start_date": spec.start_date.isoformat(),
+                                         "rows": args.rows, "concurrency": args.concurrency}, results)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
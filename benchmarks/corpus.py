@@ -0,0 +1,149 @@
+"""
+Synthetic DiscordChatExporter exports. Message contents are drawn from a Zipf-distributed
+vocabulary, so the corpus has frequent, medium and rare terms like real chat does, and
+their lengths follow a log-normal distribution. Everything derives from the seed:
+
+    python -m benchmarks.corpus --messages 1000000 --channels 4 --days 365 --output corpus/
+"""
+import argparse
+import bisect
+import itertools
+import json
+import math
+import os
+import random
+from datetime import date, datetime, time, timedelta, timezone
+
+# Syllables pseudo-words are built from; they are not English stop words
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "zi", "po", "shu", "den", "mar", "tis", "gol", "bex", "qua"]
+
+# Ranks of the terms benchmarks search for, from most to least frequent
+FREQUENT_RANK = 0
+MEDIUM_RANK = 200
+RARE_RANK = 8000
+
+# Message ids of a channel start here; channel n's ids start at n * CHANNEL_ID_STRIDE
+CHANNEL_ID_STRIDE = 10 ** 12
+
+
+class CorpusSpec:
+    """Parameters of a synthetic corpus; the same spec always produces the same messages."""
+
+    def __init__(self, messages: int = 100000, channels: int = 1, start_date: date = date(2024, 1, 1),
+                 days: int = 365, mean_words: float = 12.0, words_sigma: float = 0.8,
+                 vocabulary_size: int = 20000, zipf_exponent: float = 1.1, seed: int = 42):
+        self.messages = messages
+        self.channels = channels
+        self.start_date = start_date
+        self.days = days
+        self.mean_words = mean_words  # Mean message length in words
+        self.words_sigma = words_sigma  # Spread of the log-normal length distribution
+        self.vocabulary_size = vocabulary_size
+        self.zipf_exponent = zipf_exponent
+        self.seed = seed
+
+    @property
+    def end_date(self) -> date:
+        return self.start_date + timedelta(days=self.days - 1)
+
+    def channel_ids(self):
+        return [str(900000000000000000 + channel) for channel in range(self.channels)]
+
+
+def vocabulary(size: int, seed: int):
+    """Builds ``size`` distinct pseudo-words, ordered by the frequency rank they get."""
+    rng = random.Random(seed)
+    words, seen = [], set()
+    while len(words) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def search_terms(spec: CorpusSpec) -> dict:
+    """Returns the frequent, medium and rare terms of a corpus, keyed by those names."""
+    words = vocabulary(spec.vocabulary_size, spec.seed)
+    return {"frequent": words[FREQUENT_RANK], "medium": words[MEDIUM_RANK],
+            "rare": words[min(RARE_RANK, spec.vocabulary_size - 1)]}
+
+
+def generate_messages(spec: CorpusSpec, channel_index: int, count: int, offset: int = 0):
+    """
+    Yields ``count`` DiscordChatExporter message objects of a channel, starting with its
+    ``offset``-th message. Each message gets a uniformly random time within the corpus's
+    days, so any prefix of a channel (e.g. the first 1M of 10M rows) spans every day.
+    """
+    words = vocabulary(spec.vocabulary_size, spec.seed)
+    weights = [1 / (rank + 1) ** spec.zipf_exponent for rank in range(len(words))]
+    cumulative = list(itertools.accumulate(weights))
+    total_weight = cumulative[-1]
+    start = datetime.combine(spec.start_date, time(), tzinfo=timezone.utc)
+    mu = math.log(spec.mean_words) - spec.words_sigma ** 2 / 2
+
+    for position in range(offset, offset + count):
+        rng = random.Random((spec.seed * 1000003 + channel_index) * CHANNEL_ID_STRIDE + position)
+        length = max(1, int(rng.lognormvariate(mu, spec.words_sigma)))
+        content = " ".join(words[bisect.bisect_left(cumulative, rng.random() * total_weight)]
+                           for _ in range(length))
+        timestamp = start + timedelta(seconds=rng.random() * spec.days * 86400)
+        yield {
+            "id": str(channel_index * CHANNEL_ID_STRIDE + position + 1),
+            "type": "Default",
+            "timestamp": timestamp.isoformat(timespec="milliseconds"),
+            "content": content,
+            "author": {"id": str(100 + position % 50), "name": f"user{position % 50}"},
+        }
+
+
+def write_export(path: str, channel_id: str, messages):
+    """Writes messages in the DiscordChatExporter JSON layout, one message at a time."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('{"guild": {"id": "1", "name": "Benchmark"}, ')
+        file.write(f'"channel": {{"id": "{channel_id}", "name": "bench"}}, "messages": [')
+        for message in messages:
+            file.write(("," if count else "") + json.dumps(message, ensure_ascii=False))
+            count += 1
+        file.write(f'], "messageCount": {count}}}')
+    return count
+
+
+def write_corpus(spec: CorpusSpec, directory: str):
+    """Writes one export per channel to ``<directory>/<channel_id>.json``; returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    per_channel = -(-spec.messages // spec.channels)
+    paths = []
+    for index, channel_id in enumerate(spec.channel_ids()):
+        count = min(per_channel, spec.messages - index * per_channel)
+        path = os.path.join(directory, f"{channel_id}.json")
+        write_export(path, channel_id, generate_messages(spec, index, max(count, 0)))
+        paths.append(path)
+    return paths
+
+
+def spec_from_args(args) -> CorpusSpec:
+    return CorpusSpec(messages=args.messages, channels=args.channels,
+                      start_date=date.fromisoformat(args.start_date), days=args.days,
+                      mean_words=args.mean_words, words_sigma=args.words_sigma, seed=args.seed)
+
+
+def add_spec_arguments(parser: argparse.ArgumentParser):
+    """Adds the corpus options shared by the generator and the benchmarks."""
+    parser.add_argument("--messages", type=int, default=100000, help="Total number of messages")
+    parser.add_argument("--channels", type=int, default=1, help="Number of channels the messages are split over")
+    parser.add_argument("--start-date", default="2024-01-01", help="Date of the first message")
+    parser.add_argument("--days", type=int, default=365, help="Number of days the messages spread over")
+    parser.add_argument("--mean-words", type=float, default=12.0, help="Mean message length in words")
+    parser.add_argument("--words-sigma", type=float, default=0.8, help="Spread of the log-normal message length")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic DiscordChatExporter JSON exports.")
+    add_spec_arguments(parser)
+    parser.add_argument("--output", required=True, help="Directory the exports are written to")
+    args = parser.parse_args()
+    for path in write_corpus(spec_from_args(args), args.output):
+        print(path)
@@ -0,0 +1,111 @@
+"""
+Machine-readable benchmark results and regression checks against a baseline:
+
+    python -m benchmarks.results baseline.json current.json --tolerance 0.15
+
+Exits with status 1 if any metric got worse than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Metrics where a larger value is better; every other metric is a duration or size
+HIGHER_IS_BETTER = ("rows_per_second", "requests_per_second")
+
+
+def percentile(values, fraction: float) -> float:
+    """Returns the nearest-rank percentile of a list of values (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(latencies, wall_seconds: float) -> dict:
+    """Summarizes request latencies (in seconds) measured over ``wall_seconds``."""
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0) * 1000, 3),
+        "requests_per_second": round(len(latencies) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(path: str, suite: str, parameters: dict, results: list):
+    """
+    Writes a suite's results with enough context to compare runs: the commit, the
+    machine and the parameters. Each result has a unique ``name`` and a ``metrics`` dict.
+    """
+    document = {
+        "suite": suite,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": _git_commit(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "parameters": parameters,
+        "results": results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(document, file, indent=2)
+    return document
+
+
+def compare(baseline: dict, current: dict, tolerance: float):
+    """
+    Lists the metrics of ``current`` that regressed by more than ``tolerance`` (a fraction)
+    against the result of the same name in ``baseline``, as (result, metric, old, new).
+    """
+    baseline_results = {result["name"]: result["metrics"] for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old_metrics = baseline_results.get(result["name"])
+        if old_metrics is None:
+            continue
+        for metric, new in result["metrics"].items():
+            old = old_metrics.get(metric)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or old <= 0:
+                continue
+            if metric.endswith(HIGHER_IS_BETTER):
+                regressed = new < old * (1 - tolerance)
+            else:
+                regressed = metric != "requests" and new > old * (1 + tolerance)
+            if regressed:
+                regressions.append((result["name"], metric, old, new))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare benchmark results against a baseline.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    args = parser.parse_args()
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(args.current, encoding="utf-8") as file:
+        current = json.load(file)
+    regressions = compare(baseline, current, args.tolerance)
+    for name, metric, old, new in regressions:
+        print(f"REGRESSION {name} {metric}: {old} -> {new}")
+    if not regressions:
+        print("No regressions")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,17 @@
+-- Schema of the benchmark Postgres stand-in, as in the README's "Postgres Database setup".
+-- Monthly partitions and their indexes are created by the application.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS discord_chats (
+    message_id BIGINT,
+    channel_id BIGINT,
+    message_date DATE,
+    content TEXT,
+    content_tsvector TSVECTOR,
+    PRIMARY KEY (message_id, message_date)
+) PARTITION BY RANGE (message_date);
+
+CREATE INDEX IF NOT EXISTS idx_content_tsvector ON discord_chats USING gin (content_tsvector);
+CREATE INDEX IF NOT EXISTS idx_message_date ON discord_chats (message_date);
+CREATE INDEX IF NOT EXISTS idx_message_date_id ON discord_chats (message_date, message_id);
+CREATE INDEX IF NOT EXISTS discord_chats_trgm_gin ON discord_chats USING gin (content gin_trgm_ops);
@@ -0,0 +1,44 @@
+"""
+Stand-in for the DiscordChatExporter CLI. It accepts the same "export" arguments as
+export_command.start_export_command builds and copies the pre-generated export of the
+requested channel from the corpus directory to the output path, in chunks, so the
+export pipeline tails a growing file as it does with the real CLI:
+
+    exporter_command="python -m benchmarks.stub_exporter --corpus corpus/"
+"""
+import argparse
+import os
+import sys
+import time
+
+CHUNK_SIZE = 1 << 20
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", required=True, help="Directory holding <channel_id>.json exports")
+    parser.add_argument("--bytes-per-second", type=float, default=0,
+                        help="Throttle the copy to simulate a slow exporter; 0 copies at full speed")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("-t", dest="token")
+    parser.add_argument("-c", dest="channel_id", required=True)
+    parser.add_argument("-f", dest="format")
+    parser.add_argument("--after")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args(argv)
+
+    source = os.path.join(args.corpus, f"{args.channel_id}.json")
+    if not os.path.exists(source):
+        sys.stderr.write("Channel does not contain any messages within the specified period.")
+        return 1
+    with open(source, "rb") as reader, open(args.output, "wb") as writer:
+        while chunk := reader.read(CHUNK_SIZE):
+            writer.write(chunk)
+            writer.flush()
+            if args.bytes_per_second:
+                time.sleep(len(chunk) / args.bytes_per_second)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+from datetime import date
+
+from app.services.export_stream import MessageStreamParser
+from benchmarks.corpus import CorpusSpec, generate_messages, search_terms, write_corpus
+
+def test_corpus_is_a_parseable_export_within_the_date_spread(tmp_path):
+    spec = CorpusSpec(messages=250, channels=2, start_date=date(2024, 3, 1), days=10)
+    paths = write_corpus(spec, str(tmp_path))
+    assert len(paths) == 2
+
+    parser = MessageStreamParser()
+    with open(paths[0], encoding="utf-8") as file:
+        messages = parser.feed(file.read()) + parser.close()
+    assert len(messages) == 125
+    assert len({message["id"] for message in messages}) == 125
+    assert all("2024-03-01" <= message["timestamp"][:10] <= "2024-03-10" for message in messages)
+
+def test_generation_is_deterministic_and_resumable():
+    spec = CorpusSpec(seed=7)
+    full = list(generate_messages(spec, 0, 20))
+    assert list(generate_messages(spec, 0, 10, offset=10)) == full[10:]
+    frequent = search_terms(spec)["frequent"]
+    assert sum(frequent in message["content"].split() for message in full) > 5
@@ -0,0 +1,14 @@
+from benchmarks.results import compare, percentile
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.99) == 0.0
+
+def test_compare_flags_slower_latency_and_lower_throughput():
+    baseline = {"results": [{"name": "a", "metrics": {"p99_ms": 10.0, "requests_per_second": 100.0, "requests": 50}}]}
+    current = {"results": [{"name": "a", "metrics": {"p99_ms": 12.0, "requests_per_second": 80.0, "requests": 500}},
+                           {"name": "new", "metrics": {"p99_ms": 1.0}}]}
+    assert compare(baseline, current, 0.1) == [("a", "p99_ms", 10.0, 12.0), ("a", "requests_per_second", 100.0, 80.0)]
+    assert compare(baseline, current, 0.25) == []
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from app.services.bulk_export import FORMAT_CSV, FORMAT_NDJSON, copy_out, copy_query
+from app.settings import get_settings
+
+def test_filters_are_numbered_in_argument_order():
+    query, args = copy_query(FORMAT_CSV, 42, date(2024, 1, 1), date(2024, 3, 31))
+    assert query == ("SELECT message_id, channel_id, message_date, content FROM discord_chats "
+                     "WHERE channel_id = $1 AND message_date >= $2 AND message_date <= $3")
+    assert args == [42, date(2024, 1, 1), date(2024, 3, 31)]
+
+def test_missing_filters_are_left_out():
+    query, args = copy_query(FORMAT_NDJSON, None, None, date(2024, 3, 31))
+    assert query.endswith("FROM discord_chats WHERE message_date <= $1")
+    assert query.startswith("SELECT json_build_object(")
+    assert args == [date(2024, 3, 31)]
+    assert "WHERE" not in copy_query(FORMAT_CSV, None, None, None)[0]
+
+class EndlessCopyConnection:
+    """Stands in for asyncpg: produces COPY output until it is cancelled."""
+
+    def __init__(self):
+        self.cancelled = False
+
+    async def copy_from_query(self, query, *args, output, **options):
+        try:
+            while True:
+                await output(b"1,2,2024-05-01,hello\n")
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+class FakeSession:
+    def __init__(self, driver_connection):
+        self.driver_connection = driver_connection
+
+    async def connection(self):
+        return self
+
+    async def get_raw_connection(self):
+        return self
+
+@pytest.mark.asyncio
+async def test_closing_while_the_queue_is_full_stops_the_copy(monkeypatch):
+    monkeypatch.setattr(get_settings(), "bulk_export_queue_chunks", 1)
+    driver = EndlessCopyConnection()
+    chunks = copy_out(FakeSession(driver), FORMAT_CSV)
+    assert await chunks.__anext__() == b"1,2,2024-05-01,hello\n"
+    await asyncio.sleep(0.01)  # Let the COPY fill the queue
+    await asyncio.wait_for(chunks.aclose(), timeout=1)
+    assert driver.cancelled
+
+class FiniteCopyConnection:
+    async def copy_from_query(self, query, *args, output, **options):
+        for index in range(3):
+            await output(f"{index}\n".encode())
+
+@pytest.mark.asyncio
+async def test_every_chunk_arrives_when_the_copy_ends_on_a_full_queue(monkeypatch):
+    monkeypatch.setattr(get_settings(), "bulk_export_queue_chunks", 1)
+    chunks = [chunk async for chunk in copy_out(FakeSession(FiniteCopyConnection()), FORMAT_CSV)]
+    assert chunks == [b"0\n", b"1\n", b"2\n"]
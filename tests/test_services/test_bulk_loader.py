@@ -0,0 +1,17 @@
+from app.services.bulk_loader import AdaptiveBatchSizer
+
+def test_batch_size_grows_when_commits_are_fast():
+    sizer = AdaptiveBatchSizer(initial=1000, minimum=500, maximum=8000, target_seconds=1.0)
+    sizer.record(1000, 0.1)
+    assert sizer() == 2000  # Growth is capped at 2x per batch
+    for _ in range(10):
+        sizer.record(sizer(), 0.1)
+    assert sizer() == 8000
+
+def test_batch_size_shrinks_when_commits_are_slow():
+    sizer = AdaptiveBatchSizer(initial=4000, minimum=500, maximum=8000, target_seconds=1.0)
+    sizer.record(4000, 4.0)
+    assert sizer() == 2500
+    for _ in range(10):
+        sizer.record(sizer(), sizer() / 100)
+    assert sizer() == 500
@@ -0,0 +1,19 @@
+import time
+
+from app.services.cache_codec import HEADER, pack_entry, unpack_entry
+
+def test_large_payload_is_compressed_and_round_trips():
+    payload = b'{"messages": [' + b'{"content": "hello world"},' * 500 + b'{}]}'
+    fresh_until = time.time() + 60
+    entry = pack_entry(payload, fresh_until)
+    assert len(entry) < len(payload) / 10
+    assert unpack_entry(entry) == (fresh_until, payload)
+
+def test_small_payload_is_stored_uncompressed():
+    entry = pack_entry(b'{"count": 0}', 1.0)
+    assert entry[HEADER.size:] == b'{"count": 0}'
+    assert unpack_entry(entry) == (1.0, b'{"count": 0}')
+
+def test_unknown_formats_are_misses():
+    assert unpack_entry(b'1714000000.000|{"count": 0}') is None
+    assert unpack_entry(pack_entry(b"x" * 2000, 1.0)[:-5]) is None
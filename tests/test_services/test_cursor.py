@@ -0,0 +1,33 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.future import select
+
+from app.models import Message
+from app.schemas import PaginationParams
+from app.services.chat_queries import next_cursor, paginate
+from app.services.cursor import decode_cursor, encode_cursor
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(["2024-04-25", 1234567890123456789])
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ["2024-04-25", 1234567890123456789]
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(HTTPException) as exc_info:
+        paginate(select(Message), PaginationParams(cursor="not-a-cursor"))
+    assert exc_info.value.status_code == 400
+
+def test_keyset_page_follows_cursor():
+    pagination = PaginationParams(page=5, page_size=2)
+    messages = [Message(message_id=i, channel_id=1, content="", message_date=date(2024, 4, 25)) for i in (7, 9)]
+    pagination.cursor = next_cursor(messages, pagination)
+    sql = str(paginate(select(Message), pagination).compile(dialect=postgresql.dialect()))
+    assert "(discord_chats.message_date, discord_chats.message_id) >" in sql
+    assert "ORDER BY discord_chats.message_date, discord_chats.message_id" in sql
+    assert "OFFSET" not in sql
+
+def test_last_page_has_no_cursor():
+    assert next_cursor([], PaginationParams(page_size=10)) is None
@@ -0,0 +1,89 @@
+import pytest
+from elasticsearch import NotFoundError
+from fastapi import HTTPException
+
+from app.schemas import PaginationParams
+from app.services.cursor import decode_cursor, encode_cursor
+from app.services.elasticsearch_chat_queries import DATE_SORT, es_cache_key, search_page
+
+DOCS = [{"message_id": str(i), "message_date": "2024-05-01", "content": f"hello {i}"} for i in range(25)]
+
+class FakeElasticsearch:
+    """Serves DOCS sorted by message_id and records how point in times are used."""
+
+    def __init__(self):
+        self.open_pits = set()
+        self.opened = 0
+        self.expire_next = False
+
+    async def open_point_in_time(self, index, keep_alive, ignore_unavailable):
+        self.opened += 1
+        pit_id = f"pit-{self.opened}"
+        self.open_pits.add(pit_id)
+        return {"id": pit_id}
+
+    async def close_point_in_time(self, id):
+        self.open_pits.discard(id)
+
+    async def search(self, body, index=None, **kwargs):
+        docs = DOCS
+        if "pit" in body:
+            assert index is None
+            if self.expire_next or body["pit"]["id"] not in self.open_pits:
+                self.expire_next = False
+                raise NotFoundError("search_context_missing_exception", None, None)
+            after = body["search_after"][-1]
+            docs = [doc for doc in DOCS if int(doc["message_id"]) > int(after)]
+        else:
+            docs = DOCS[body["from"]:]
+        hits = [{"_source": doc, "sort": [doc["message_date"], doc["message_id"]]} for doc in docs[:body["size"]]]
+        response = {"hits": {"hits": hits, "total": {"value": len(DOCS)}}}
+        if "pit" in body:
+            response["pit_id"] = body["pit"]["id"]
+        return response
+
+async def scan(es, page_size):
+    pagination = PaginationParams(page_size=page_size)
+    seen = []
+    while True:
+        docs, total, cursor = await search_page(es, ["chats-2024-05"], {"match_all": {}}, DATE_SORT, pagination)
+        seen.extend(doc["message_id"] for doc in docs)
+        if cursor is None:
+            return seen
+        pagination = PaginationParams(page_size=page_size, cursor=cursor)
+
+@pytest.mark.asyncio
+async def test_cursor_scan_reads_every_document_once_and_closes_its_pit():
+    es = FakeElasticsearch()
+    assert await scan(es, 10) == [doc["message_id"] for doc in DOCS]
+    assert es.opened == 1
+    assert not es.open_pits
+
+@pytest.mark.asyncio
+async def test_expired_pit_is_reopened_at_the_same_position():
+    es = FakeElasticsearch()
+    docs, _, cursor = await search_page(es, ["chats-2024-05"], {"match_all": {}}, DATE_SORT,
+                                        PaginationParams(page_size=10))
+    docs, _, cursor = await search_page(es, ["chats-2024-05"], {"match_all": {}}, DATE_SORT,
+                                        PaginationParams(page_size=10, cursor=cursor))
+    es.expire_next = True
+    docs, _, _ = await search_page(es, ["chats-2024-05"], {"match_all": {}}, DATE_SORT,
+                                   PaginationParams(page_size=10, cursor=cursor))
+    assert [doc["message_id"] for doc in docs] == [str(i) for i in range(20, 25)]
+    assert es.opened == 2
+
+@pytest.mark.asyncio
+async def test_deep_page_numbers_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        await search_page(FakeElasticsearch(), ["chats-*"], {"match_all": {}}, DATE_SORT,
+                          PaginationParams(page=1001, page_size=10))
+    assert error.value.status_code == 400
+
+def test_cache_key_ignores_the_pit_id():
+    first = PaginationParams(page_size=10, cursor=_cursor("pit-1"))
+    second = PaginationParams(page_size=10, cursor=_cursor("pit-2"))
+    assert es_cache_key(first) == es_cache_key(second)
+    assert decode_cursor(first.cursor)["after"] == ["2024-05-01", "9"]
+
+def _cursor(pit_id):
+    return encode_cursor({"pit": pit_id, "after": ["2024-05-01", "9"]})
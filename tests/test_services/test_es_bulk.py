@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services import es_bulk
+from app.settings import get_settings
+
+def actions(count):
+    return ({"_index": "chats", "_id": str(i), "_source": {"message_id": str(i), "content": "x" * 100}}
+            for i in range(count))
+
+class FakeElasticsearch:
+    """Answers bulk requests, rejecting each document id listed in ``rejections`` that many times."""
+
+    def __init__(self, rejections=None, failures=()):
+        self.rejections = dict(rejections or {})
+        self.failures = set(failures)
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def bulk(self, operations):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        headers = [json.loads(line)["index"]["_id"] for line in operations[::2]]
+        self.requests.append(headers)
+        items = []
+        for doc_id in headers:
+            if self.rejections.get(doc_id):
+                self.rejections[doc_id] -= 1
+                items.append({"index": {"_id": doc_id, "status": 429}})
+            elif doc_id in self.failures:
+                items.append({"index": {"_id": doc_id, "status": 400, "error": {"type": "mapper_parsing_exception"}}})
+            else:
+                items.append({"index": {"_id": doc_id, "status": 201}})
+        return {"items": items}
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(get_settings(), "es_bulk_initial_backoff", 0.001)
+
+@pytest.mark.asyncio
+async def test_only_rejected_documents_are_retried(monkeypatch):
+    monkeypatch.setattr(get_settings(), "es_bulk_chunk_docs", 10)
+    es = FakeElasticsearch(rejections={"3": 2}, failures={"7"})
+
+    success, errors = await es_bulk.bulk_index(es, actions(10))
+
+    assert success == 9
+    assert [error["index"]["_id"] for error in errors] == ["7"]
+    assert es.requests == [[str(i) for i in range(10)], ["3"], ["3"]]
+
+@pytest.mark.asyncio
+async def test_chunks_respect_byte_limit_and_concurrency(monkeypatch):
+    monkeypatch.setattr(get_settings(), "es_bulk_chunk_bytes", 1000)
+    monkeypatch.setattr(get_settings(), "es_bulk_concurrency", 2)
+    es = FakeElasticsearch()
+
+    success, errors = await es_bulk.bulk_index(es, actions(50))
+
+    assert success == 50 and errors == []
+    assert len(es.requests) > 1
+    assert sum(len(request) for request in es.requests) == 50
+    assert es.max_in_flight == 2
@@ -0,0 +1,16 @@
+from datetime import date
+
+from app.services.es_indices import INDEX_PATTERN, index_for_ordinal, indices_for_range
+
+def test_messages_are_routed_by_month_of_message_date():
+    assert index_for_ordinal(date(2024, 4, 30).toordinal()) == "chats-2024-04"
+    assert index_for_ordinal(date(2024, 5, 1).toordinal()) == "chats-2024-05"
+
+def test_date_range_targets_only_overlapping_months():
+    assert indices_for_range(date(2024, 4, 29), date(2024, 4, 30)) == ["chats-2024-04"]
+    assert indices_for_range(date(2023, 12, 31), date(2024, 1, 2)) == ["chats-2023-12", "chats-2024-01"]
+
+def test_open_or_very_wide_ranges_read_every_index():
+    assert indices_for_range() == [INDEX_PATTERN]
+    assert indices_for_range(date(2024, 1, 1), None) == [INDEX_PATTERN]
+    assert indices_for_range(date(2010, 1, 1), date(2024, 1, 1)) == [INDEX_PATTERN]
@@ -0,0 +1,149 @@
+import pytest
+
+from app.services import export_jobs
+from app.services.export_progress import ExportProgress
+from app.settings import get_settings
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the hash and stream commands used by export jobs."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.streams = {}
+        self.acked = []
+        self.data = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    async def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({name: str(value).encode() for name, value in mapping.items()})
+
+    async def hgetall(self, key):
+        return {name.encode(): value for name, value in self.hashes.get(key, {}).items()}
+
+    async def hincrby(self, key, field, amount=1):
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = str(int(fields.get(field, b"0")) + amount).encode()
+        return int(fields[field])
+
+    async def expire(self, key, ttl):
+        pass
+
+    async def xadd(self, stream, fields):
+        entries = self.streams.setdefault(stream, [])
+        entry_id = f"{len(entries) + 1}-0".encode()
+        entries.append((entry_id, {name.encode(): str(value).encode() for name, value in fields.items()}))
+        return entry_id
+
+    async def xack(self, stream, group, entry_id):
+        self.acked.append(entry_id)
+
+    async def xdel(self, stream, entry_id):
+        self.streams[stream] = [entry for entry in self.streams[stream] if entry[0] != entry_id]
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+async def enqueue_and_deliver(redis):
+    job_id = await export_jobs.enqueue(redis, "postgres", "42", "secret-token")
+    entry_id, fields = redis.streams[export_jobs.STREAM][0]
+    assert b"token" not in fields
+    return job_id, entry_id, fields
+
+@pytest.mark.asyncio
+async def test_successful_job_records_progress_and_is_acknowledged():
+    redis = FakeRedis()
+    job_id, entry_id, fields = await enqueue_and_deliver(redis)
+
+    async def run(sink, token, channel_id, progress):
+        assert (sink, token, channel_id) == ("postgres", "secret-token", "42")
+        progress.messages_parsed = progress.messages_inserted = 7
+        progress.add_time("insert", 0.5)
+        return {"message": "Successfully inserted 7 messages into the database.", "months": []}
+
+    await export_jobs.process_entry(redis, "worker-1", entry_id, fields, run)
+
+    job = await export_jobs.get_job(redis, job_id)
+    assert job["status"] == export_jobs.STATUS_SUCCEEDED
+    assert job["attempts"] == 1
+    assert job["messages_inserted"] == 7
+    assert job["stage_seconds"] == {"insert": 0.5}
+    assert "token" not in job
+    assert redis.acked == [entry_id]
+    assert redis.streams[export_jobs.STREAM] == []
+    assert export_jobs.token_key(job_id) not in redis.data
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_then_dead_lettered():
+    redis = FakeRedis()
+    job_id, entry_id, fields = await enqueue_and_deliver(redis)
+
+    async def run(sink, token, channel_id, progress):
+        raise RuntimeError("Export failed")
+
+    # Failed attempts stay pending so another worker can claim them later
+    for _ in range(get_settings().export_job_max_attempts - 1):
+        await export_jobs.process_entry(redis, "worker-1", entry_id, fields, run)
+        job = await export_jobs.get_job(redis, job_id)
+        assert job["status"] == export_jobs.STATUS_RETRYING
+        assert redis.acked == []
+
+    await export_jobs.process_entry(redis, "worker-1", entry_id, fields, run)
+    job = await export_jobs.get_job(redis, job_id)
+    assert job["status"] == export_jobs.STATUS_FAILED
+    assert job["error"] == "Export failed"
+    assert redis.acked == [entry_id]
+    dead_entry = redis.streams[export_jobs.DEAD_LETTER_STREAM][0][1]
+    assert dead_entry[b"job_id"] == job_id.encode()
+    assert b"token" not in dead_entry
+    assert export_jobs.token_key(job_id) not in redis.data
+
+@pytest.mark.asyncio
+async def test_job_whose_token_expired_is_dead_lettered():
+    redis = FakeRedis()
+    job_id, entry_id, fields = await enqueue_and_deliver(redis)
+    del redis.data[export_jobs.token_key(job_id)]
+
+    async def run(sink, token, channel_id, progress):
+        raise AssertionError("The job must not run without a token")
+
+    await export_jobs.process_entry(redis, "worker-1", entry_id, fields, run)
+    job = await export_jobs.get_job(redis, job_id)
+    assert job["status"] == export_jobs.STATUS_FAILED
+    assert redis.acked == [entry_id]
+
+@pytest.mark.asyncio
+async def test_unknown_job_returns_none():
+    assert await export_jobs.get_job(FakeRedis(), "missing") is None
+
+@pytest.mark.asyncio
+async def test_track_batches_counts_parsed_messages():
+    progress = ExportProgress()
+
+    async def batches():
+        yield [1, 2, 3]
+        yield [4]
+
+    assert [batch async for batch in progress.track_batches(batches())] == [[1, 2, 3], [4]]
+    assert progress.messages_parsed == 4
+    assert "parse" in progress.stage_seconds
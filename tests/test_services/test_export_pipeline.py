@@ -0,0 +1,88 @@
+import asyncio
+import json
+import os
+import sys
+import textwrap
+
+import pytest
+
+from app.services.export_pipeline import SinkWriter, run_export
+from app.settings import get_settings
+
+MESSAGES = [
+    {"id": str(1000 + i), "timestamp": f"2024-0{4 + i % 2}-25T10:15:30.123+00:00", "content": f"hello {i}"}
+    for i in range(50)
+]
+
+# Stand-in for DiscordChatExporter that writes its JSON slowly, so the file is read while still growing
+FAKE_CLI = textwrap.dedent("""
+    import json, sys, time
+    args = sys.argv[1:]
+    if {fail!r}:
+        sys.stderr.write({fail!r})
+        sys.exit(1)
+    output = args[args.index("--output") + 1]
+    messages = json.loads({messages!r})
+    with open(output, "w", encoding="utf-8") as file:
+        file.write('{{"guild": {{"id": "1"}}, "messages": [')
+        for i, message in enumerate(messages):
+            file.write(("," if i else "") + json.dumps(message))
+            if i % 10 == 0:
+                file.flush()
+                time.sleep(0.02)
+        file.write('], "messageCount": %d}}' % len(messages))
+""")
+
+class RecordingWriter(SinkWriter):
+    def __init__(self, sink, batch_size, delay=0.0):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.delay = delay
+        self.messages = []
+
+    async def write(self, batch):
+        await asyncio.sleep(self.delay)
+        self.messages.extend(batch.message_ids)
+        return len(batch)
+
+@pytest.fixture
+def fake_cli(tmp_path, monkeypatch):
+    def install(fail=""):
+        script = tmp_path / "fake_cli.py"
+        script.write_text(FAKE_CLI.format(fail=fail, messages=json.dumps(MESSAGES)))
+        monkeypatch.setattr(get_settings(), "exporter_command", f"{sys.executable} {script}")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(get_settings(), "export_pipeline_queue_size", 1)
+    return install
+
+@pytest.mark.asyncio
+async def test_one_export_run_feeds_every_sink(fake_cli, tmp_path):
+    fake_cli()
+    postgres, elasticsearch = RecordingWriter("postgres", 7), RecordingWriter("elasticsearch", 1000, delay=0.001)
+
+    results = await run_export("token", "42", [postgres, elasticsearch])
+
+    expected_ids = [int(message["id"]) for message in MESSAGES]
+    assert postgres.messages == expected_ids
+    assert elasticsearch.messages == expected_ids
+    for result in results.values():
+        assert result.complete and result.total_inserted == len(MESSAGES)
+        assert result.highest_message_id == 1049
+        assert result.months == {"2024-04", "2024-05"}
+    # Export files are removed once loaded
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".json")]
+
+@pytest.mark.asyncio
+async def test_no_messages_in_period_is_an_empty_export(fake_cli):
+    fake_cli(fail="Channel does not contain any messages within the specified period.")
+    writer = RecordingWriter("postgres", 10)
+
+    results = await run_export("token", "42", [writer])
+    assert results["postgres"].total_messages == 0
+
+@pytest.mark.asyncio
+async def test_exporter_failure_is_raised(fake_cli):
+    fake_cli(fail="Authentication token is invalid.")
+
+    with pytest.raises(RuntimeError, match="Authentication token is invalid"):
+        await run_export("token", "42", [RecordingWriter("postgres", 10)])
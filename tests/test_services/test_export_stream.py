@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from app.services.export_stream import MessageStreamParser, stream_message_batches
+
+EXPORT = {
+    "guild": {"id": "1", "name": "Guild \"messages\": ["},
+    "channel": {"id": "2", "topic": "{ \"messages\": [] }"},
+    "messages": [
+        {"id": str(1000 + i), "timestamp": "2024-04-25T10:15:30.123+00:00", "content": f"hello, [world] {i}"}
+        for i in range(25)
+    ],
+    "messageCount": 25
+}
+
+def test_parser_handles_any_chunk_boundary():
+    text = json.dumps(EXPORT, indent=2)
+    for chunk_size in (1, 2, 7, 64, len(text)):
+        parser = MessageStreamParser()
+        messages = []
+        for i in range(0, len(text), chunk_size):
+            messages.extend(parser.feed(text[i:i + chunk_size]))
+        messages.extend(parser.close())
+        assert messages == EXPORT["messages"]
+
+def test_parser_rejects_truncated_document():
+    text = json.dumps(EXPORT)
+    parser = MessageStreamParser()
+    parser.feed(text[:len(text) // 2])
+    with pytest.raises(ValueError):
+        parser.close()
+
+@pytest.mark.asyncio
+async def test_stream_message_batches(tmp_path):
+    export_file = tmp_path / "export.json"
+    export_file.write_text(json.dumps(EXPORT))
+    batches = [batch async for batch in stream_message_batches(str(export_file), batch_size=10)]
+    assert [len(batch) for batch in batches] == [10, 10, 5]
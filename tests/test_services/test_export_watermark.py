@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+
+from app.services.export_watermark import datetime_to_snowflake, export_after, snowflake_to_datetime
+
+def test_snowflake_round_trip():
+    moment = datetime(2024, 4, 25, 10, 15, 30, 123000, tzinfo=timezone.utc)
+    snowflake = datetime_to_snowflake(moment) + 12345  # Low bits hold worker/sequence data
+    assert snowflake_to_datetime(snowflake) == moment
+
+def test_export_after_uses_watermark():
+    assert export_after(1234567890123456789, overlap_minutes=0, initial_days=7) == "1234567890123456789"
+
+def test_export_after_rewinds_by_overlap():
+    watermark = datetime_to_snowflake(datetime(2024, 4, 25, 12, 0, tzinfo=timezone.utc))
+    after = int(export_after(watermark, overlap_minutes=30, initial_days=7))
+    assert snowflake_to_datetime(after) == datetime(2024, 4, 25, 11, 30, tzinfo=timezone.utc)
+
+def test_export_after_without_watermark_uses_initial_window():
+    assert len(export_after(None, overlap_minutes=30, initial_days=7)) == len("2024-04-25")
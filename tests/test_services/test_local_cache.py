@@ -0,0 +1,28 @@
+import time
+
+from app.services.local_cache import LocalCache
+
+def test_evicts_least_recently_used_by_entry_count():
+    cache = LocalCache(max_entries=2, max_bytes=1000, ttl=60)
+    cache.set("a", 1, size=1)
+    cache.set("b", 2, size=1)
+    cache.get("a")  # "b" becomes the least recently used entry
+    cache.set("c", 3, size=1)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+def test_evicts_by_total_bytes():
+    cache = LocalCache(max_entries=100, max_bytes=10, ttl=60)
+    cache.set("a", "x", size=6)
+    cache.set("b", "y", size=6)
+    assert cache.get("a") is None
+    assert cache.size_bytes == 6
+    cache.set("huge", "z", size=11)  # Larger than the whole cache; never stored
+    assert cache.get("huge") is None and cache.get("b") == "y"
+
+def test_entries_expire():
+    cache = LocalCache(max_entries=10, max_bytes=100, ttl=60)
+    cache.set("a", 1, size=1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
@@ -0,0 +1,43 @@
+from datetime import date, datetime
+
+from app.services.es_indices import index_for_ordinal
+from app.services.message_batch import MessageBatch, parse_date_ordinal
+
+MESSAGES = [
+    {"id": "1230000000000000001", "timestamp": "2024-04-30T23:30:00.123-07:00", "content": "late night"},
+    {"id": "1230000000000000002", "timestamp": "2024-05-01T06:30:00+00:00", "content": "no fraction"},
+    {"id": "1230000000000000003", "timestamp": "2024-05-01T07:00:00.5+00:00", "content": ""},
+]
+
+def test_parse_date_ordinal_matches_strptime():
+    for timestamp in ("2024-04-30T23:30:00.123-07:00", "2023-12-31T00:00:00.000+05:30"):
+        expected = datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%f%z').date().toordinal()
+        assert parse_date_ordinal(timestamp) == expected
+
+def test_parse_date_ordinal_falls_back_for_other_formats():
+    assert parse_date_ordinal("20240425T101530+0000") == date(2024, 4, 25).toordinal()
+
+def test_batch_columns_feed_postgres_and_elasticsearch():
+    batch = MessageBatch.from_messages(MESSAGES, "42")
+
+    assert len(batch) == 3
+    assert batch.highest_message_id == 1230000000000000003
+    assert batch.months() == {"2024-04", "2024-05"}
+    assert list(batch.records())[0] == (1230000000000000001, 42, date(2024, 4, 30), "late night")
+    assert batch.insert_parameters()[1]["message_date"] == date(2024, 5, 1)
+
+    action = next(batch.es_actions(index_for_ordinal))
+    assert action == {
+        "_index": "chats-2024-04",
+        "_id": "1230000000000000001",
+        "_source": {"message_id": "1230000000000000001", "channel_id": "42",
+                    "message_date": "2024-04-30", "content": "late night"},
+    }
+
+def test_since_keeps_messages_from_a_date_on():
+    batch = MessageBatch.from_messages(MESSAGES, "42")
+    assert batch.since(date(2024, 4, 1).toordinal()) is batch
+    recent = batch.since(date(2024, 5, 1).toordinal())
+    assert list(recent.message_ids) == [1230000000000000002, 1230000000000000003]
+    assert recent.months() == {"2024-05"}
+    assert len(batch.since(date(2024, 6, 1).toordinal())) == 0
@@ -0,0 +1,42 @@
+import pytest
+
+from app.services import metrics
+from app.services.export_pipeline import SinkResult
+from app.services.export_progress import ExportProgress
+
+def sample(name, **labels):
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0
+
+def test_cache_family_drops_term_and_generation():
+    assert metrics.cache_family("exact_search_keyword:hello:gen:3:page:1:size:10") == "exact_search_keyword"
+
+class Route:
+    path = "/api/items/{item_id}"
+
+@pytest.mark.asyncio
+async def test_middleware_labels_requests_by_route_template():
+    async def app(scope, receive, send):
+        scope["route"] = Route()
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    before = sample("http_requests_total", method="GET", route=Route.path, status="404")
+    scope = {"type": "http", "method": "GET", "path": "/api/items/7"}
+    await metrics.MetricsMiddleware(app)(scope, None, send)
+    assert sample("http_requests_total", method="GET", route=Route.path, status="404") == before + 1
+    assert sample("http_request_duration_seconds_count", method="GET", route=Route.path) >= 1
+
+def test_observe_export_records_stages_and_throughput():
+    progress = ExportProgress()
+    progress.add_time("parse", 0.5)
+    result = SinkResult("postgres")
+    result.total_inserted = 1000
+    before = sample("export_messages_total", sink="postgres")
+
+    metrics.observe_export(progress, {"postgres": result}, 2.0)
+    assert sample("export_messages_total", sink="postgres") == before + 1000
+    assert sample("export_stage_duration_seconds_count", stage="parse") >= 1
+    assert sample("export_rows_per_second_sum", sink="postgres") >= 500
@@ -0,0 +1,52 @@
+from datetime import date
+
+import pytest
+
+from app.services import partitions
+from app.services.partitions import (add_months, expired_months, missing_indexes, months_ahead, partition_month,
+                                     partition_name)
+from app.settings import get_settings
+
+def test_partition_names_round_trip():
+    assert partition_name("2024-05") == "discord_chats_2024_05"
+    assert partition_month("discord_chats_2024_05") == "2024-05"
+    # Hand-made partitions with other names are not managed
+    assert partition_month("discord_chats_old") is None
+
+def test_months_ahead_crosses_year_end():
+    assert add_months(date(2024, 12, 31), 1) == date(2025, 1, 1)
+    assert add_months(date(2024, 1, 15), -1) == date(2023, 12, 1)
+    assert months_ahead(date(2024, 11, 20), 2) == ["2024-11", "2024-12", "2025-01"]
+
+def test_retention_keeps_the_horizon():
+    months = ["2023-10", "2023-11", "2023-12", "2024-01", "2024-05"]
+    assert expired_months(months, date(2024, 5, 3), 6) == ["2023-10"]
+    assert expired_months(months, date(2024, 5, 3), 0) == []
+
+@pytest.mark.asyncio
+async def test_expired_months_get_no_partition_and_are_forgotten(monkeypatch):
+    monkeypatch.setattr(get_settings(), "partition_retention_months", 6)
+    old_month = add_months(date.today(), -12).strftime("%Y-%m")
+    current_month = date.today().strftime("%Y-%m")
+    monkeypatch.setattr(partitions, "_known_months", {old_month, current_month})
+    # Nothing is left to create, so the database is never touched
+    await partitions.ensure_partitions([old_month, current_month])
+    assert partitions._known_months == {current_month}
+
+def test_missing_indexes_recognises_equivalent_and_invalid_indexes():
+    existing = [
+        ("discord_chats_2024_05_pkey", "CREATE UNIQUE INDEX discord_chats_2024_05_pkey ON public.discord_chats_2024_05 "
+                                       "USING btree (message_id, message_date)", True),
+        ("discord_chats_2024_05_content_tsvector_idx1", "CREATE INDEX discord_chats_2024_05_content_tsvector_idx1 "
+                                                        "ON public.discord_chats_2024_05 USING gin (content_tsvector)", True),
+        ("discord_chats_2024_05_content_trgm_idx", "CREATE INDEX discord_chats_2024_05_content_trgm_idx "
+                                                   "ON public.discord_chats_2024_05 USING gin (content gin_trgm_ops)", False),
+    ]
+    invalid, statements = missing_indexes("discord_chats_2024_05", existing)
+    assert invalid == ["discord_chats_2024_05_content_trgm_idx"]
+    assert statements == [
+        "CREATE INDEX IF NOT EXISTS discord_chats_2024_05_content_trgm_idx ON discord_chats_2024_05 "
+        "USING gin (content gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS discord_chats_2024_05_date_id_idx ON discord_chats_2024_05 "
+        "USING btree (message_date, message_id)",
+    ]
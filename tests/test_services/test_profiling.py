@@ -0,0 +1,24 @@
+import os
+
+from app.services.profiling import _prune, _wants_profile
+from app.settings import get_settings
+
+def test_prune_deletes_oldest_profiles_first(tmp_path):
+    for index in range(4):
+        path = tmp_path / f"profile_{index}.html"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (index, index))
+
+    _prune(str(tmp_path), 250)
+    assert sorted(os.listdir(tmp_path)) == ["profile_2.html", "profile_3.html"]
+
+def test_header_opts_in_and_token_is_enforced(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "profile_sample_rate", 0.0)
+    monkeypatch.setattr(settings, "profile_header_token", "")
+    assert _wants_profile({"headers": [(b"x-profile", b"1")]})
+    assert not _wants_profile({"headers": []})
+
+    monkeypatch.setattr(settings, "profile_header_token", "secret")
+    assert not _wants_profile({"headers": [(b"x-profile", b"1")]})
+    assert _wants_profile({"headers": [(b"x-profile", b"secret")]})
@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+from starlette.exceptions import HTTPException
+
+from app.services.query_planner import (MATCH_EXACT, MATCH_WORDS, PLAN_EMPTY, PLAN_FULLTEXT, PLAN_LIMITED_SCAN,
+                                        PLAN_TRIGRAM, choose_plan, lexeme_selectivity)
+from app.settings import get_settings
+
+FREQUENCIES = {"hello": 0.3, "pie": 0.001}
+
+def test_selectivity_is_that_of_the_rarest_lexeme():
+    assert lexeme_selectivity(["hello", "pie"], FREQUENCIES, 0.0001) == 0.001
+    assert lexeme_selectivity(["unlisted"], FREQUENCIES, 0.0001) == 0.0001
+    assert lexeme_selectivity(["hello"], {}, None) is None
+
+def compiled(plan):
+    return [str(predicate.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+            for predicate in plan.predicates]
+
+def test_exact_search_always_matches_substrings():
+    # A tsvector prefilter would drop "piece" and "pier" for "pie"; statistics only decide
+    # whether the same substring match is limited to recent partitions
+    plans = [choose_plan("pie", MATCH_EXACT, ["pie"], selectivity) for selectivity in (0.0001, 0.3, None)]
+    assert [plan.strategy for plan in plans] == [PLAN_TRIGRAM, PLAN_LIMITED_SCAN, PLAN_TRIGRAM]
+    assert all(compiled(plan)[-1] == compiled(plans[0])[0] for plan in plans)
+    assert "ILIKE" in compiled(plans[0])[0] and "tsvector" not in compiled(plans[0])[0]
+
+def test_common_terms_are_limited_or_rejected(monkeypatch):
+    monkeypatch.setattr(get_settings(), "query_short_term_policy", "limited")
+    assert choose_plan("hello", MATCH_EXACT, ["hello"], 0.3).strategy == PLAN_LIMITED_SCAN
+    assert choose_plan("hello", MATCH_WORDS, ["hello"], 0.3).strategy == PLAN_LIMITED_SCAN
+    # Stop words have no statistics but are common; punctuation is left to the trigram index
+    assert choose_plan("the", MATCH_EXACT, [], None).strategy == PLAN_LIMITED_SCAN
+    assert choose_plan("://", MATCH_EXACT, [], None).strategy == PLAN_TRIGRAM
+
+    monkeypatch.setattr(get_settings(), "query_short_term_policy", "reject")
+    with pytest.raises(HTTPException) as error:
+        choose_plan("hello", MATCH_WORDS, ["hello"], 0.3)
+    assert error.value.status_code == 400
+
+def test_short_terms_are_limited_or_rejected(monkeypatch):
+    monkeypatch.setattr(get_settings(), "query_short_term_policy", "limited")
+    plan = choose_plan("a", MATCH_EXACT, [], None)
+    assert plan.strategy == PLAN_LIMITED_SCAN and len(plan.predicates) == 2
+    # Short words are substring matches too; they get the same limited scan
+    assert compiled(choose_plan("ok", MATCH_EXACT, ["ok"], 0.001))[1] == compiled(choose_plan("ok", MATCH_EXACT, [], None))[1]
+
+    monkeypatch.setattr(get_settings(), "query_short_term_policy", "reject")
+    with pytest.raises(HTTPException) as error:
+        choose_plan("a", MATCH_EXACT, [], None)
+    assert error.value.status_code == 400
+
+def test_word_search_of_stop_words_matches_nothing():
+    assert choose_plan("the", MATCH_WORDS, [], None).strategy == PLAN_EMPTY
+    assert choose_plan("pie", MATCH_WORDS, ["pie"], 0.001).strategy == PLAN_FULLTEXT
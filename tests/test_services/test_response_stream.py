@@ -0,0 +1,21 @@
+import gzip
+from datetime import date
+from types import SimpleNamespace
+
+from app.services.response_stream import ChunkEncoder, accepts_gzip, encode_message_rows
+
+def test_gzip_chunks_form_one_decodable_stream():
+    encoder = ChunkEncoder(gzip=True)
+    body = encoder.encode(b'{"a":1}\n') + encoder.encode(b'{"a":2}\n') + encoder.finish()
+    assert gzip.decompress(body) == b'{"a":1}\n{"a":2}\n'
+    assert ChunkEncoder(gzip=False).encode(b"plain") == b"plain"
+
+def test_accept_encoding_parsing():
+    assert accepts_gzip("deflate, gzip;q=0.8")
+    assert not accepts_gzip("gzip;q=0, br")
+    assert not accepts_gzip("")
+
+def test_rows_are_encoded_like_chat_message_display():
+    row = SimpleNamespace(message_id=1, channel_id=2, content="héllo", message_date=date(2024, 5, 1))
+    assert encode_message_rows([row]) == [
+        '{"message_id":1,"channel_id":2,"content":"héllo","message_date":"2024-05-01"}'.encode("utf-8")]
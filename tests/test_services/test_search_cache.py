@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+from datetime import date
+
+import pytest
+
+from app.services import search_cache
+from app.services.cache_codec import pack_entry
+from app.services.search_cache import month_scope, month_scopes
+
+def test_month_scopes_cover_range_across_years():
+    assert month_scopes(date(2023, 11, 15), date(2024, 2, 1)) == ["2023-11", "2023-12", "2024-01", "2024-02"]
+
+def test_month_scope_of_timestamp_uses_local_date():
+    assert month_scope("2024-04-30T23:30:00.000-07:00") == "2024-04"
+    assert month_scope(date(2024, 5, 1)) == "2024-05"
+
+def encode(value):
+    return json.dumps(value).encode()
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the Redis commands used by the search cache."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        self.mget_calls = getattr(self, "mget_calls", 0) + 1
+        return [self.data.get(key) for key in keys]
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def eval(self, script, numkeys, key, token):
+        if self.data.get(key) == token:
+            del self.data[key]
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    redis, calls = FakeRedis(), []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"value": 42}
+
+    results = await asyncio.gather(*[
+        search_cache.get_or_load(redis, "key", load, encode) for _ in range(20)
+    ])
+    assert len(calls) == 1
+    assert all(result == b'{"value": 42}' for result in results)
+
+@pytest.mark.asyncio
+async def test_batch_reads_hits_at_once_and_loads_misses():
+    redis, calls = FakeRedis(), []
+    redis.data["cached"] = pack_entry(encode({"value": "cached"}), time.time() + 60)
+
+    def loader(value):
+        async def load():
+            calls.append(value)
+            if value == "broken":
+                raise RuntimeError("query failed")
+            return {"value": value}
+        return load
+
+    payloads = await search_cache.get_or_load_many(
+        redis, ["cached", "first", "broken", "second"],
+        [loader("unused"), loader("first"), loader("broken"), loader("second")], encode, concurrency=2)
+    assert redis.mget_calls == 1
+    assert sorted(calls) == ["broken", "first", "second"]
+    assert payloads[0] == b'{"value": "cached"}'
+    assert payloads[1] == b'{"value": "first"}' and payloads[3] == b'{"value": "second"}'
+    assert isinstance(payloads[2], RuntimeError)
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_served_while_refreshing():
+    redis = FakeRedis()
+    redis.data["key"] = pack_entry(encode({"value": "old"}), time.time() - 1)
+
+    async def load():
+        return {"value": "new"}
+
+    assert await search_cache.get_or_load(redis, "key", load, encode) == b'{"value": "old"}'
+    await asyncio.sleep(0.01)  # Let the background refresh finish
+    assert await search_cache.get_or_load(redis, "key", load, encode) == b'{"value": "new"}'
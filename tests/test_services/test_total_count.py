@@ -0,0 +1,11 @@
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.future import select
+
+from app.models import Message
+from app.services.total_count import ExplainJson
+
+def test_explain_keeps_bound_parameters():
+    stmt = select(Message.message_id).filter(Message.content.ilike("%it's 100%%%"))
+    sql = str(ExplainJson(stmt).compile(dialect=postgresql.dialect()))
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT discord_chats.message_id")
+    assert "it's" not in sql  # The search term travels as a parameter, not inlined SQL